@@ -0,0 +1,44 @@
+import asyncio
+import gzip
+import json
+import os
+from typing import List, Optional
+
+# --- GAME ARCHIVE ---
+class GameArchive:
+    """
+    Final results of games evicted from memory, one `<code>.json.gz` per game
+    holding {"meta": {...}, "state": {...}} in the same shapes the backends
+    and snapshots use. Reads and writes run in a worker thread.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, code: str) -> str:
+        return os.path.join(self.directory, f"{code}.json.gz")
+
+    def codes(self) -> List[str]:
+        return [name[:-8] for name in os.listdir(self.directory) if name.endswith(".json.gz")]
+
+    async def save(self, code: str, record: dict):
+        # Encode now, while the caller's state is consistent; compress and write off the loop
+        text = json.dumps(record, separators=(",", ":"))
+        await asyncio.to_thread(write_record, self.path(code), text)
+
+    async def load(self, code: str) -> Optional[dict]:
+        if not os.path.exists(self.path(code)): return None
+        return await asyncio.to_thread(read_record, self.path(code))
+
+def write_record(path: str, text: str):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(gzip.compress(text.encode(), mtime=0))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def read_record(path: str) -> dict:
+    with gzip.open(path, "rb") as f:
+        return json.load(f)
@@ -0,0 +1,86 @@
+"""
+Load time and query cost of the pre-made challenge catalog.
+
+Run from backend/:  python benchmarks/catalog_bench.py [challenges] [packs]
+
+Writes that many challenges, spread over that many packs (half of them
+with their description in a file), to a temp directory and loads it as
+the server does. Queries are a page of everything, filters by category,
+tag and points, a title search and a repeat of a cached page. The
+baseline is the previous endpoint: every challenge serialized, flags
+included, on every request.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import ChallengeCatalog
+
+CATEGORIES = ["WEB", "CRYPTO", "PWN", "REV", "FORENSICS", "MISC"]
+TAGS = ["beginner", "hard", "sql", "rsa", "heap", "stego", "osint", "jwt"]
+
+def write_packs(root: str, challenges: int, packs: int):
+    for p in range(packs):
+        pack = os.path.join(root, f"pack{p}")
+        os.makedirs(pack)
+        items = []
+        for i in range(p, challenges, packs):
+            item = {
+                "id": f"c{i}", "title": f"Challenge {i}", "category": CATEGORIES[i % len(CATEGORIES)],
+                "points": 50 * (1 + i % 10), "min_points": 50, "decay": 10, "flag": f"flag{{c{i}}}",
+                "tags": [TAGS[i % len(TAGS)], TAGS[(i * 3) % len(TAGS)]],
+                "files": [f"Handout|files/c{i}.zip"],
+                "hints": [{"id": f"c{i}_h1", "content": "Look closer.", "cost": 10}]
+            }
+            if i % 2:
+                item["desc_file"] = f"c{i}.md"
+                item["summary"] = "A long story."
+                with open(os.path.join(pack, f"c{i}.md"), "w") as f:
+                    f.write("A long story. " * 500)
+            else:
+                item["desc"] = "Find the flag hidden somewhere in this service. " * 4
+            items.append(item)
+        with open(os.path.join(pack, "pack.json"), "w") as f:
+            json.dump({"challenges": items}, f)
+
+def timed(fn, repeat: int = 50) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat): fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    challenges = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    packs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as root:
+        write_packs(root, challenges, packs)
+        catalog = ChallengeCatalog([], root)
+        started = time.perf_counter()
+        catalog.load()
+        print(f"{len(catalog.entries)} challenges in {packs} packs loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        everything = [e.challenge for e in catalog.entries]
+        baseline = timed(lambda: json.dumps([c.model_dump() for c in everything]).encode(), 5)
+        print(f"{'baseline (all, re-serialized)':>34}: {baseline:8.3f} ms")
+
+        queries = {
+            "first page": {},
+            "category": {"category": "PWN"},
+            "tag + points": {"tag": "rsa", "min_points": 200, "max_points": 300},
+            "search": {"search": "challenge 12"},
+            "last page": {"offset": challenges - 50},
+        }
+        for name, query in queries.items():
+            args = {"category": None, "tag": None, "min_points": None, "max_points": None, "search": None, "offset": 0, "limit": 50, **query}
+            key = catalog.query_key(**args)
+            def cold():
+                catalog.pages.clear()
+                catalog.page(key)
+            total = json.loads(catalog.page(key)[1])["total"]
+            print(f"{name:>22} ({total:>5} hits): {timed(cold):8.3f} ms cold, {timed(lambda: catalog.page(key)) * 1000:8.3f} us cached")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Encode time and size of a LOBBY_UPDATE broadcast in each wire codec.
+
+Run from backend/:  python benchmarks/codec_bench.py [teams] [challenges]
+
+Builds a snapshot shaped like GameManager.snapshot (teams of four with a few
+solves, challenges with descriptions and hints) and, per codec, times one
+player broadcast: the shared snapshot encoded once and each team's hint
+fields spliced in, compression included. The stdlib json encoder the server
+used before is the baseline; per-socket permessage-deflate, which costs one
+compression per socket rather than per team, is shown for comparison.
+"""
+import json
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import Shared, Spliced, build_codecs
+
+def build(teams: int, challenges: int) -> dict:
+    chals = [{
+        "id": f"chal{i}", "title": f"Challenge {i}", "category": "web", "points": 500 - i,
+        "desc": "Find the flag hidden somewhere in this service. " * 8,
+        "files": [f"/uploads/{'ab' * 32}/chal{i}.zip"], "solves": i % 7,
+        "flag_mask": "CTF{**********}", "hints": [{"id": f"chal{i}_h{h}", "cost": 25} for h in range(2)]
+    } for i in range(challenges)]
+    board = [{
+        "id": f"{t:04d}", "name": f"team {t}", "score": 1000 - t, "is_solo": False, "rank": t + 1,
+        "members": [{"id": f"p{t}-{m}", "name": f"player {t}-{m}", "score": 250, "solves": ["chal1", "chal2"], "is_connected": True} for m in range(4)]
+    } for t in range(teams)]
+    return {"type": "LOBBY_UPDATE", "version": 42, "status": "active", "leaderboard": board, "challenges": chals, "endTime": time.time()}
+
+def hint_fields(t: int) -> dict:
+    return {"my_unlocked_hints": {"chal1": ["chal1_h0"]}, "hint_content": {"chal1_h0": f"team {t} hint text"}}
+
+def main():
+    teams = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    challenges = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    snapshot = build(teams, challenges)
+    print(f"{teams} teams of 4, {challenges} challenges; one broadcast = {teams} team frames, {teams * 4} sockets")
+
+    started = time.perf_counter()
+    shared = json.dumps(snapshot)[:-1]
+    frames = [shared + ", " + json.dumps(hint_fields(t))[1:] for t in range(teams)]
+    baseline = time.perf_counter() - started
+    print(f"{'stdlib json (before)':26} {baseline * 1000:7.2f} ms  {len(frames[0]):8d} B/frame")
+    started = time.perf_counter()
+    for _ in range(teams * 4): zlib.compressobj(6, zlib.DEFLATED, -15).compress(frames[0].encode())
+    print(f"{'+ permessage-deflate':26} {(time.perf_counter() - started + baseline) * 1000:7.2f} ms  (one compression per socket)")
+
+    for name, codec in build_codecs(8192).items():
+        started = time.perf_counter()
+        base = Shared(snapshot)
+        sizes = [len(Spliced(base, lambda c, t=t: c.fragment(hint_fields(t))).get(codec)) for t in range(teams)]
+        elapsed = time.perf_counter() - started
+        print(f"{name:26} {elapsed * 1000:7.2f} ms  {sizes[0]:8d} B/frame")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Event log write overhead and recovery time.
+
+Run from backend/:  python benchmarks/event_log_bench.py [events] [teams] [challenges]
+
+Commits a game's worth of joins and solves through GameManager with and
+without an EventLog, then rebuilds the game from disk with and without
+snapshots. Every solve is a different team and challenge pair, as in a
+real game, worth what the default (retroactive, linear) scoring makes it.
+Challenges decay like the built-in ones and reach their minimum after 17
+solves; until then each solve also moves the earlier solvers.
+"""
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import GameManager, GameConfig
+from challenges import Challenge
+from scoring import SCORING_MODELS
+from event_log import EventLog
+from state_backend import InMemoryBackend
+
+def make_challenges(count: int):
+    return [Challenge(id=f"chal{i}", title=f"Challenge {i}", category="MISC", points=500, min_points=100,
+                      decay=25, desc="", flag=f"flag{{challenge_{i}}}") for i in range(count)]
+
+def make_events(count: int, teams: int, challenges: int):
+    model, values = SCORING_MODELS["linear"], make_challenges(challenges)
+    solved = [0] * challenges
+    events = [{"type": "game_started", "start_time": time.time(), "end_time": time.time() + 3600}]
+    for i in range(teams):
+        events.append({"type": "player_joined", "player_id": f"p{i}", "name": f"player{i}",
+                       "new_team": True, "team_id": f"t{i}", "team_name": f"team{i}", "is_solo": True})
+    solves = min(count - len(events), teams * challenges) # Each team solves a challenge at most once
+    for i, c in random.sample([(i, c) for i in range(teams) for c in range(challenges)], solves):
+        solved[c] += 1
+        events.append({"type": "solve", "team_id": f"t{i}", "player_id": f"p{i}", "challenge_id": f"chal{c}",
+                       "points": model.value(values[c], solved[c]), "penalty": 0, "at": time.time()})
+    return events
+
+async def run(events: list, challenges: int, log: EventLog = None):
+    manager = GameManager(InMemoryBackend(log))
+    await manager.backend.start()
+    code, _ = await manager.create_game(GameConfig(challenges=make_challenges(challenges)))
+    latencies = []
+    for event in events:
+        started = time.perf_counter()
+        await manager.backend.commit(code, event)
+        latencies.append(time.perf_counter() - started)
+    await manager.backend.stop()
+    for game in manager.games.values(): manager.stop_clock(game)
+    latencies.sort()
+    return code, latencies
+
+async def recover(directory: str, code: str):
+    manager = GameManager(InMemoryBackend(EventLog(directory)))
+    started = time.perf_counter()
+    await manager.get_game(code)
+    elapsed = time.perf_counter() - started
+    manager.stop_clock(manager.games[code])
+    return elapsed, len(manager.games[code]["players"])
+
+def us(seconds: float) -> str:
+    return f"{seconds * 1e6:7.1f} us"
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    teams = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    challenges = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    events = make_events(count, teams, challenges)
+    count = len(events)
+    print(f"{teams} teams, {challenges} challenges, {count - teams - 1} solves")
+    _, base = await run(events, challenges)
+    print(f"{count} events, no log:       p50 {us(base[len(base) // 2])}  p99 {us(base[int(len(base) * 0.99)])}")
+
+    for snapshot_every in (10 ** 9, 1000):
+        directory = tempfile.mkdtemp()
+        try:
+            code, logged = await run(events, challenges, EventLog(directory, snapshot_every=snapshot_every))
+            label = "log, no snapshot" if snapshot_every > count else f"log, snapshot/{snapshot_every}"
+            print(f"{count} events, {label}: p50 {us(logged[len(logged) // 2])}  p99 {us(logged[int(len(logged) * 0.99)])}")
+            elapsed, players = await recover(directory, code)
+            print(f"  recovery: {elapsed * 1000:.1f} ms ({players} players)")
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    asyncio.run(main())
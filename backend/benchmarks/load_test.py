@@ -0,0 +1,361 @@
+"""
+Websocket load test: simulated admins and players against a real server.
+
+Run from backend/:
+    python benchmarks/load_test.py --players 300 --team-size 4 --duration 30 --out result.json
+
+By default the app is started with uvicorn in a subprocess on a free port
+(--in-process runs it inside this event loop instead; --url targets a
+server that is already running). A game is created through /api/create,
+players join or create teams, the admin starts the game, and every player
+then loops: wrong flags, right flags, hints, and the odd reconnect.
+
+Measured:
+  latency_ms   request -> direct reply per action (e.g. SUBMIT_FLAG -> TOAST)
+  fanout_ms    correct flag sent -> LOBBY_PATCH carrying it seen by each other client
+  server       CPU seconds/percent and RSS (subprocess and in-process modes, Linux)
+--codec picks the websocket subprotocol the clients ask for (e.g.
+dashflag.msgpack+deflate), so wire formats can be compared on the same run;
+--no-ws-deflate stops clients offering permessage-deflate, which otherwise
+has the server compress every frame once per socket.
+The JSON report goes to --out (or stdout) so runs can be diffed between versions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import websockets
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from challenges import PREMADE_CHALLENGES
+
+CHALLENGES = {c.id: c for c in PREMADE_CHALLENGES}
+REPLY_TIMEOUT = 10.0
+HINT_TIMEOUT = 1.0 # The server stays silent if a teammate bought the hint first
+
+THROTTLED = lambda m: m["type"] == "TOAST" and "slow down" in m["msg"]
+FLAG_REJECTED = lambda m: m["type"] == "TOAST" and m["msg"] in ("Incorrect Flag", "You already solved this!") or THROTTLED(m)
+FLAG_ACCEPTED = lambda m: m["type"] == "SOLVE_CONFIRMED" or FLAG_REJECTED(m)
+HINT_REPLY = lambda m: m["type"] == "HINTS_UPDATE" or m["type"] == "TOAST" and "hint" in m["msg"].lower() or THROTTLED(m)
+
+class Stats:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.fanout: List[float] = []
+        self.solve_sent: Dict[tuple, float] = {} # (player_id, challenge_id) -> send time
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def report(self, values: List[float]) -> dict:
+        if not values: return {"count": 0}
+        values = sorted(values)
+        pick = lambda q: round(values[min(int(len(values) * q), len(values) - 1)] * 1000, 2)
+        return {"count": len(values), "p50": pick(0.5), "p99": pick(0.99), "max": round(values[-1] * 1000, 2)}
+
+def decode(raw) -> dict:
+    # Text is JSON; binary is deflated (zlib header 0x78) and/or msgpack
+    if isinstance(raw, str): return json.loads(raw)
+    if raw[0] == 0x78: raw = zlib.decompress(raw)
+    return json.loads(raw) if raw[:1] == b"{" else msgpack.unpackb(raw)
+
+# --- SIMULATED CLIENT ---
+class SimClient:
+    def __init__(self, url: str, stats: Stats, name: str, codec: Optional[str] = None, ws_deflate: bool = True):
+        self.url = url
+        self.stats = stats
+        self.name = name
+        self.codec = codec
+        self.ws_deflate = ws_deflate
+        self.ws = None
+        self.reader: Optional[asyncio.Task] = None
+        self.waiting = None # (predicate, future) for the one outstanding request
+        self.version: Optional[int] = None
+        self.player_id: Optional[str] = None
+        self.team_id: Optional[str] = None
+        self.solves = set()
+        self.hints: Dict[str, List[str]] = {}
+        self.active = asyncio.Event()
+        self.ended = False
+        self.seen_solves = set() # (player_id, challenge_id) already counted for fan-out
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, max_size=None, subprotocols=[self.codec] if self.codec else None,
+                                           compression="deflate" if self.ws_deflate else None)
+        self.version = None
+        self.reader = asyncio.create_task(self.read())
+
+    async def close(self):
+        if self.ws: await self.ws.close()
+        if self.reader: await asyncio.gather(self.reader, return_exceptions=True)
+
+    async def request(self, kind: str, message: dict, expect, timeout: float = REPLY_TIMEOUT) -> Optional[dict]:
+        future = asyncio.get_running_loop().create_future()
+        self.waiting = (expect, future)
+        started = time.perf_counter()
+        await self.ws.send(json.dumps(message))
+        try:
+            reply = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats.counts[f"no_reply {kind}"] += 1
+            return None
+        finally:
+            self.waiting = None
+        self.stats.latency[kind].append(time.perf_counter() - started)
+        return reply
+
+    async def read(self):
+        try:
+            async for raw in self.ws:
+                self.stats.counts["messages"] += 1
+                self.stats.counts["bytes"] += len(raw)
+                self.handle(decode(raw))
+        except websockets.ConnectionClosed:
+            pass
+
+    def handle(self, msg: dict):
+        kind = msg["type"]
+        if kind == "LOBBY_UPDATE":
+            self.version = msg["version"]
+            self.status(msg["status"])
+            if "my_unlocked_hints" in msg: self.hints = msg["my_unlocked_hints"]
+        elif kind == "LOBBY_PATCH":
+            if self.version is None or msg["version"] <= self.version: pass
+            elif msg["version"] != self.version + 1:
+                self.version = None
+                self.stats.counts["resyncs"] += 1
+                asyncio.create_task(self.ws.send('{"type": "RESYNC"}'))
+            else:
+                self.version = msg["version"]
+                self.record_fanout(msg["ops"])
+        elif kind == "PING":
+            asyncio.create_task(self.ws.send('{"type": "PONG"}'))
+        elif kind == "HINTS_UPDATE":
+            self.hints = msg["my_unlocked_hints"]
+        elif kind == "SOLVE_CONFIRMED":
+            self.solves.add(msg["id"])
+        elif THROTTLED(msg):
+            self.stats.counts["throttled"] += 1
+
+        if self.waiting and self.waiting[0](msg) and not self.waiting[1].done():
+            self.waiting[1].set_result(msg)
+
+    def status(self, status: str):
+        if status == "active": self.active.set()
+        if status == "ended": self.ended = True
+
+    def record_fanout(self, ops: List[dict]):
+        now = time.perf_counter()
+        for op in ops:
+            if op["op"] != "member" or op["member"]["id"] == self.player_id: continue
+            for chal_id in op["member"]["solves"]:
+                key = (op["member"]["id"], chal_id)
+                sent = self.stats.solve_sent.get(key)
+                if sent is not None and key not in self.seen_solves:
+                    self.seen_solves.add(key)
+                    self.stats.fanout.append(now - sent)
+
+# --- SCENARIO ---
+async def run_admin(client: SimClient, token: str, start: asyncio.Event):
+    await client.connect()
+    await client.request("ADMIN_AUTH", {"type": "ADMIN_AUTH", "token": token}, lambda m: m["type"] == "ADMIN_CONFIRMED")
+    await start.wait()
+    await client.ws.send(json.dumps({"type": "START_GAME"}))
+
+async def join(client: SimClient, index: int, team_size: int, teams: Dict[int, asyncio.Future]):
+    await client.connect()
+    confirmed = lambda m: m["type"] in ("PLAYER_CONFIRMED", "TOAST")
+    if team_size <= 1:
+        reply = await client.request("JOIN", {"type": "JOIN_SOLO", "nickname": client.name}, confirmed)
+    elif index % team_size == 0:
+        reply = await client.request("JOIN", {"type": "CREATE_TEAM", "nickname": client.name, "teamName": f"team-{client.name}"}, confirmed)
+        if reply and reply["type"] == "PLAYER_CONFIRMED": teams[index // team_size].set_result(reply["teamId"])
+    else:
+        team_id = await teams[index // team_size]
+        reply = await client.request("JOIN", {"type": "JOIN_TEAM", "nickname": client.name, "teamCode": team_id}, confirmed)
+    if reply and reply["type"] == "PLAYER_CONFIRMED":
+        client.player_id, client.team_id = reply["playerId"], reply["teamId"]
+
+async def play(client: SimClient, deadline: float, think: float, reconnect_rate: float):
+    await client.active.wait()
+    while time.time() < deadline and not client.ended:
+        await asyncio.sleep(min(random.expovariate(1 / think), max(deadline - time.time(), 0)))
+        if time.time() >= deadline: break
+        roll = random.random()
+        open_challenges = [c for c in CHALLENGES.values() if c.id not in client.solves]
+
+        if roll < reconnect_rate:
+            await client.close()
+            await client.connect()
+            await client.request("RECONNECT", {"type": "PLAYER_JOIN", "playerId": client.player_id}, lambda m: m["type"] == "PLAYER_RESTORED")
+        elif roll < 0.15 and open_challenges:
+            chal = random.choice(open_challenges)
+            unlocked = client.hints.get(chal.id, [])
+            if len(unlocked) < len(chal.hints):
+                hint = chal.hints[len(unlocked)]
+                await client.request("BUY_HINT", {"type": "BUY_HINT", "payload": {"challengeId": chal.id, "hintId": hint.id}},
+                                     HINT_REPLY, HINT_TIMEOUT)
+        elif roll < 0.25 and open_challenges:
+            chal = random.choice(open_challenges)
+            client.stats.solve_sent.setdefault((client.player_id, chal.id), time.perf_counter())
+            await client.request("SUBMIT_FLAG (correct)", {"type": "SUBMIT_FLAG", "payload": {"challengeId": chal.id, "flag": chal.flag}},
+                                 FLAG_ACCEPTED)
+        else:
+            chal = random.choice(list(CHALLENGES.values()))
+            await client.request("SUBMIT_FLAG (wrong)", {"type": "SUBMIT_FLAG", "payload": {"challengeId": chal.id, "flag": "flag{nope}"}},
+                                 FLAG_REJECTED)
+
+# --- SERVER ---
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def proc_usage(pid: int) -> dict:
+    # CPU seconds and RSS of a process, from /proc (Linux only)
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    status = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.strip()
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / ticks,
+        "rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+        "peak_rss_mb": int(status["VmHWM"].split()[0]) / 1024
+    }
+
+def self_usage() -> dict:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return {"cpu_seconds": usage.ru_utime + usage.ru_stime, "peak_rss_mb": usage.ru_maxrss / 1024}
+
+async def wait_for_server(base: str):
+    for _ in range(100):
+        try:
+            await asyncio.to_thread(urllib.request.urlopen, base + "/api/premade-challenges")
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"server at {base} did not come up")
+
+def create_game(base: str, duration: int) -> dict:
+    body = json.dumps({"challenges": [c.model_dump() for c in PREMADE_CHALLENGES], "duration_seconds": duration}).encode()
+    request = urllib.request.Request(base + "/api/create", data=body, headers={"content-type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+async def main(args):
+    env = {**os.environ}
+    if not args.keep_limits:
+        env.update(ATTEMPT_LIMIT_SOCKET="", ATTEMPT_LIMIT_PLAYER="", ATTEMPT_LIMIT_TEAM="")
+
+    process, server, measure = None, None, None
+    if args.url:
+        base = args.url.rstrip("/")
+    else:
+        port = free_port()
+        base = f"http://127.0.0.1:{port}"
+        if args.in_process:
+            os.environ.update(env)
+            os.chdir(BACKEND)
+            import uvicorn
+            from main import app
+            server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+            serving = asyncio.create_task(server.serve())
+            measure = self_usage
+        else:
+            process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                                       cwd=BACKEND, env=env)
+            measure = lambda: proc_usage(process.pid)
+
+    try:
+        await wait_for_server(base)
+        game = await asyncio.to_thread(create_game, base, args.duration + 120)
+        ws_url = base.replace("http", "ws", 1) + f"/ws/{game['gameCode']}"
+        stats = Stats()
+
+        admins = [SimClient(ws_url, stats, f"admin{i}", args.codec, not args.no_ws_deflate) for i in range(args.admins)]
+        players = [SimClient(ws_url, stats, f"p{i}", args.codec, not args.no_ws_deflate) for i in range(args.players)]
+        start = asyncio.Event()
+        admin_tasks = [asyncio.create_task(run_admin(a, game["adminToken"], start)) for a in admins[:1]]
+        admin_tasks += [asyncio.create_task(run_admin(a, game["adminToken"], asyncio.Event())) for a in admins[1:]]
+
+        loop = asyncio.get_running_loop()
+        teams = defaultdict(loop.create_future)
+        await asyncio.gather(*[join(p, i, args.team_size, teams) for i, p in enumerate(players)])
+        joined = [p for p in players if p.player_id]
+
+        before = measure() if measure else None
+        started = time.time()
+        start.set()
+        deadline = started + args.duration
+        await asyncio.gather(*[play(p, deadline, args.think, args.reconnect_rate) for p in joined])
+        elapsed = time.time() - started
+        after = measure() if measure else None
+
+        for task in admin_tasks: task.cancel()
+        await asyncio.gather(*[c.close() for c in admins + players], return_exceptions=True)
+
+        result = {
+            "config": vars(args),
+            "players_joined": len(joined),
+            "elapsed_seconds": round(elapsed, 2),
+            "latency_ms": {kind: stats.report(values) for kind, values in sorted(stats.latency.items())},
+            "fanout_ms": stats.report(stats.fanout),
+            "client": dict(stats.counts),
+        }
+        if before and after:
+            cpu = after["cpu_seconds"] - before["cpu_seconds"]
+            result["server"] = {
+                "mode": "in-process" if args.in_process else "subprocess",
+                "cpu_seconds": round(cpu, 2),
+                "cpu_percent": round(cpu / elapsed * 100, 1),
+                **{k: round(v, 1) for k, v in after.items() if k != "cpu_seconds"}
+            }
+        return result
+    finally:
+        if process: process.terminate()
+        if server:
+            server.should_exit = True
+            await serving
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--team-size", type=int, default=4, help="1 = everyone plays solo")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of play after the game starts")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a player's actions")
+    parser.add_argument("--reconnect-rate", type=float, default=0.02, help="share of actions that are a reconnect")
+    parser.add_argument("--keep-limits", action="store_true", help="leave the server's attempt rate limits on")
+    parser.add_argument("--in-process", action="store_true", help="run the app in this process")
+    parser.add_argument("--url", help="target an already running server instead")
+    parser.add_argument("--codec", help="websocket subprotocol to request, e.g. dashflag.msgpack+deflate")
+    parser.add_argument("--no-ws-deflate", action="store_true", help="don't offer permessage-deflate")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,56 @@
+"""
+Per-player memory footprint and hot-path costs of the game models.
+
+Run from backend/:  python benchmarks/models_bench.py [players]
+
+Builds a game's worth of Player/Team objects (teams of four, a few solves
+and hints each) under tracemalloc, then times ID generation and the solve
+and hint membership checks SUBMIT_FLAG / BUY_HINT perform.
+"""
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_models import Player, Team, generate_id
+
+CHALLENGES = [f"chal{i}" for i in range(30)]
+
+def build(players: int):
+    teams = []
+    for t in range(players // 4):
+        team = Team(f"team{t}")
+        for p in range(4):
+            player = Player(f"player{t}-{p}")
+            team.add_member(player)
+            for c in CHALLENGES[p:30:6]: # 5 solves each, 20 per team
+                team.record_solve(player, c, 100, time.time())
+        for c in CHALLENGES[:3]:
+            team.unlock_hint(c, f"{c}_h1")
+        teams.append(team)
+    return teams
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    teams = build(players)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{players} players in {len(teams)} teams: {used / 1024 / 1024:.2f} MiB, {used / players:.0f} bytes/player (incl. team share)")
+
+    n = 200000
+    print(f"generate_id:        {timeit.timeit(generate_id, number=n) / n * 1e9:7.0f} ns")
+    team = teams[0]
+    print(f"solve check (miss): {timeit.timeit(lambda: 'chal29' in team.solves, number=n) / n * 1e9:7.0f} ns")
+    print(f"solve check (hit):  {timeit.timeit(lambda: 'chal28' in team.solves, number=n) / n * 1e9:7.0f} ns")
+    print(f"hint check:         {timeit.timeit(lambda: team.has_hint('chal2', 'chal2_h1'), number=n) / n * 1e9:7.0f} ns")
+    ids = {generate_id() for _ in range(n)}
+    print(f"distinct ids:       {len(ids)}/{n}")
+
+if __name__ == "__main__":
+    main()
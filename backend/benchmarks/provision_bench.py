@@ -0,0 +1,83 @@
+"""
+Memory per game and creation throughput when provisioning many games at once.
+
+Run from backend/:  python benchmarks/provision_bench.py [games ...]
+
+Each game gets the same challenge set (40 challenges with a longer
+description and three hints each). Three ways of creating them are
+compared, each in a fresh GameManager:
+
+  bulk       GameManager.create_games, as /api/create/bulk does: the config
+             is validated and serialized once and every game shares one
+             ChallengeSet
+  separate   one validated config per game, as repeated /api/create calls;
+             identical challenges are still interned into one set
+  unshared   like separate, but every game builds its own ChallengeSet,
+             which is how games were held before sets were shared
+
+Memory is what stays allocated (tracemalloc) after creating the games,
+divided by their number; throughput is timed in a separate run without
+tracing.
+"""
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from challenge_set import ChallengeSet
+from main import GameConfig, GameManager
+from state_backend import InMemoryBackend
+
+def raw_config(challenges: int = 40) -> dict:
+    return {"duration_seconds": 3600, "challenges": [{
+        "id": f"chal{i}", "title": f"Challenge {i}", "category": ["WEB", "CRYPTO", "PWN", "MISC"][i % 4],
+        "points": 500, "min_points": 100, "decay": 20, "flag": f"flag{{challenge_{i}}}",
+        "desc": f"Challenge {i}. " + "Find the flag hidden somewhere in this service. " * 20,
+        "files": [f"Handout|/uploads/{'ab' * 32}/chal{i}.zip"],
+        "hints": [{"id": f"chal{i}_h{h}", "content": f"Hint {h} for challenge {i}: look closer. " * 4, "cost": 25} for h in range(3)]
+    } for i in range(challenges)]}
+
+async def create(mode: str, games: int) -> GameManager:
+    manager = GameManager(InMemoryBackend())
+    raw = raw_config()
+    if mode == "bulk":
+        await manager.create_games(GameConfig(**raw), games)
+    else:
+        for _ in range(games):
+            await manager.create_game(GameConfig(**raw))
+    return manager
+
+async def measure(mode: str, games: int):
+    interned = main.intern_challenges
+    if mode == "unshared": main.intern_challenges = lambda challenges: ChallengeSet(b"", challenges)
+    try:
+        started = time.perf_counter()
+        await create(mode, games)
+        per_second = games / (time.perf_counter() - started)
+
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        manager = await create(mode, games)
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        assert len(manager.games) == games
+        return held / games, per_second
+    finally:
+        main.intern_challenges = interned
+
+async def run(sizes):
+    print(f"{'games':>6} {'mode':>9} {'KiB per game':>13} {'games/s':>9}")
+    for games in sizes:
+        for mode in ("bulk", "separate", "unshared"):
+            per_game, per_second = await measure(mode, games)
+            print(f"{games:>6} {mode:>9} {per_game / 1024:>13.1f} {per_second:>9.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(run([int(a) for a in sys.argv[1:]] or [100, 500]))
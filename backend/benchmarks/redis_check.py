@@ -0,0 +1,140 @@
+"""
+Two workers sharing one game through RedisBackend, against fakeredis.
+
+Run from backend/:  python benchmarks/redis_check.py
+
+Needs `redis` and `fakeredis`. Two GameManagers (and later a third) get
+their own client to one in-process fakeredis server, as separate workers
+would to one Redis. Players join and solve on either worker; the script
+checks that the pub/sub relay brings both replicas to the same state, that
+the per-game lock lets only one of two concurrent joins take a nickname,
+that a worker which missed a published event reads it back from the event
+list, and that a worker loading the game afterwards rebuilds it from there. Exits non-zero on the first mismatch.
+"""
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis
+
+from main import CODECS, GameConfig, GameManager
+from codec import negotiate
+from challenges import PREMADE_CHALLENGES
+from state_backend import RedisBackend
+
+class FakeSocket:
+    # Stands in for a WebSocket behind an Outbox; keeps what it was sent
+    def __init__(self, name: str):
+        self.name = name
+        self.received = []
+
+    async def send_text(self, text: str):
+        self.received.append(json.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        self.received.append(json.loads(data))
+
+    async def close(self):
+        pass
+
+    def got(self, kind: str) -> bool:
+        return any(m.get("type") == kind for m in self.received)
+
+def worker(server: fakeredis.FakeServer) -> GameManager:
+    return GameManager(RedisBackend(client=fakeredis.aioredis.FakeRedis(server=server)))
+
+def connect(manager: GameManager, code: str, name: str) -> FakeSocket:
+    websocket = FakeSocket(name)
+    manager.attach(websocket, negotiate(CODECS, [])[1], code)
+    return websocket
+
+async def command(manager: GameManager, code: str, handler: str, websocket: FakeSocket, payload: dict):
+    await manager.submit(code, getattr(manager, handler), websocket, payload, handler)
+    await asyncio.sleep(0.01) # Let the outboxes write the replies
+
+def state(manager: GameManager, code: str) -> dict:
+    game = manager.games[code]
+    return {
+        "status": game["status"],
+        "teams": sorted((t.name, t.score, sorted(t.solves)) for t in game["teams"].values()),
+        "stats": dict(game["challenge_stats"]),
+        "connections": sorted((p.name, p.connections) for _, p in game["players"].values())
+    }
+
+async def settle(*managers: GameManager, code: str):
+    # Wait for the relay to deliver every committed event everywhere
+    for _ in range(200):
+        await asyncio.sleep(0.01)
+        seqs = {m.backend.seq.get(code) for m in managers}
+        states = [state(m, code) for m in managers]
+        if len(seqs) == 1 and all(s == states[0] for s in states): return
+    raise AssertionError(f"workers did not converge: {[state(m, code) for m in managers]}")
+
+def check(label: str, ok: bool, detail=""):
+    print(f"ok   {label}" if ok else f"FAIL {label}: {detail}")
+    if not ok: sys.exit(1)
+
+async def main():
+    server = fakeredis.FakeServer()
+    a, b = worker(server), worker(server)
+    challenge, second = PREMADE_CHALLENGES[:2]
+    code, token = await a.create_game(GameConfig(challenges=PREMADE_CHALLENGES, duration_seconds=600))
+    check("worker B loads the game from Redis", await b.get_game(code) is not None)
+
+    admin = connect(a, code, "admin")
+    await command(a, code, "on_admin_auth", admin, {"token": token})
+    check("admin authenticated on A", admin.got("ADMIN_CONFIRMED"))
+
+    alice = connect(b, code, "alice")
+    await command(b, code, "on_join", alice, {"type": "CREATE_TEAM", "nickname": "alice", "teamName": "red"})
+    bob = connect(a, code, "bob")
+    team_id = next(iter(b.games[code]["teams"]))
+    await settle(a, b, code=code)
+    await command(a, code, "on_join", bob, {"type": "JOIN_TEAM", "nickname": "bob", "teamCode": team_id})
+    await settle(a, b, code=code)
+    check("joins on either worker reach both", state(a, code)["teams"] == [("red", 0, [])], state(a, code)["teams"])
+    check("presence is relayed", state(b, code)["connections"] == [("alice", 1), ("bob", 1)], state(b, code)["connections"])
+
+    # Same nickname on both workers at once: the game lock lets exactly one in
+    racers = [connect(a, code, "carol-a"), connect(b, code, "carol-b")]
+    await asyncio.gather(
+        command(a, code, "on_join", racers[0], {"type": "JOIN_SOLO", "nickname": "carol"}),
+        command(b, code, "on_join", racers[1], {"type": "JOIN_SOLO", "nickname": "carol"})
+    )
+    await settle(a, b, code=code)
+    joined = [s.name for s in racers if s.got("PLAYER_CONFIRMED")]
+    check("concurrent joins with one nickname admit one", len(joined) == 1 and len(a.games[code]["teams"]) == 2, joined)
+
+    await command(a, code, "on_start_game", admin, {})
+    await command(b, code, "on_submit_flag", alice, {"challengeId": challenge.id, "flag": challenge.flag})
+    await settle(a, b, code=code)
+    check("solve on B is confirmed to its player", alice.got("SOLVE_CONFIRMED"))
+    check("solve on B reaches A", ("red", challenge.points, [challenge.id]) in state(a, code)["teams"], state(a, code)["teams"])
+    check("teammate on A hears about it", any(m.get("type") == "TOAST" and "solved" in m["msg"] for m in bob.received))
+
+    # A misses a published event: the next one shows the seq gap and A reads the tail from Redis
+    a.backend.listener.cancel()
+    a.backend.listener = None
+    await command(b, code, "on_submit_flag", alice, {"challengeId": second.id, "flag": second.flag})
+    while await a.backend.pubsub.get_message(timeout=0.05): pass
+    a.backend.listener = asyncio.create_task(a.backend.listen())
+    dave = connect(b, code, "dave")
+    await command(b, code, "on_join", dave, {"type": "JOIN_SOLO", "nickname": "dave"})
+    await settle(a, b, code=code)
+    check("a missed event is read back after the gap", state(a, code) == state(b, code), state(a, code))
+
+    c = worker(server)
+    await c.get_game(code)
+    await settle(a, b, c, code=code)
+    check("a third worker replays the event list", state(c, code) == state(b, code), state(c, code))
+
+    for manager in (a, b, c):
+        for game in manager.games.values(): manager.stop_clock(game)
+        await manager.backend.stop()
+    print(f"{b.backend.seq[code]} events, 3 workers in agreement")
+
+if __name__ == "__main__":
+    asyncio.run(main())
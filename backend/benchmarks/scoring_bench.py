@@ -0,0 +1,86 @@
+"""
+Cost of one solve under each scoring model, as the number of teams grows.
+
+Run from backend/:  python benchmarks/scoring_bench.py [teams ...]
+
+Every team solves the same challenge in turn (the worst case for
+retroactive scoring: the n-th solve moves n-1 earlier awards), and some
+teams hold a hint for it. Per solve, the engine's deltas are applied to
+the affected players and teams and they are re-ranked together, as
+GameManager.apply_solve does. The baseline rescores every team from all
+awards after each solve, which is what retroactive scoring costs without
+incremental deltas.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from challenges import Challenge
+from game_models import Player, Team
+from leaderboard import Leaderboard
+from scoring import SCORING_MODELS, ScoringEngine
+
+CHALLENGE = Challenge(id="chal", title="Challenge", category="web", points=500, min_points=100, decay=20, desc="", flag="flag{x}")
+DECAY = {"static": 20, "linear": 2, "log": 40, "ctfd": 200} # Roughly comparable slopes
+
+def build(teams: int):
+    board = Leaderboard()
+    players = []
+    for t in range(teams):
+        team = Team(f"team {t}")
+        player = Player(f"player {t}")
+        team.add_member(player)
+        board.add(team)
+        players.append((team, player))
+    return board, players
+
+def run(model: str, teams: int) -> float:
+    challenge = CHALLENGE.model_copy(update={"decay": DECAY[model]})
+    engine = ScoringEngine(SCORING_MODELS[model], {challenge.id: challenge})
+    board, players = build(teams)
+    by_id = {player.id: (team, player) for team, player in players}
+    started = time.perf_counter()
+    for solves, (team, player) in enumerate(players, start=1):
+        penalty = 50 if solves % 5 == 0 else 0
+        points = engine.points(challenge.id, solves - 1, penalty)
+        team.record_solve(player, challenge.id, points, time.time())
+        board.update(team)
+        moved = []
+        for award, delta in engine.solve(challenge.id, solves, team.id, player.id, points, penalty):
+            t, p = by_id[award.player_id]
+            t.adjust(p, delta)
+            moved.append(t)
+        board.update_many(moved)
+    return (time.perf_counter() - started) / teams
+
+def run_full(teams: int) -> float:
+    # Retroactive linear scoring, rescoring every team from scratch per solve
+    challenge = CHALLENGE.model_copy(update={"decay": DECAY["linear"]})
+    model = SCORING_MODELS["linear"]
+    board, players = build(teams)
+    awards = []
+    started = time.perf_counter()
+    for solves, (team, player) in enumerate(players, start=1):
+        awards.append((team, player, 50 if solves % 5 == 0 else 0))
+        value = model.value(challenge, solves)
+        for t, p in {(t, p) for t, p, _ in awards} | set(players):
+            p.score = 0
+            t.score = 0
+        for t, p, penalty in awards:
+            points = max(value - penalty, 0)
+            p.score += points
+            t.score += points
+        board.update_many([t for t, _ in players])
+    return (time.perf_counter() - started) / teams
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 300, 1000]
+    print(f"{'teams':>6} " + " ".join(f"{name:>10}" for name in SCORING_MODELS) + f" {'full rescore':>13}   (ms per solve, mean)")
+    for teams in sizes:
+        row = [run(name, teams) * 1000 for name in SCORING_MODELS]
+        print(f"{teams:>6} " + " ".join(f"{ms:>10.3f}" for ms in row) + f" {run_full(teams) * 1000:>13.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from challenges import Challenge
+from codec import JsonCodec
+
+logger = logging.getLogger("uvicorn.error")
+
+JSON = JsonCodec("json")
+PACK_FILE = "pack.json"
+SUMMARY_CHARS = 160
+MAX_PAGE = 200
+PAGE_CACHE_SIZE = 256 # Encoded pages kept, by query
+DETAIL_CACHE_SIZE = 512 # Challenges kept with their lazily read description
+
+def etag_of(*parts: bytes) -> str:
+    return '"' + hashlib.blake2b(b"\0".join(parts), digest_size=8).hexdigest() + '"'
+
+# --- CATALOG ---
+class CatalogEntry:
+    __slots__ = ("challenge", "tags", "pack", "desc_path", "title", "summary")
+
+    def __init__(self, challenge: Challenge, tags: List[str], pack: str, desc_path: Optional[str]):
+        self.challenge = challenge # The flag never leaves the server; see public()
+        self.tags = tags
+        self.pack = pack
+        self.desc_path = desc_path # Read on first use when the description is a file
+        self.title = challenge.title.casefold() # What searches match against
+        self.summary = JSON.encode({
+            "id": challenge.id,
+            "title": challenge.title,
+            "category": challenge.category,
+            "points": challenge.points,
+            "tags": tags,
+            "pack": pack,
+            "summary": challenge.desc[:SUMMARY_CHARS]
+        })
+
+class ChallengeCatalog:
+    """
+    The pre-made challenges organizers pick from: the built-in ones, then every
+    pack under `directory`, a folder with a `pack.json` holding
+    {"challenges": [...]}. Pack challenges are Challenge fields plus `tags`,
+    and may give `desc_file` (relative to the pack) instead of `desc`; their
+    ids become `<pack>.<id>` and `files` paths are served from the pack at
+    `files_url`.
+
+    Loading runs in a thread after startup and only parses pack.json files;
+    descriptions in files are read when a challenge is first opened, and
+    attached files when first downloaded. Entries are kept in browsing order
+    (category, points, title) with indexes by category, tag and points, and
+    each one's listing JSON is encoded once, so a page is a join of ready
+    bytes. Pages and challenge details carry an ETag, and the catalog never
+    changes once loaded, so the tag of a page is known before building it.
+    """
+
+    def __init__(self, builtin: List[Challenge], directory: Optional[str], files_url: str = "/packs"):
+        self.builtin = builtin
+        self.directory = directory
+        self.files_url = files_url
+        self.entries: List[CatalogEntry] = []
+        self.by_id: Dict[str, int] = {}
+        self.by_category: Dict[str, List[int]] = {}
+        self.by_tag: Dict[str, List[int]] = {}
+        self.by_points: List[Tuple[int, int]] = [] # Sorted (points, position)
+        self.files: Set[str] = set() # "<pack>/<path>" of every attached file; nothing else in a pack is served
+        self.facets = b"{}"
+        self.digest = b""
+        self.pages: OrderedDict = OrderedDict() # Query -> (etag, body), least recent first
+        self.details: OrderedDict = OrderedDict() # Challenge id -> (etag, body, challenge)
+        self.loading: Optional[asyncio.Task] = None
+
+    def start(self):
+        # Called at startup; requests that need the catalog wait for it
+        self.loading = asyncio.create_task(asyncio.to_thread(self.load))
+
+    async def ready(self):
+        if self.loading is None: self.start()
+        await self.loading
+
+    # --- LOADING ---
+    def load(self):
+        found = [(c, [], "builtin", None, []) for c in self.builtin]
+        if self.directory and os.path.isdir(self.directory):
+            for pack in sorted(os.listdir(self.directory)):
+                found.extend(self.read_pack(pack))
+
+        found.sort(key=lambda f: (f[0].category, f[0].points, f[0].title, f[0].id))
+        for challenge, tags, pack, desc_path, files in found:
+            if challenge.id in self.by_id:
+                logger.warning("Catalog: duplicate challenge id %s in pack %s, skipped", challenge.id, pack)
+                continue
+            position = len(self.entries)
+            self.entries.append(CatalogEntry(challenge, tags, pack, desc_path))
+            self.files.update(files) # Only once the challenge is in the catalog
+            self.by_id[challenge.id] = position
+            self.by_category.setdefault(challenge.category, []).append(position)
+            for tag in tags: self.by_tag.setdefault(tag, []).append(position)
+            self.by_points.append((challenge.points, position))
+        self.by_points.sort()
+
+        self.facets = JSON.encode({
+            "categories": {name: len(ids) for name, ids in sorted(self.by_category.items())},
+            "tags": {name: len(ids) for name, ids in sorted(self.by_tag.items())}
+        })
+        hasher = hashlib.blake2b(digest_size=16)
+        for entry in self.entries: hasher.update(entry.summary)
+        self.digest = hasher.digest()
+        logger.info("Catalog: %d challenges", len(self.entries))
+
+    def read_pack(self, pack: str) -> List[tuple]:
+        root = os.path.join(self.directory, pack)
+        try:
+            with open(os.path.join(root, PACK_FILE), "rb") as f:
+                raw = json.loads(f.read())["challenges"]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Catalog: pack %s not loaded: %s", pack, e)
+            return []
+
+        found = []
+        for item in raw:
+            try:
+                item = dict(item)
+                tags = list(dict.fromkeys(str(t) for t in item.pop("tags", []))) # Once each, in order
+                desc_file = item.pop("desc_file", None)
+                files = [self.file_url(pack, f) for f in item.get("files", [])]
+                item.update({
+                    "id": f"{pack}.{item['id']}",
+                    "desc": item.get("desc", item.get("summary", "")), # Stands in for desc_file in listings
+                    "files": [url for url, _ in files],
+                    "is_premade": True
+                })
+                challenge = Challenge(**item)
+                if not challenge.flag: raise ValueError("no flag")
+                desc_path = os.path.join(root, desc_file) if desc_file else None
+                found.append((challenge, tags, pack, desc_path, [path for _, path in files]))
+            except (ValueError, KeyError, TypeError, AttributeError) as e: # ValidationError is a ValueError
+                logger.warning("Catalog: challenge %r in pack %s skipped: %s", item.get("id") if isinstance(item, dict) else item, pack, e)
+        return found
+
+    def file_url(self, pack: str, file: str) -> Tuple[str, str]:
+        # "Display name|path" like uploads; the path is relative to the pack.
+        # Returns the URL and the path to serve under it
+        name, _, path = file.rpartition("|")
+        path = f"{pack}/{path.lstrip('/')}"
+        return (f"{name}|{self.files_url}/{path}" if name else f"{self.files_url}/{path}"), path
+
+    # --- QUERIES ---
+    def query_key(self, category: Optional[str], tag: Optional[str], min_points: Optional[int],
+                  max_points: Optional[int], search: Optional[str], offset: int, limit: int) -> tuple:
+        return (category, tag, min_points, max_points, (search or "").strip().casefold() or None, max(offset, 0), min(max(limit, 1), MAX_PAGE))
+
+    def page_etag(self, key: tuple) -> str:
+        return etag_of(self.digest, repr(key).encode())
+
+    def page(self, key: tuple) -> Tuple[str, bytes]:
+        cached = self.pages.get(key)
+        if cached:
+            self.pages.move_to_end(key)
+            return cached
+
+        category, tag, min_points, max_points, search, offset, limit = key
+        positions = self.filter(category, tag, min_points, max_points, search)
+        body = b'{"total":%d,"offset":%d,"limit":%d,"facets":%b,"items":[%b]}' % (
+            len(positions), offset, limit, self.facets,
+            b",".join(self.entries[p].summary for p in positions[offset:offset + limit])
+        )
+        cached = self.pages[key] = (self.page_etag(key), body)
+        if len(self.pages) > PAGE_CACHE_SIZE: self.pages.popitem(last=False)
+        return cached
+
+    def filter(self, category, tag, min_points, max_points, search) -> List[int]:
+        # Start from the narrowest index, then check the rest per entry
+        lists = []
+        if category is not None: lists.append(self.by_category.get(category, []))
+        if tag is not None: lists.append(self.by_tag.get(tag, []))
+        if min_points is not None or max_points is not None:
+            lo = bisect_left(self.by_points, (min_points if min_points is not None else -2**63, -1))
+            hi = bisect_right(self.by_points, (max_points if max_points is not None else 2**63, len(self.entries)))
+            lists.append(sorted(p for _, p in self.by_points[lo:hi]))
+        if not lists: positions = range(len(self.entries))
+        else:
+            lists.sort(key=len)
+            positions = lists[0]
+            for other in lists[1:]:
+                allowed = set(other)
+                positions = [p for p in positions if p in allowed]
+        if search is None: return list(positions)
+        entries = self.entries
+        return [p for p in positions if search in entries[p].title]
+
+    async def challenge(self, challenge_id: str) -> Optional[Challenge]:
+        detail = await self.detail(challenge_id)
+        return detail[2] if detail else None
+
+    async def detail(self, challenge_id: str) -> Optional[Tuple[str, bytes, Challenge]]:
+        # One challenge with its whole description, for adding it to a game
+        cached = self.details.get(challenge_id)
+        if cached:
+            self.details.move_to_end(challenge_id)
+            return cached
+        position = self.by_id.get(challenge_id)
+        if position is None: return None
+
+        entry = self.entries[position]
+        challenge = entry.challenge
+        if entry.desc_path:
+            try:
+                desc = await asyncio.to_thread(read_text, entry.desc_path)
+                challenge = challenge.model_copy(update={"desc": desc})
+            except OSError as e:
+                logger.warning("Catalog: description of %s not readable: %s", challenge_id, e)
+        body = JSON.encode({**public(challenge), "tags": entry.tags, "pack": entry.pack})
+        cached = self.details[challenge_id] = (etag_of(self.digest, body), body, challenge)
+        if len(self.details) > DETAIL_CACHE_SIZE: self.details.popitem(last=False)
+        return cached
+
+    async def resolve(self, chosen: Challenge) -> Optional[Challenge]:
+        # A pre-made challenge as sent by the create page: content and flag come
+        # from the catalog, scoring and hint costs from the organizer. Raises
+        # ValueError if anything else about its hints was changed
+        original = await self.challenge(chosen.id)
+        if original is None: return None
+        if [(h.id, h.content) for h in chosen.hints] != [(h.id, h.content) for h in original.hints]:
+            raise ValueError(f"Only hint costs can be changed on pre-made challenge {chosen.id}")
+        return original.model_copy(update={
+            "points": chosen.points,
+            "min_points": chosen.min_points,
+            "decay": chosen.decay,
+            "hints": [h.model_copy(update={"cost": c.cost}) for h, c in zip(original.hints, chosen.hints)]
+        })
+
+def public(challenge: Challenge) -> dict:
+    return challenge.model_dump(exclude={"flag", "flags"})
+
+def read_text(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,49 @@
+import hashlib
+import json
+import weakref
+from typing import Dict, List
+
+from challenges import Challenge
+from flags import FlagMatcher, compile_flag, flag_mask
+
+# --- CHALLENGE SETS ---
+class ChallengeSet:
+    """
+    Everything a game derives from its challenges alone: the challenges by id,
+    hint positions and content, compiled flag matchers and flag masks.
+
+    It is read-only and shared by every game created with the same challenges
+    (see intern_challenges), so a league of identical games holds one copy
+    and each game keeps only what changes as it is played.
+    """
+    __slots__ = ("digest", "challenges", "by_id", "hint_index", "hint_content", "flags", "flag_masks", "__weakref__")
+
+    def __init__(self, digest: bytes, challenges: List[Challenge]):
+        self.digest = digest
+        self.challenges = challenges
+        self.by_id: Dict[str, Challenge] = {c.id: c for c in challenges}
+        self.hint_index = {c.id: {h.id: i for i, h in enumerate(c.hints)} for c in challenges}
+        self.hint_content = {c.id: {h.id: h.content for h in c.hints} for c in challenges}
+        self.flags: Dict[str, FlagMatcher] = {c.id: compile_flag(c) for c in challenges} # Built once per set
+        self.flag_masks = {c.id: flag_mask(c) for c in challenges}
+
+# Lives as long as some game holds it
+_INTERNED: "weakref.WeakValueDictionary[bytes, ChallengeSet]" = weakref.WeakValueDictionary()
+
+def digest_challenges(challenges: List[Challenge]) -> bytes:
+    dumped = json.dumps([c.model_dump() for c in challenges], sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(dumped.encode(), digest_size=16).digest()
+
+def intern_challenges(challenges: List[Challenge]) -> ChallengeSet:
+    # The set already held for identical challenges, whoever created or restored it.
+    # Games made from one config hold the set's own list, found without hashing
+    for shared in _INTERNED.values():
+        if shared.challenges is challenges: return shared
+    digest = digest_challenges(challenges)
+    shared = _INTERNED.get(digest)
+    if shared is None:
+        shared = _INTERNED[digest] = ChallengeSet(digest, challenges)
+    return shared
+
+def interned_count() -> int:
+    return len(_INTERNED)
@@ -1,12 +1,17 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, model_validator
+from typing import List, Literal, Optional
 
+from flags import check_flag
+
+# Frozen: one validated set of challenges is shared by every game created with it
 class Hint(BaseModel):
+    model_config = ConfigDict(frozen=True)
     id: str
     content: str
     cost: int
 
 class Challenge(BaseModel):
+    model_config = ConfigDict(frozen=True)
     id: str
     title: str
     category: str
@@ -14,11 +19,21 @@ class Challenge(BaseModel):
     min_points: int
     decay: int
     desc: str
-    flag: str
+    flag: str = "" # The pattern for regex flags, prefix{secret} for dynamic ones (see flags.py). Pre-made ones get theirs from the catalog
+    flag_type: Literal["exact", "case_insensitive", "regex", "dynamic"] = "exact"
+    flags: List[str] = [] # Also accepted, for exact and case_insensitive
     files: List[str] = []
     hints: List[Hint] = []
     is_premade: bool = False
 
+    @model_validator(mode="after")
+    def check_flag(self):
+        # Refused at /api/create rather than on the first submission
+        if not self.flag and not self.is_premade:
+            raise ValueError("A flag is required")
+        if self.flag: check_flag(self.flag_type, self.flag, self.flags) # Pre-made ones are checked when the catalog loads
+        return self
+
 PREMADE_CHALLENGES = [
     Challenge(id="misc1", title="Sanity Check", category="MISC", points=100, min_points=100, decay=0, desc="The flag is flag{welcome}", flag="flag{welcome}", files=[], is_premade=True, hints=[
         Hint(id="misc1_h1", content="Just put the flag in the box", cost=10)
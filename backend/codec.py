@@ -0,0 +1,182 @@
+import json
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError: # Optional; the stdlib encoder is used without it
+    orjson = None
+
+try:
+    import msgpack
+except ImportError: # Optional; msgpack subprotocols are only offered with it
+    msgpack = None
+
+Frame = Union[str, bytes] # Text frame or binary frame
+
+SUBPROTOCOL_PREFIX = "dashflag."
+COMPRESS_LEVEL = 6
+
+# --- CODECS ---
+class Codec(ABC):
+    """
+    How messages to one websocket are encoded, picked by the client at connect
+    time through the websocket subprotocol (`dashflag.json`, `dashflag.msgpack`,
+    either with `+deflate`). Clients that ask for nothing get plain JSON.
+
+    Besides whole messages, a codec can encode a set of extra top-level fields
+    on their own and splice them into an already encoded message, which is how
+    one shared LOBBY_UPDATE is combined with each team's private hint fields
+    without encoding the snapshot again per team. A splice is a short head, the
+    shared body and a short tail.
+
+    With `+deflate`, frames of at least `compress_min_bytes` are sent as a
+    binary frame holding the zlib-compressed encoding. Broadcasts compress once
+    per game rather than once per socket, as permessage-deflate would: the
+    shared body is fed to a compressor once and each team's frame finishes a
+    copy of it with its own tail.
+    """
+    text = False # Uncompressed frames go out as text rather than binary
+
+    def __init__(self, name: str, compress_min_bytes: Optional[int] = None):
+        self.name = name
+        self.compress_min_bytes = compress_min_bytes # None = never compress
+
+    @abstractmethod
+    def encode(self, msg: dict) -> bytes:
+        pass
+
+    @abstractmethod
+    def fragment(self, fields: dict):
+        pass
+
+    @abstractmethod
+    def parts(self, encoded: bytes, fragment) -> Tuple[bytes, bytes, bytes]:
+        pass
+
+    @abstractmethod
+    def decode(self, data: Frame) -> dict:
+        pass
+
+    def compresses(self, size: int) -> bool:
+        return self.compress_min_bytes is not None and size >= self.compress_min_bytes
+
+    def finish(self, encoded: bytes) -> Frame:
+        # zlib streams start with 0x78, which is never the first byte of a JSON or msgpack map
+        if self.compresses(len(encoded)): return zlib.compress(encoded, COMPRESS_LEVEL)
+        return encoded.decode() if self.text else encoded
+
+class JsonCodec(Codec):
+    text = True
+
+    def encode(self, msg: dict) -> bytes:
+        if orjson: return orjson.dumps(msg)
+        return json.dumps(msg, separators=(",", ":")).encode()
+
+    def fragment(self, fields: dict) -> bytes:
+        # '"a":1,"b":2' with a leading comma, ready to go before the closing brace
+        return b"," + self.encode(fields)[1:-1] if fields else b""
+
+    def parts(self, encoded: bytes, fragment: bytes) -> Tuple[bytes, bytes, bytes]:
+        return b"", encoded[:-1], fragment + b"}"
+
+    def decode(self, data: Frame) -> dict:
+        return orjson.loads(data) if orjson else json.loads(data)
+
+class MsgpackCodec(Codec):
+    def encode(self, msg: dict) -> bytes:
+        return msgpack.packb(msg)
+
+    def fragment(self, fields: dict) -> Tuple[int, bytes]:
+        return len(fields), b"".join(msgpack.packb(k) + msgpack.packb(v) for k, v in fields.items())
+
+    def parts(self, encoded: bytes, fragment: Tuple[int, bytes]) -> Tuple[bytes, bytes, bytes]:
+        # A msgpack map is its entry count followed by the entries, so appending
+        # entries only means rewriting the header
+        extra, body = fragment
+        first = encoded[0]
+        if 0x80 <= first <= 0x8f: count, start = first & 0x0f, 1
+        elif first == 0xde: count, start = int.from_bytes(encoded[1:3], "big"), 3
+        else: count, start = int.from_bytes(encoded[1:5], "big"), 5
+        count += extra
+        if count < 16: header = bytes([0x80 | count])
+        elif count < 65536: header = b"\xde" + count.to_bytes(2, "big")
+        else: header = b"\xdf" + count.to_bytes(4, "big")
+        return header, encoded[start:], body
+
+    def decode(self, data: Frame) -> dict:
+        # Clients may still send JSON text and only read msgpack
+        if isinstance(data, str): return json.loads(data)
+        return msgpack.unpackb(data)
+
+def build_codecs(compress_min_bytes: int) -> Dict[str, Codec]:
+    """Subprotocol name -> codec, for every format available here."""
+    formats = {"json": JsonCodec}
+    if msgpack: formats["msgpack"] = MsgpackCodec
+    codecs = {}
+    for name, cls in formats.items():
+        codecs[SUBPROTOCOL_PREFIX + name] = cls(name)
+        codecs[SUBPROTOCOL_PREFIX + name + "+deflate"] = cls(name + "+deflate", compress_min_bytes)
+    return codecs
+
+def negotiate(codecs: Dict[str, Codec], offered: List[str]) -> Tuple[Optional[str], Codec]:
+    # First supported subprotocol in the client's order of preference
+    for subprotocol in offered:
+        if subprotocol in codecs: return subprotocol, codecs[subprotocol]
+    return None, codecs[SUBPROTOCOL_PREFIX + "json"]
+
+# --- ENCODED MESSAGES ---
+class Frames:
+    """One outbound message, encoded at most once per codec however many sockets it goes to."""
+    __slots__ = ("msg", "frames")
+
+    def __init__(self, msg: Optional[dict]):
+        self.msg = msg
+        self.frames: Dict[Codec, Frame] = {}
+
+    def build(self, codec: Codec) -> Frame:
+        return codec.finish(codec.encode(self.msg))
+
+    def get(self, codec: Codec) -> Frame:
+        frame = self.frames.get(codec)
+        if frame is None:
+            frame = self.frames[codec] = self.build(codec)
+        return frame
+
+class Shared(Frames):
+    """A message that per-team variants are spliced from; see Spliced."""
+    __slots__ = ("encoded", "primed")
+
+    def __init__(self, msg: dict):
+        super().__init__(msg)
+        self.encoded: Dict[Codec, bytes] = {}
+        self.primed: Dict[tuple, tuple] = {} # (codec, head) -> (output so far, compressor fed head + body)
+
+    def splice(self, codec: Codec, fragment) -> Frame:
+        encoded = self.encoded.get(codec)
+        if encoded is None:
+            encoded = self.encoded[codec] = codec.encode(self.msg)
+        head, body, tail = codec.parts(encoded, fragment)
+        if not codec.compresses(len(head) + len(body) + len(tail)):
+            return codec.finish(head + body + tail)
+
+        primed = self.primed.get((codec, head))
+        if primed is None:
+            compressor = zlib.compressobj(COMPRESS_LEVEL)
+            primed = self.primed[codec, head] = (compressor.compress(head + body), compressor)
+        output, compressor = primed
+        compressor = compressor.copy()
+        return output + compressor.compress(tail) + compressor.flush()
+
+class Spliced(Frames):
+    """A Shared message plus fields of its own (a team's hints), reusing the shared encoding."""
+    __slots__ = ("base", "fragment")
+
+    def __init__(self, base: Shared, fragment: Callable[[Codec], object]):
+        super().__init__(None)
+        self.base = base
+        self.fragment = fragment
+
+    def build(self, codec: Codec) -> Frame:
+        return self.base.splice(codec, self.fragment(codec))
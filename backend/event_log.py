@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("uvicorn.error")
+
+# --- EVENT LOG ---
+class EventLog:
+    """
+    Append-only per-game event files with batched fsync and periodic snapshots.
+
+    Layout under `directory`, one folder per game code:
+        meta.json             config and admin token, written once
+        snapshot.json         {"seq": n, "state": {...}}, replaced atomically
+        events-<start>.log    one JSON line [seq, event] per committed event
+
+    append() is a single unbuffered write(2) so a crashed process loses
+    nothing; the OS buffers are fsynced together every `sync_interval` seconds
+    by a background task, so at most that window is lost on power failure.
+    The fsyncs run on the same single writer thread that closes rotated
+    segments and removes dropped games, so a segment is never closed under
+    them, and a game whose fsync fails is retried on the next round.
+    Every `snapshot_every` events the caller hands over a full state dict;
+    it is written off the event loop and a new segment is started, after
+    which older segments are deleted. Recovery loads the snapshot and
+    replays only the events after it.
+    """
+
+    def __init__(self, directory: str, sync_interval: float = 0.05, snapshot_every: int = 500):
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.fds: Dict[str, int] = {} # game code -> open segment
+        self.seq: Dict[str, int] = {} # game code -> last event seq written
+        self.since_snapshot: Dict[str, int] = {}
+        self.dirty = set()
+        self.syncer: Optional[asyncio.Task] = None
+        self.writer = ThreadPoolExecutor(max_workers=1) # Keeps snapshot writes in order
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, code: str, name: str = "") -> str:
+        return os.path.join(self.directory, code, name)
+
+    def codes(self) -> List[str]:
+        return [c for c in os.listdir(self.directory) if os.path.exists(self.path(c, "meta.json"))]
+
+    def start(self):
+        self.syncer = asyncio.create_task(self.sync_forever())
+
+    async def stop(self):
+        if self.syncer: self.syncer.cancel()
+        try: await self.sync()
+        except OSError as e: logger.error("Event log: final fsync failed, recent events may be lost: %s", e)
+        for fd in self.fds.values(): os.close(fd)
+        self.fds = {}
+        self.writer.shutdown()
+
+    # --- WRITING ---
+    async def create(self, code: str, meta: dict):
+        # meta.json is fsynced, so it is written off the loop; bulk creation writes many at once
+        await asyncio.to_thread(write_meta, self.path(code), json.dumps(meta))
+        self.open_segment(code, 1)
+        self.seq[code] = 0
+        self.since_snapshot[code] = 0
+
+    def open_segment(self, code: str, start: int):
+        if code in self.fds:
+            # The old segment may hold unsynced events; sync it off the loop
+            self.writer.submit(close_synced, self.fds[code])
+        path = self.path(code, f"events-{start:010d}.log")
+        self.fds[code] = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def append(self, code: str, event: dict) -> bool:
+        # Returns True when the caller should hand over a snapshot
+        self.seq[code] += 1
+        os.write(self.fds[code], (json.dumps([self.seq[code], event], separators=(",", ":")) + "\n").encode())
+        self.dirty.add(code)
+        self.since_snapshot[code] += 1
+        return self.since_snapshot[code] >= self.snapshot_every
+
+    def snapshot(self, code: str, state: dict):
+        # Encode now, while state is consistent; write and clean up off the loop
+        seq = self.seq[code]
+        text = json.dumps({"seq": seq, "state": state}, separators=(",", ":"))
+        self.since_snapshot[code] = 0
+        self.open_segment(code, seq + 1)
+        self.writer.submit(self.write_snapshot, code, seq, text)
+
+    def write_snapshot(self, code: str, seq: int, text: str):
+        write_atomic(self.path(code, "snapshot.json"), text)
+        for start, path in self.segments(code):
+            if start <= seq: os.remove(path)
+
+    def drop(self, code: str):
+        # After any snapshot still being written for it, like everything on the writer
+        fd = self.fds.pop(code, None)
+        self.seq.pop(code, None)
+        self.since_snapshot.pop(code, None)
+        self.dirty.discard(code)
+        self.writer.submit(remove_game, fd, self.path(code))
+
+    async def sync(self):
+        # On the writer, queued behind any close or removal of the fds taken here
+        dirty, self.dirty = self.dirty, set()
+        fds = {code: self.fds[code] for code in dirty if code in self.fds}
+        if not fds: return
+        failed = await asyncio.get_running_loop().run_in_executor(self.writer, sync_all, fds)
+        if failed:
+            self.dirty.update(code for code in failed if code in self.fds) # Dropped games stay dropped
+            raise next(iter(failed.values()))
+
+    async def sync_forever(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try: await self.sync()
+            except OSError as e: logger.warning("Event log: fsync failed, retrying: %s", e)
+
+    # --- RECOVERY ---
+    def segments(self, code: str) -> List[Tuple[int, str]]:
+        found = []
+        for name in os.listdir(self.path(code)):
+            if name.startswith("events-") and name.endswith(".log"):
+                found.append((int(name[7:-4]), self.path(code, name)))
+        return sorted(found)
+
+    def load(self, code: str) -> Optional[Tuple[dict, Optional[dict], List[dict]]]:
+        """Meta, latest snapshot state (or None) and the events after it."""
+        if not os.path.exists(self.path(code, "meta.json")): return None
+        with open(self.path(code, "meta.json")) as f:
+            meta = json.load(f)
+
+        seq, state = 0, None
+        if os.path.exists(self.path(code, "snapshot.json")):
+            with open(self.path(code, "snapshot.json")) as f:
+                snapshot = json.load(f)
+            seq, state = snapshot["seq"], snapshot["state"]
+
+        events = []
+        for _, path in self.segments(code):
+            with open(path, "rb") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"): raise ValueError
+                        event_seq, event = json.loads(line)
+                    except ValueError:
+                        os.truncate(path, offset) # Torn write at the tail
+                        break
+                    offset += len(line)
+                    if event_seq > seq:
+                        events.append(event)
+                        seq = event_seq
+
+        self.seq[code] = seq
+        self.since_snapshot[code] = len(events)
+        self.open_segment(code, seq + 1)
+        return meta, state, events
+
+def write_meta(directory: str, text: str):
+    os.makedirs(directory, exist_ok=True)
+    write_atomic(os.path.join(directory, "meta.json"), text)
+
+def write_atomic(path: str, text: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def sync_all(fds: Dict[str, int]) -> Dict[str, OSError]:
+    # One failure doesn't stop the rest; returns the failures by game code
+    failed = {}
+    for code, fd in fds.items():
+        try: os.fsync(fd)
+        except OSError as e: failed[code] = e
+    return failed
+
+def close_synced(fd: int):
+    os.fsync(fd)
+    os.close(fd)
+
+def remove_game(fd: Optional[int], path: str):
+    if fd is not None: os.close(fd)
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,281 @@
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import secrets
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, FileResponse
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError: # Releases before 0.0.13 install it as `multipart`
+    from multipart.multipart import MultipartParser, parse_options_header
+
+CHUNK_BYTES = 1024 * 1024
+FRAMING_BYTES = 64 * 1024 # Multipart boundaries, part headers and small fields around the file
+DIGEST_DIR = re.compile(r"^[0-9a-f]{64}/")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+# Served pre-compressed when the client accepts it; tried in this order
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+
+class UploadTooLarge(Exception):
+    pass
+
+class UploadInvalid(Exception):
+    pass
+
+# --- FILE STORE ---
+class FileStore:
+    """
+    Content-addressed storage and delivery for challenge files.
+
+    Uploads are parsed from the request body as it arrives, so nothing is
+    spooled first: the file part is hashed and written once to a temp file
+    from a worker thread, and the body is cut off as soon as it passes
+    `max_bytes`, whether or not a Content-Length was declared.
+    The finished file lands at `<sha256>/<filename>`; if that digest is
+    already stored, the temp copy is dropped and the existing path returned.
+    Compressible files also get a `.gz` sibling.
+
+    Downloads carry a strong ETag (the digest, or a hash computed once for
+    older uploads), are marked immutable when content-addressed, honour
+    If-None-Match and single byte ranges, and use a `.br`/`.gz` sibling
+    when the client accepts it. Files up to `cache_file_bytes` are kept in
+    an LRU bounded by `cache_bytes`, and concurrent misses on the same file
+    share one disk read, so the start-of-game rush is served from memory.
+    Larger files are streamed from disk by FileResponse.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, cache_bytes: int = 64 * 1024 * 1024, cache_file_bytes: int = 8 * 1024 * 1024):
+        self.directory = directory
+        self.root = os.path.realpath(directory)
+        self.max_bytes = max_bytes
+        self.cache_bytes = cache_bytes
+        self.cache_file_bytes = cache_file_bytes
+        self.cache: OrderedDict = OrderedDict() # (path, mtime) -> bytes, least recent first
+        self.cached_bytes = 0
+        self.reads: Dict[tuple, asyncio.Future] = {} # In-flight disk reads
+        self.etags: Dict[tuple, str] = {} # (path, mtime, size) -> hash, for non-addressed files
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def max_body_bytes(self) -> int:
+        return self.max_bytes + FRAMING_BYTES
+
+    async def save(self, request: Request, field: str = "file") -> Tuple[str, bool]:
+        """
+        Stores the `field` file of a multipart/form-data request. Returns (path
+        relative to the store, whether it was a duplicate).
+        """
+        _, params = parse_options_header(request.headers.get("content-type", ""))
+        if b"boundary" not in params: raise UploadInvalid("Expected a multipart/form-data body")
+        part = FilePart(field.encode())
+        parser = MultipartParser(params[b"boundary"], part.callbacks())
+        tmp_path = os.path.join(self.directory, f".upload-{secrets.token_hex(8)}")
+        digest = hashlib.sha256()
+        received = size = 0
+
+        try:
+            with open(tmp_path, "wb") as out:
+                async for chunk in request.stream():
+                    received += len(chunk)
+                    if received > self.max_body_bytes: raise UploadTooLarge()
+                    parser.write(chunk)
+                    if not part.data: continue
+                    data = b"".join(part.data)
+                    part.data.clear()
+                    size += len(data)
+                    if size > self.max_bytes: raise UploadTooLarge()
+                    digest.update(data)
+                    await asyncio.to_thread(out.write, data)
+                parser.finalize()
+            if part.filename is None or not part.ended: raise UploadInvalid(f"No complete '{field}' file in the form")
+            name = os.path.basename(part.filename) or "file" # No paths from the client
+            return await asyncio.to_thread(self.place, tmp_path, digest.hexdigest(), name)
+        except ValueError as e: # The parser's errors are ValueErrors
+            raise UploadInvalid(str(e) or "Malformed multipart body")
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+
+    def place(self, tmp_path: str, digest: str, name: str) -> Tuple[str, bool]:
+        folder = os.path.join(self.directory, digest)
+        try:
+            os.mkdir(folder)
+        except FileExistsError:
+            existing = sorted(os.listdir(folder))
+            if existing: return f"{digest}/{existing[0]}", True
+        final_path = os.path.join(folder, name)
+        os.replace(tmp_path, final_path)
+        if (mimetypes.guess_type(name)[0] or "").startswith(COMPRESSIBLE):
+            self.precompress(final_path)
+        return f"{digest}/{name}", False
+
+    def precompress(self, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) < len(data) * 0.9:
+            with open(path + ".gz", "wb") as f:
+                f.write(packed)
+
+    # --- SERVING ---
+    def resolve(self, rel_path: str) -> Optional[str]:
+        full = os.path.realpath(os.path.join(self.root, rel_path))
+        if not full.startswith(self.root + os.sep) or not os.path.isfile(full): return None
+        return full
+
+    async def serve(self, rel_path: str, request: Request) -> Response:
+        full = self.resolve(rel_path)
+        if full is None: return Response(status_code=404)
+        addressed = DIGEST_DIR.match(rel_path) is not None
+        wants_range = "range" in request.headers
+
+        # Pick a pre-compressed sibling unless a byte range of the original was asked for
+        path, encoding = full, None
+        if not wants_range:
+            accepted = request.headers.get("accept-encoding", "")
+            for name, suffix in ENCODINGS:
+                if name in accepted and os.path.isfile(full + suffix):
+                    path, encoding = full + suffix, name
+                    break
+
+        stat = os.stat(path)
+        if addressed:
+            etag = rel_path[:64] + (f"-{encoding}" if encoding else "")
+        else:
+            etag = await self.content_hash(path, stat)
+        headers = {
+            "etag": f'"{etag}"',
+            "cache-control": IMMUTABLE if addressed else REVALIDATE,
+            "vary": "Accept-Encoding",
+            "accept-ranges": "bytes"
+        }
+        if encoding: headers["content-encoding"] = encoding
+
+        if headers["etag"] in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+
+        media_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+        if stat.st_size > self.cache_file_bytes:
+            return FileResponse(path, headers=headers, media_type=media_type)
+
+        body = await self.read(path, stat)
+        if wants_range and request.headers.get("if-range", headers["etag"]) == headers["etag"]:
+            return self.partial(body, request.headers["range"], headers, media_type)
+        return Response(body, headers=headers, media_type=media_type)
+
+    def partial(self, body: bytes, header: str, headers: dict, media_type: str) -> Response:
+        # Single ranges only; anything else gets the whole file, which RFC 9110 allows
+        match = RANGE.match(header.strip())
+        if not match or match.groups() == ("", ""):
+            return Response(body, headers=headers, media_type=media_type)
+        first, last = match.groups()
+        size = len(body)
+        if first:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        if start >= size or start > end:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+        headers = {**headers, "content-range": f"bytes {start}-{end}/{size}"}
+        return Response(body[start:end + 1], status_code=206, headers=headers, media_type=media_type)
+
+    async def read(self, path: str, stat: os.stat_result) -> bytes:
+        key = (path, stat.st_mtime_ns)
+        body = self.cache.get(key)
+        if body is not None:
+            self.cache.move_to_end(key)
+            return body
+
+        # One disk read per file, however many players ask at once
+        if key not in self.reads:
+            self.reads[key] = asyncio.ensure_future(asyncio.to_thread(read_file, path))
+        try:
+            body = await asyncio.shield(self.reads[key])
+        finally:
+            self.reads.pop(key, None)
+
+        if key not in self.cache:
+            self.cache[key] = body
+            self.cached_bytes += len(body)
+            while self.cached_bytes > self.cache_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.cached_bytes -= len(evicted)
+        return body
+
+    async def content_hash(self, path: str, stat: os.stat_result) -> str:
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in self.etags:
+            self.etags[key] = await asyncio.to_thread(hash_file, path)
+        return self.etags[key]
+
+class FilePart:
+    # Callbacks for MultipartParser that keep the data of the first file sent as
+    # `field`; save() takes it after each chunk of the body
+    def __init__(self, field: bytes):
+        self.field = field
+        self.filename: Optional[str] = None
+        self.data: List[bytes] = []
+        self.ended = False
+        self.current = False # Inside the wanted part
+        self.header = b""
+        self.value = b""
+        self.disposition = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end
+        }
+
+    def on_part_begin(self):
+        self.current = False
+        self.disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.value += data[start:end]
+
+    def on_header_end(self):
+        if self.header.lower() == b"content-disposition": self.disposition = self.value
+        self.header = self.value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.disposition)
+        if self.filename is None and options.get(b"name") == self.field and b"filename" in options:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.current = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.current: self.data.append(data[start:end])
+
+    def on_part_end(self):
+        if self.current: self.ended = True
+        self.current = False
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import re
+import secrets
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from challenges import Challenge # challenges.py validates flags with check_flag below
+
+try:
+    import regex
+except ImportError: # Optional, but regex flags are refused without it: `re` has no match timeout
+    regex = None
+
+MAX_GUESS_LENGTH = 256 # Longer submissions are wrong without being looked at
+REGEX_TIMEOUT_SECONDS = 0.05
+DYNAMIC_DIGITS = 24
+
+# --- FLAG MATCHERS ---
+class FlagMatcher(ABC):
+    """
+    A challenge's accepted flags, compiled once per challenge set. `matches` is all
+    SUBMIT_FLAG calls, and costs the same however many flags are accepted.
+    """
+
+    def matches(self, guess, team_id: str) -> bool:
+        if not isinstance(guess, str) or len(guess) > MAX_GUESS_LENGTH: return False
+        return self.check(guess, team_id)
+
+    @abstractmethod
+    def check(self, guess: str, team_id: str) -> bool:
+        pass
+
+class HashedFlags(FlagMatcher):
+    # Exact or case-insensitive: only keyed hashes (BLAKE2b MACs) of the flags are kept. One flag is
+    # compared in constant time; several are a set lookup, which leaks nothing useful
+    # since nobody outside this process can choose what a guess hashes to.
+    def __init__(self, flags, fold: bool = False):
+        self.key = secrets.token_bytes(32) # Per challenge set and process; never stored
+        self.fold = fold
+        self.digests = {self.digest(flag) for flag in flags}
+        self.single = next(iter(self.digests)) if len(self.digests) == 1 else None
+
+    def digest(self, flag: str) -> bytes:
+        if self.fold: flag = flag.casefold()
+        return hashlib.blake2b(flag.encode(), key=self.key, digest_size=32).digest() # Keyed: a MAC, not a bare hash
+
+    def check(self, guess: str, team_id: str) -> bool:
+        if self.single is not None: return hmac.compare_digest(self.digest(guess), self.single)
+        return self.digest(guess) in self.digests
+
+class RegexFlag(FlagMatcher):
+    # The whole guess must match the pattern, within REGEX_TIMEOUT_SECONDS
+    def __init__(self, pattern: str):
+        self.pattern = regex.compile(pattern)
+
+    def check(self, guess: str, team_id: str) -> bool:
+        try:
+            return self.pattern.fullmatch(guess, timeout=REGEX_TIMEOUT_SECONDS) is not None
+        except TimeoutError:
+            return False
+
+class DynamicFlag(FlagMatcher):
+    # A different flag per team, derived from the challenge's secret so the
+    # challenge itself can hand it out; see team_flag
+    def __init__(self, flag: str):
+        self.prefix, self.secret = split_flag(flag)
+        self.expected: Dict[str, bytes] = {} # team_id -> its flag, built on first attempt
+
+    def check(self, guess: str, team_id: str) -> bool:
+        expected = self.expected.get(team_id)
+        if expected is None:
+            expected = self.expected[team_id] = team_flag(self.prefix, self.secret, team_id).encode()
+        return hmac.compare_digest(guess.encode(), expected)
+
+def split_flag(flag: str):
+    start = flag.index("{")
+    return flag[:start], flag[start + 1:flag.rindex("}")]
+
+def team_flag(prefix: str, secret: str, team_id: str) -> str:
+    # prefix{first 24 hex digits of HMAC-SHA256(secret, team code)}
+    digest = hmac.new(secret.encode(), team_id.encode(), hashlib.sha256).hexdigest()
+    return f"{prefix}{{{digest[:DYNAMIC_DIGITS]}}}"
+
+def check_flag(flag_type: str, flag: str, flags: List[str]):
+    # Raises ValueError for a flag that cannot be checked, so /api/create refuses it.
+    # Guesses over MAX_GUESS_LENGTH are never looked at, so no flag may be longer
+    if flag_type in ("exact", "case_insensitive"):
+        for accepted in (flag, *flags):
+            # A guess is never longer than its case fold, which is what gets compared
+            if len(accepted.casefold() if flag_type == "case_insensitive" else accepted) > MAX_GUESS_LENGTH:
+                raise ValueError(f"Flags can be at most {MAX_GUESS_LENGTH} characters")
+    if flag_type == "regex":
+        if regex is None:
+            raise ValueError("Regex flags need the regex package installed on the server")
+        try:
+            regex.compile(flag)
+        except regex.error as e:
+            raise ValueError(f"Invalid flag pattern: {e}")
+    if flag_type == "dynamic":
+        if not re.fullmatch(r"[^{]*\{.+\}", flag):
+            raise ValueError("Dynamic flags must look like prefix{secret}")
+        if flag.index("{") + DYNAMIC_DIGITS + 2 > MAX_GUESS_LENGTH:
+            raise ValueError(f"Flags can be at most {MAX_GUESS_LENGTH} characters")
+
+def compile_flag(challenge: Challenge) -> FlagMatcher:
+    if challenge.flag_type == "regex": return RegexFlag(challenge.flag)
+    if challenge.flag_type == "dynamic": return DynamicFlag(challenge.flag)
+    return HashedFlags([challenge.flag, *challenge.flags], fold=challenge.flag_type == "case_insensitive")
+
+def flag_mask(challenge: Challenge) -> str:
+    # Shown to players as the expected format
+    if challenge.flag_type == "regex": return "format{flag}"
+    try:
+        prefix, content = split_flag(challenge.flag)
+    except ValueError:
+        return "format{flag}"
+    if challenge.flag_type == "dynamic": return f"{prefix}{{{'*' * DYNAMIC_DIGITS}}}"
+    masked_content = "".join([c if c == '_' else '*' for c in content])
+    return f"{prefix}{{{masked_content}}}"
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+Handler = Callable[[str, Any, dict], Awaitable[Any]] # (game_code, websocket or None, payload) -> result
+
+# --- COMMANDS ---
+class Command:
+    """One request to a game's actor. `done` resolves with the handler's result."""
+    __slots__ = ("handler", "websocket", "payload", "label", "queued", "done")
+
+    def __init__(self, handler: Handler, websocket, payload: dict, label: str):
+        self.handler = handler
+        self.websocket = websocket # Sender, None for server-side commands
+        self.payload = payload
+        self.label = label # Metrics label
+        self.queued = time.perf_counter()
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+# --- GAME ACTOR ---
+class GameActor:
+    """
+    The one task that changes a game's state on this worker.
+
+    Connections and timers submit Commands and await their results; the actor
+    runs them one at a time in arrival order, each under the backend's game
+    lock (which keeps other workers out as well), so a handler's checks and
+    the events it commits are never interleaved with another command. Handlers
+    only queue outbound messages; the outboxes send them after the command is
+    done, so a slow or failing socket cannot stall or split a change.
+    """
+
+    def __init__(self, code: str, lock: Callable, observe: Callable[[Command, float, float], None]):
+        self.code = code
+        self.lock = lock # StateBackend.lock
+        self.observe = observe # (command, seconds queued, seconds until done)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = asyncio.create_task(self.run())
+
+    def submit(self, command: Command) -> asyncio.Future:
+        self.queue.put_nowait(command)
+        return command.done
+
+    async def run(self):
+        while True:
+            command = await self.queue.get()
+            if command.done.done(): continue # Submitter gave up before it started
+            async with self.lock(self.code):
+                started = time.perf_counter()
+                try:
+                    result = await command.handler(self.code, command.websocket, command.payload)
+                except Exception as e:
+                    if not command.done.done(): command.done.set_exception(e)
+                else:
+                    if not command.done.done(): command.done.set_result(result)
+            self.observe(command, started - command.queued, time.perf_counter() - command.queued)
+
+    def stop(self):
+        self.task.cancel()
+        while not self.queue.empty():
+            self.queue.get_nowait().done.cancel()
@@ -0,0 +1,80 @@
+import random
+import string
+from array import array
+from typing import List
+
+ALPHABET = string.ascii_uppercase
+TAKEN = 0xFFFFFFFF
+
+class CodesExhausted(Exception):
+    pass
+
+# --- CODE ALLOCATOR ---
+class CodeAllocator:
+    """
+    Hands out unused game codes uniformly at random in O(1), and takes
+    freed ones back.
+
+    Each code is a number below 26**length. `free` holds the unused numbers
+    in its first `available` slots and `slot` maps every number to its
+    position there (TAKEN once handed out), so allocate, reserve and release
+    are each a swap with the last free slot. Memory is two 4-byte arrays,
+    about 3.6 MB for 4-letter codes, however many games come and go; a freed
+    code rejoins the pool at a random position, so it is unlikely to be
+    handed out again soon.
+    """
+
+    def __init__(self, length: int = 4):
+        self.length = length
+        size = len(ALPHABET) ** length
+        self.free = array("I", range(size))
+        self.slot = array("I", range(size))
+        self.available = size
+
+    def encode(self, number: int) -> str:
+        letters = []
+        for _ in range(self.length):
+            number, digit = divmod(number, len(ALPHABET))
+            letters.append(ALPHABET[digit])
+        return "".join(reversed(letters))
+
+    def decode(self, code: str) -> int:
+        number = 0
+        for letter in code:
+            number = number * len(ALPHABET) + ALPHABET.index(letter)
+        return number
+
+    def valid(self, code: str) -> bool:
+        return len(code) == self.length and all(c in ALPHABET for c in code)
+
+    def allocate(self) -> str:
+        if not self.available: raise CodesExhausted()
+        number = self.free[random.randrange(self.available)]
+        self.take(number)
+        return self.encode(number)
+
+    def allocate_many(self, count: int) -> List[str]:
+        # All or none, so a batch never runs out halfway
+        if count > self.available: raise CodesExhausted()
+        return [self.allocate() for _ in range(count)]
+
+    def reserve(self, code: str):
+        # Mark a code as used without drawing it, e.g. one recovered from disk
+        if self.valid(code) and self.slot[self.decode(code)] != TAKEN:
+            self.take(self.decode(code))
+
+    def release(self, code: str):
+        if not self.valid(code): return
+        number = self.decode(code)
+        if self.slot[number] != TAKEN: return
+        self.free[self.available] = number
+        self.slot[number] = self.available
+        self.available += 1
+
+    def take(self, number: int):
+        position = self.slot[number]
+        self.available -= 1
+        last = self.free[self.available]
+        self.free[position] = last
+        self.slot[last] = position
+        self.slot[number] = TAKEN
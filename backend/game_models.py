@@ -1,11 +1,22 @@
 from abc import ABC, abstractmethod
 from typing import List, Dict, Optional
-import uuid
+import itertools
+import secrets
+
+# Random per-process prefix + counter: unique within a process by construction,
+# and across workers unless two draw the same 32-bit prefix
+_ID_PREFIX = secrets.token_hex(4)
+_ID_COUNTER = itertools.count(1)
+
+def generate_id() -> str:
+    return f"{_ID_PREFIX}{next(_ID_COUNTER):x}"
 
 # --- ABSTRACT BASE CLASS ---
 class GameMember(ABC):
+    __slots__ = ("id", "name")
+
     def __init__(self, name: str):
-        self.id = str(uuid.uuid4())[:8] # Unique ID
+        self.id = generate_id() # Unique ID
         self.name = name
 
     @abstractmethod
@@ -18,12 +29,14 @@ class GameMember(ABC):
 
 # --- PLAYER CLASS ---
 class Player(GameMember):
+    __slots__ = ("sockets", "score", "solves", "connections")
+
     def __init__(self, name: str, socket=None):
         super().__init__(name)
-        self.sockets = [socket] if socket else []
+        self.sockets = [socket] if socket else [] # Sockets held by this worker
         self.score = 0
-        self.solves: List[str] = [] # List of Challenge IDs
-        self.is_connected = True
+        self.solves: List[str] = [] # Challenge IDs, in solve order (membership is checked per team)
+        self.connections = len(self.sockets) # Open sockets across all workers
 
     def get_points(self) -> int:
         return self.score
@@ -37,28 +50,57 @@ class Player(GameMember):
             "name": self.name,
             "score": self.score,
             "solves": self.solves,
-            "is_connected": len(self.sockets) > 0
+            "is_connected": self.connections > 0
         }
 
 # --- TEAM CLASS ---
 class Team(GameMember):
+    __slots__ = ("members", "is_solo", "solves", "unlocked_hints", "hint_overlay", "score", "last_solve")
+
     def __init__(self, name: str, is_solo: bool = False):
         super().__init__(name)
         self.members: Dict[str, Player] = {} # player_id -> Player
         self.is_solo = is_solo
-        self.solves: List[str] = [] # Track team-wide solves to prevent double dipping if needed
-        self.unlocked_hints: Dict[str, List[str]] = {} # ChallengeID -> List of HintIDs
+        self.solves: Dict[str, None] = {} # Team-wide solves in order, to prevent double dipping
+        self.unlocked_hints: Dict[str, Dict[str, None]] = {} # ChallengeID -> HintIDs, in unlock order
+        self.hint_overlay: Optional[dict] = None # Codec -> cached encoded hint fields for LOBBY_UPDATE
+        self.score = 0 # Cached sum of member scores, kept current by add/remove/record_solve
+        self.last_solve: Optional[float] = None # Leaderboard tie-break
 
     def add_member(self, player: Player):
         self.members[player.id] = player
+        self.score += player.score
+
+    def record_solve(self, player: Player, challenge_id: str, points: int, solved_at: float):
+        player.add_points(points)
+        player.solves.append(challenge_id)
+        self.solves[challenge_id] = None
+        self.score += points
+        self.last_solve = solved_at
+
+    def adjust(self, player: Player, delta: int):
+        # A past solve changed value (retroactive scoring)
+        player.add_points(delta)
+        self.score += delta
+
+    def unlock_hint(self, challenge_id: str, hint_id: str):
+        self.unlocked_hints.setdefault(challenge_id, {})[hint_id] = None
+        self.hint_overlay = None # Re-encode on next broadcast
+
+    def has_hint(self, challenge_id: str, hint_id: str) -> bool:
+        return hint_id in self.unlocked_hints.get(challenge_id, ())
+
+    def hints_dict(self) -> Dict[str, List[str]]:
+        # The shape clients and snapshots use
+        return {c_id: list(h_ids) for c_id, h_ids in self.unlocked_hints.items()}
 
     def remove_member(self, player_id: str):
         if player_id in self.members:
-            del self.members[player_id]
+            self.score -= self.members.pop(player_id).score
 
     def get_points(self) -> int:
         # Sum of all member points
-        return sum(p.get_points() for p in self.members.values())
+        return self.score
 
     def to_dict(self) -> dict:
         # Sort members by score for the internal leaderboard
@@ -66,8 +108,7 @@ class Team(GameMember):
         return {
             "id": self.id,
             "name": self.name,
-            "score": self.get_points(),
+            "score": self.score,
             "is_solo": self.is_solo,
-            "members": [p.to_dict() for p in sorted_members],
-            "unlocked_hints": self.unlocked_hints
-        }
\ No newline at end of file
+            "members": [p.to_dict() for p in sorted_members]
+        }
@@ -0,0 +1,83 @@
+import math
+from bisect import bisect_left, insort
+from typing import Dict, List
+
+from game_models import Team
+
+# --- LEADERBOARD ---
+class Leaderboard:
+    """
+    Teams kept in rank order as they score, so nothing is sorted per broadcast.
+
+    Ranking is by score, then earliest last solve, then join order. Positions
+    are found with bisect in O(log n); the list shift on insert/remove is a
+    single memmove. Every mutation returns only the ranks that changed, which
+    is exactly what a LOBBY_PATCH needs to carry.
+    """
+
+    def __init__(self):
+        self._keys: List[tuple] = [] # Sorted (-score, last_solve, seq, team_id)
+        self._key_of: Dict[str, tuple] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _make_key(self, team: Team, seq: int) -> tuple:
+        last_solve = team.last_solve if team.last_solve is not None else math.inf
+        return (-team.score, last_solve, seq, team.id)
+
+    def _ranks_between(self, lo: int, hi: int) -> Dict[str, int]:
+        return {self._keys[i][3]: i + 1 for i in range(lo, min(hi, len(self._keys) - 1) + 1)}
+
+    def add(self, team: Team) -> Dict[str, int]:
+        self._seq += 1
+        key = self._make_key(team, self._seq)
+        self._key_of[team.id] = key
+        insort(self._keys, key)
+        return self._ranks_between(bisect_left(self._keys, key), len(self._keys) - 1)
+
+    def remove(self, team_id: str) -> Dict[str, int]:
+        key = self._key_of.pop(team_id, None)
+        if key is None: return {}
+        index = bisect_left(self._keys, key)
+        del self._keys[index]
+        return self._ranks_between(index, len(self._keys) - 1)
+
+    def update(self, team: Team) -> Dict[str, int]:
+        # Re-rank a team after its score or last solve changed
+        old_key = self._key_of.get(team.id)
+        if old_key is None: return self.add(team)
+        new_key = self._make_key(team, old_key[2])
+        if new_key == old_key: return {}
+
+        old_index = bisect_left(self._keys, old_key)
+        del self._keys[old_index]
+        insort(self._keys, new_key)
+        self._key_of[team.id] = new_key
+        new_index = bisect_left(self._keys, new_key)
+        return self._ranks_between(min(old_index, new_index), max(old_index, new_index))
+
+    def update_many(self, teams: List[Team]) -> Dict[str, int]:
+        # Re-rank several teams at once (a retroactive solve moves every earlier
+        # solver): one rebuild of the list instead of a shift per team
+        moved: Dict[tuple, Team] = {}
+        for team in teams:
+            old_key = self._key_of.get(team.id)
+            if old_key is not None and self._make_key(team, old_key[2]) != old_key: moved[old_key] = team
+        if len(moved) <= 1:
+            return self.update(next(iter(moved.values()))) if moved else {}
+
+        positions = [bisect_left(self._keys, key) for key in moved]
+        new_keys = [self._make_key(team, key[2]) for key, team in moved.items()]
+        self._keys = sorted([key for key in self._keys if key not in moved] + new_keys)
+        for key in new_keys: self._key_of[key[3]] = key
+        positions += [bisect_left(self._keys, key) for key in new_keys]
+        # Ranks outside the span keep their position
+        return self._ranks_between(min(positions), max(positions))
+
+    def rank(self, team_id: str) -> int:
+        return bisect_left(self._keys, self._key_of[team_id]) + 1
+
+    def team_ids(self) -> List[str]:
+        return [key[3] for key in self._keys]
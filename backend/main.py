@@ -1,30 +1,114 @@
+import asyncio
+import contextlib
 import random
 import string
-import json
 import secrets
 import time
 import os
+import logging
 from dotenv import load_dotenv
 load_dotenv()
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional
-import shutil
+from typing import Dict, List, Literal, Optional
 
-from game_models import Player, Team
+from game_models import Player, Team, generate_id
 from challenges import Challenge, PREMADE_CHALLENGES
+from outbox import Outbox
+from leaderboard import Leaderboard
+from state_backend import StateBackend, backend_from_env
+from file_store import FileStore, UploadInvalid, UploadTooLarge
+from rate_limit import RateLimiter, TokenBucket, parse_limit
+from metrics import REGISTRY
+from codec import Codec, Frames, Shared, Spliced, build_codecs, negotiate
+from game_codes import CodeAllocator, CodesExhausted
+from archive import GameArchive
+from game_actor import Command, GameActor
+from spectators import ScoreboardFeed
+from solve_log import SolveLog
+from scoring import SCORING_MODELS, ScoringEngine
+from challenge_set import intern_challenges, interned_count
+from catalog import ChallengeCatalog
 
-app = FastAPI()
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.backend.start()
+    catalog.start() # In the background; the first catalog request waits for it
+    await manager.recover_games()
+    manager.sweeper = asyncio.create_task(manager.sweep_forever())
+    manager.heartbeat = asyncio.create_task(manager.heartbeat_forever()) if HEARTBEAT_INTERVAL_SECONDS else None
+    yield
+    manager.sweeper.cancel()
+    if manager.heartbeat: manager.heartbeat.cancel()
+    await manager.backend.stop()
 
-# Mount uploads directory
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app = FastAPI(lifespan=lifespan)
+logger = logging.getLogger("uvicorn.error")
 
 origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
 
+# Per-socket outbound queue limits (slow consumers are dropped past these)
+OUTBOX_MAX_MESSAGES = int(os.getenv("OUTBOX_MAX_MESSAGES", "64"))
+OUTBOX_MAX_LAG_SECONDS = float(os.getenv("OUTBOX_MAX_LAG_SECONDS", "10"))
+
+# The server pings every socket this often and drops those it has not heard from
+# in HEARTBEAT_TIMEOUT_SECONDS (any message counts); an interval of 0 disables it
+HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("HEARTBEAT_INTERVAL_SECONDS", "15"))
+HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("HEARTBEAT_TIMEOUT_SECONDS", "45"))
+PING = Frames({"type": "PING"})
+
+# Reconnects (PLAYER_JOIN with a playerId) admitted as "rate,burst" per second; past the
+# burst each one waits for its turn plus up to RECONNECT_JITTER_MS, so a venue coming back
+# online is spread out instead of landing in one tick
+RECONNECT_LIMIT = parse_limit(os.getenv("RECONNECT_LIMIT", "50,100"))
+RECONNECT_JITTER_SECONDS = int(os.getenv("RECONNECT_JITTER_MS", "1000")) / 1000
+
+# At most one LOBBY_PATCH per game per tick, however many events land in it
+BROADCAST_TICK_SECONDS = int(os.getenv("BROADCAST_TICK_MS", "150")) / 1000
+
+# Spectator streams get at most one scoreboard per interval, however fast the game moves
+SCOREBOARD_TICK_SECONDS = int(os.getenv("SCOREBOARD_TICK_MS", "1000")) / 1000
+
+# Most solve log entries sent to the admin per GET_SOLVES
+SOLVE_LOG_PAGE = int(os.getenv("SOLVE_LOG_PAGE", "500"))
+
+# Largest accepted challenge file upload
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "200")) * 1024 * 1024
+
+# In-memory cache for challenge downloads; bigger files stream from disk
+FILE_CACHE_BYTES = int(os.getenv("FILE_CACHE_MB", "64")) * 1024 * 1024
+FILE_CACHE_MAX_FILE_BYTES = int(os.getenv("FILE_CACHE_MAX_FILE_MB", "8")) * 1024 * 1024
+
+# SUBMIT_FLAG / BUY_HINT attempts as "rate,burst" per second, checked before any game work
+ATTEMPT_LIMIT_SOCKET = parse_limit(os.getenv("ATTEMPT_LIMIT_SOCKET", "3,10"))
+ATTEMPT_LIMIT_PLAYER = parse_limit(os.getenv("ATTEMPT_LIMIT_PLAYER", "3,10"))
+ATTEMPT_LIMIT_TEAM = parse_limit(os.getenv("ATTEMPT_LIMIT_TEAM", "10,30"))
+THROTTLED_TOAST = Frames({"type": "TOAST", "msg": "Too many attempts, slow down!", "color": "warning"})
+
+# Wire formats clients can pick at connect; with "+deflate", frames this large go out compressed
+WS_COMPRESS_MIN_BYTES = int(os.getenv("WS_COMPRESS_MIN_BYTES", "8192"))
+CODECS = build_codecs(WS_COMPRESS_MIN_BYTES)
+
+# Games leave memory once nobody is connected and they ended this long ago, or
+# (waiting or ended) saw no activity for GAME_IDLE_TTL_MINUTES; 0 disables either
+GAME_ENDED_TTL_SECONDS = float(os.getenv("GAME_ENDED_TTL_MINUTES", "60")) * 60
+GAME_IDLE_TTL_SECONDS = float(os.getenv("GAME_IDLE_TTL_MINUTES", "240")) * 60
+GAME_SWEEP_SECONDS = float(os.getenv("GAME_SWEEP_SECONDS", "60"))
+# With this set, final results of evicted games are kept on disk and reloaded on access
+GAME_ARCHIVE_DIR = os.getenv("GAME_ARCHIVE_DIR")
+
+# Most games one /api/create/bulk request may provision
+BULK_CREATE_MAX = int(os.getenv("BULK_CREATE_MAX", "200"))
+
+# Pre-made challenge packs, one folder with a pack.json each (see catalog.py)
+CHALLENGE_PACKS_DIR = os.getenv("CHALLENGE_PACKS_DIR")
+
+# Seconds before the end at which players get a "time left" toast
+REMINDER_SECONDS = [int(x) for x in os.getenv("GAME_REMINDERS", "300,60").split(",") if x]
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -40,75 +124,991 @@ class GameConfig(BaseModel):
     teams_enabled: bool = True 
     challenges: List[Challenge]
     duration_seconds: int = 1800
+    scoring: Literal["static", "linear", "log", "ctfd"] = "linear" # See scoring.py
 
-# --- GAME MANAGER ---
+class BulkCreate(BaseModel):
+    config: GameConfig
+    count: int
+
+# --- METRICS ---
+# Client-chosen types outside this set are counted as "other", to keep label cardinality bounded
+MESSAGE_TYPES = {
+    "ADMIN_AUTH", "PLAYER_JOIN", "CREATE_TEAM", "JOIN_TEAM", "JOIN_SOLO", "START_GAME", "RESYNC",
+    "END_GAME", "KICK_PLAYER", "KICK_TEAM", "BUY_HINT", "SUBMIT_FLAG", "LEAVE_GAME", "GET_SOLVES", "GET_TIMELINE", "PONG"
+}
+MESSAGES = REGISTRY.counter("dashflag_ws_messages_total", "Websocket messages received", ("type",))
+MESSAGE_SECONDS = REGISTRY.histogram("dashflag_ws_message_seconds", "Time from submitting a command to its game's actor until it is done", ("type",))
+COMMAND_QUEUE_SECONDS = REGISTRY.histogram("dashflag_command_queue_seconds", "Time a command waited for its game's actor and lock", ("type",))
+THROTTLED = REGISTRY.counter("dashflag_ws_throttled_total", "Attempts refused by the rate limiter", ("type",))
+BROADCAST_SECONDS = REGISTRY.histogram("dashflag_broadcast_seconds", "Time to encode and queue one broadcast to a game", ("kind",))
+BROADCAST_BYTES = REGISTRY.counter("dashflag_broadcast_bytes_total", "Bytes queued to sockets by broadcasts", ("kind",))
+REAPED = REGISTRY.counter("dashflag_ws_reaped_total", "Sockets dropped from their game without waiting for their reader to notice", ("reason",))
+RECONNECT_WAIT_SECONDS = REGISTRY.histogram("dashflag_reconnect_wait_seconds", "Time a reconnect waited to be admitted")
+EVICTIONS = REGISTRY.counter("dashflag_games_evicted_total", "Games dropped from memory", ("outcome",))
 
-def generate_code(length=4):
-    return ''.join(random.choices(string.ascii_uppercase, k=length))
+# --- GAME MANAGER ---
 
 def generate_team_code():
     return ''.join(random.choices(string.digits, k=4))
 
+def text_field(payload: dict, key: str) -> Optional[str]:
+    # Ids and names sent by clients: anything but a string counts as missing
+    value = payload.get(key)
+    return value if isinstance(value, str) else None
+
+def inner_payload(payload: dict) -> dict:
+    # Some commands nest their fields under "payload"
+    inner = payload.get("payload", payload)
+    return inner if isinstance(inner, dict) else {}
+
+def load_config(config: dict) -> GameConfig:
+    # Games stored before scoring was configurable keep the fixed-at-solve-time values their events recorded
+    return GameConfig(**{"scoring": "static", **config})
+
 class GameManager:
-    def __init__(self):
+    def __init__(self, backend: StateBackend):
         self.games: Dict[str, dict] = {} 
+        self.outboxes: Dict[WebSocket, Outbox] = {}
+        self.socket_games: Dict[WebSocket, str] = {} # Game each open socket connected to
+        self.reconnects = TokenBucket(*RECONNECT_LIMIT) if RECONNECT_LIMIT else None
+        self.loading: Dict[str, asyncio.Task] = {}
+        self.socket_limits = RateLimiter(ATTEMPT_LIMIT_SOCKET)
+        self.throttle_notices: Dict[WebSocket, float] = {} # Last "slow down" toast per socket
+        self.codes = CodeAllocator()
+        self.archive = GameArchive(GAME_ARCHIVE_DIR) if GAME_ARCHIVE_DIR else None
+        self.sweeper: Optional[asyncio.Task] = None
+        self.heartbeat: Optional[asyncio.Task] = None
+        self.commands = { # Client message type -> handler
+            "ADMIN_AUTH": self.on_admin_auth,
+            "PLAYER_JOIN": self.on_player_join,
+            "CREATE_TEAM": self.on_join,
+            "JOIN_TEAM": self.on_join,
+            "JOIN_SOLO": self.on_join,
+            "START_GAME": self.on_start_game,
+            "RESYNC": self.on_resync,
+            "END_GAME": self.on_end_game,
+            "KICK_PLAYER": self.on_kick_player,
+            "KICK_TEAM": self.on_kick_team,
+            "GET_SOLVES": self.on_get_solves,
+            "GET_TIMELINE": self.on_get_timeline,
+            "BUY_HINT": self.on_buy_hint,
+            "SUBMIT_FLAG": self.on_submit_flag,
+            "LEAVE_GAME": self.on_leave_game,
+        }
+        # Every change to replicated game state goes through the backend as an
+        # event and comes back here, whichever worker committed it
+        self.backend = backend
+        self.backend.on_event = self.apply_event
+        self.backend.on_snapshot = self.export_game
 
-    def create_game(self, config: GameConfig):
-        code = generate_code()
-        while code in self.games: code = generate_code()
-        
+    async def create_game(self, config: GameConfig, dumped: Optional[dict] = None, code: Optional[str] = None):
         token = secrets.token_hex(16)
-        
-        self.games[code] = {
+        meta = {"config": dumped or config.model_dump(), "admin_token": token}
+
+        code = code or self.codes.allocate()
+        while code in self.games or not await self.backend.create_game(code, meta):
+            code = self.codes.allocate() # Taken by another worker; stays reserved here
+
+        self.games[code] = self.new_game(config, token)
+        return code, token
+
+    async def create_games(self, config: GameConfig, count: int) -> List[tuple]:
+        # Many games from one config: validated and serialized once, and sharing one ChallengeSet.
+        # Codes are reserved first, so running out fails the batch before any game exists
+        dumped = config.model_dump()
+        codes = self.codes.allocate_many(count)
+        return await asyncio.gather(*[self.create_game(config, dumped, code) for code in codes])
+
+    def new_game(self, config: GameConfig, token: str) -> dict:
+        # Challenge-derived data is shared with every game holding the same challenges
+        challenges = intern_challenges(config.challenges)
+        config.challenges = challenges.challenges
+        return {
             "status": "waiting",
             "config": config, 
             "admin_token": token,
-            "admin_socket": None,
+            "admin_socket": None, # Sockets are local to this worker
             "teams": {},          
             "socket_map": {},     
-            "challenge_stats": {c.id: 0 for c in config.challenges}, 
-            "detailed_solves": {c.id: [] for c in config.challenges}, # NEW: Log history
+            # Lookup indexes, kept in sync by add_team/add_player/remove_*
+            "players": {},        # player_id -> (Team, Player)
+            "player_names": set(), # lowercase nicknames
+            "team_names": set(),  # lowercase team names
+            "leaderboard": Leaderboard(),
+            # Shared and read-only, from the ChallengeSet
+            "challenge_set": challenges,
+            "challenges": challenges.by_id,
+            "hint_index": challenges.hint_index,
+            "flags": challenges.flags, # Matchers, built once per set
+            "flag_masks": challenges.flag_masks,
+            "hint_content": challenges.hint_content,
+            # Per game
+            "challenge_stats": dict.fromkeys(challenges.by_id, 0),
+            "solve_log": SolveLog(), # Append-only; the admin pages through it by cursor
+            "scoring": ScoringEngine(SCORING_MODELS[config.scoring], challenges.by_id),
+            "player_limits": RateLimiter(ATTEMPT_LIMIT_PLAYER),
+            "team_limits": RateLimiter(ATTEMPT_LIMIT_TEAM),
+            "throttled": {}, # team_id -> rejected attempts, shown to the admin
+            "throttle_pending": set(), # Teams whose count changed since the last patch
+            "version": 0, # Bumped on every LOBBY_PATCH / LOBBY_UPDATE broadcast
+            "pending_ops": [],
+            "pending_admin_ops": [],
+            "flush_handle": None, # Scheduled broadcast for this tick, if any
+            "snapshot_waiting": set(), # Player sockets owed a LOBBY_UPDATE at the next flush
+            "actor": None, # GameActor, started on the first command
+            "last_flush": 0.0,
+            "feed": ScoreboardFeed(), # Public scoreboard, cached per version
+            "clock": [], # Timer handles for the game end and reminders
+            "sockets": set(), # Every socket on this worker connected to the game, authed or not
+            "last_seen": time.time(), # Last event or connection, for idle eviction
             "start_time": None, # NEW: Track when game started
             "end_time": None
         }
-        return code, token
 
-    def generate_flag_mask(self, flag: str) -> str:
+    async def get_game(self, game_code: str) -> Optional[dict]:
+        # Games created by another worker are rebuilt from the backend on first use
+        if game_code in self.games: return self.games[game_code]
+        if game_code not in self.loading:
+            self.loading[game_code] = asyncio.create_task(self.load_game(game_code))
+        return await asyncio.shield(self.loading[game_code])
+
+    async def load_game(self, game_code: str) -> Optional[dict]:
         try:
-            start = flag.index('{')
-            end = flag.rindex('}')
-            prefix = flag[:start]
-            content = flag[start+1:end]
-            masked_content = "".join([c if c == '_' else '*' for c in content])
-            return f"{prefix}{{{masked_content}}}"
-        except ValueError:
-            return "format{flag}"
-
-    def calculate_points(self, challenge_config, solve_count):
-        drop = solve_count * challenge_config.decay
-        current_value = challenge_config.points - drop
-        return max(current_value, challenge_config.min_points)
-
-    def format_time(self, seconds):
-        m = int(seconds // 60)
-        s = int(seconds % 60)
-        return f"{m}m {s}s"
-
-    async def broadcast_status(self, game_code: str):
+            loaded = await self.backend.load_game(game_code)
+            if loaded is None: return await self.unarchive_game(game_code)
+            meta, state, events = loaded
+            self.games[game_code] = self.new_game(load_config(meta["config"]), meta["admin_token"])
+            if state: self.restore_game(game_code, state)
+            for event in events:
+                self.apply_event(game_code, event)
+            await self.backend.sync(game_code)
+            return self.games[game_code]
+        finally:
+            del self.loading[game_code]
+
+    async def recover_games(self):
+        # Rebuild games that outlived the last process (event log backend)
+        started = time.perf_counter()
+        for code in self.archive.codes() if self.archive else []:
+            self.codes.reserve(code)
+        codes = self.backend.stored_games()
+        for code in codes:
+            self.codes.reserve(code)
+            await self.get_game(code)
+        if codes:
+            logger.info("Recovered %d games in %.1f ms", len(codes), (time.perf_counter() - started) * 1000)
+
+    # --- EVICTION ---
+    async def sweep_forever(self):
+        while True:
+            await asyncio.sleep(GAME_SWEEP_SECONDS)
+            now = time.time()
+            for code in [code for code, game in self.games.items() if self.evictable(game, now)]:
+                try: await self.evict_game(code)
+                except Exception: logger.exception("Evicting game %s failed", code)
+
+    def evictable(self, game: dict, now: float) -> bool:
+        # Running games end on their own clock first; anyone connected or watching keeps a game loaded
+        if game["sockets"] or game["feed"].viewers or game["status"] == "active": return False
+        if game["status"] == "ended" and GAME_ENDED_TTL_SECONDS and now - game["end_time"] >= GAME_ENDED_TTL_SECONDS:
+            return True
+        return bool(GAME_IDLE_TTL_SECONDS) and now - game["last_seen"] >= GAME_IDLE_TTL_SECONDS
+
+    async def evict_game(self, game_code: str):
+        async with self.backend.lock(game_code):
+            game = self.games.get(game_code)
+            if not game or not self.evictable(game, time.time()): return
+
+            # Only finished games have results worth keeping
+            archived = self.archive is not None and game["status"] == "ended"
+            if archived:
+                await self.archive.save(game_code, {"meta": self.game_meta(game), "state": self.export_game(game_code)})
+                if game["sockets"]: return # Someone connected while it was written
+
+            self.stop_clock(game)
+            if game["flush_handle"]: game["flush_handle"].cancel()
+            if game["feed"].handle: game["feed"].handle.cancel()
+            if game["actor"]: game["actor"].stop()
+            del self.games[game_code]
+            await self.backend.drop_game(game_code)
+        # An archived code stays taken, since the game can still be reloaded under it
+        if not archived: self.codes.release(game_code)
+        EVICTIONS.inc("archived" if archived else "discarded")
+
+    async def unarchive_game(self, game_code: str) -> Optional[dict]:
+        # Bring an evicted game back through the backend, as one event holding its final state
+        record = await self.archive.load(game_code) if self.archive else None
+        if record is None: return None
+        async with self.backend.lock(game_code):
+            if game_code in self.games: return self.games[game_code]
+            if not await self.backend.create_game(game_code, record["meta"]): return None
+            self.codes.reserve(game_code)
+            self.games[game_code] = self.new_game(load_config(record["meta"]["config"]), record["meta"]["admin_token"])
+            await self.backend.commit(game_code, {"type": "game_restored", "state": record["state"]})
+        return self.games[game_code]
+
+    def game_meta(self, game: dict) -> dict:
+        return {"config": game["config"].model_dump(), "admin_token": game["admin_token"]}
+
+    def export_game(self, game_code: str) -> dict:
+        # Everything apply_event builds up, as plain JSON for a snapshot
+        game = self.games[game_code]
+        return {
+            "status": game["status"],
+            "start_time": game["start_time"],
+            "end_time": game["end_time"],
+            "teams": [{
+                "id": team.id,
+                "name": team.name,
+                "is_solo": team.is_solo,
+                "solves": list(team.solves),
+                "unlocked_hints": team.hints_dict(),
+                "last_solve": team.last_solve,
+                "members": [{"id": p.id, "name": p.name, "score": p.score, "solves": p.solves} for p in team.members.values()]
+            } for team in game["teams"].values()], # Join order, which the leaderboard tie-break relies on
+            "challenge_stats": game["challenge_stats"],
+            "solve_log": game["solve_log"].entries,
+            "series": game["solve_log"].series,
+            "awards": game["scoring"].export() # Current values, so restoring rescores nothing
+        }
+
+    def restore_game(self, game_code: str, state: dict):
+        game = self.games[game_code]
+        game["status"] = state["status"]
+        game["start_time"] = state["start_time"]
+        game["end_time"] = state["end_time"]
+        game["challenge_stats"] = state["challenge_stats"]
+        for t in state["teams"]:
+            team = Team(t["name"], is_solo=t["is_solo"])
+            team.id = t["id"]
+            team.solves = dict.fromkeys(t["solves"])
+            for c_id, h_ids in t["unlocked_hints"].items():
+                for h_id in h_ids: team.unlock_hint(c_id, h_id)
+            team.last_solve = t["last_solve"]
+            for p in t["members"]:
+                player = Player(p["name"])
+                player.id = p["id"]
+                player.score = p["score"]
+                player.solves = p["solves"]
+                team.add_member(player)
+                game["players"][player.id] = (team, player)
+                game["player_names"].add(player.name.lower())
+            self.add_team(game, team) # After members, so it is ranked by its full score
+        # Player and team scores above are already final, and so are the awards
+        # and timelines stored with them. Snapshots from before awards were
+        # stored replay them instead, and older ones only kept display strings
+        # and start with an empty log.
+        game["solve_log"] = SolveLog()
+        if "awards" in state:
+            game["solve_log"].restore(state["solve_log"], state["series"])
+            game["scoring"].restore(state["awards"])
+        else:
+            self.replay_awards(game, state.get("solve_log") or [])
+        game["pending_ops"] = [] # Nobody to patch yet
+        if game["status"] == "active": self.start_clock(game_code)
+
+    def replay_awards(self, game: dict, entries: List[dict]):
+        # Costs every earlier award of a challenge per solve; only for old snapshots
+        solves = dict.fromkeys(game["challenge_stats"], 0)
+        for entry in entries:
+            game["solve_log"].add(entry)
+            c_id = entry["challengeId"]
+            solves[c_id] += 1
+            changes = game["scoring"].solve(c_id, solves[c_id], entry["teamId"], entry.get("playerId"), entry["points"], entry.get("penalty", 0))
+            for award, delta in changes:
+                if award.player_id in game["players"]: game["solve_log"].rescore(entry["at"], award.team_id, delta)
+
+    def challenge_points(self, game: dict, challenge_id: str) -> int:
+        # What solving it now is worth, before hint penalties
+        return game["scoring"].value(challenge_id, game["challenge_stats"][challenge_id])
+
+    # --- GAME CLOCK ---
+    def start_clock(self, game_code: str):
+        # (Re)schedule the end of the game and its reminders from end_time.
+        # Every worker runs the clock; the game lock lets only one end the game.
+        game = self.games[game_code]
+        self.stop_clock(game)
+        loop = asyncio.get_running_loop()
+        remaining = game["end_time"] - time.time()
+        game["clock"].append(loop.call_later(remaining, self.expire, game_code))
+        for seconds in REMINDER_SECONDS:
+            if remaining > seconds:
+                game["clock"].append(loop.call_later(remaining - seconds, self.send_reminder, game_code, seconds))
+
+    def stop_clock(self, game: dict):
+        for handle in game["clock"]: handle.cancel()
+        game["clock"] = []
+
+    def expire(self, game_code: str):
+        if game_code not in self.games: return
+        self.submit(game_code, self.on_expire, None, {"end_time": self.games[game_code]["end_time"]}, "expire")
+
+    async def commit_end(self, game_code: str, end_time: float):
+        # Call with the game lock held
+        game = self.games.get(game_code)
+        if not game or game["status"] == "ended": return
+        await self.backend.commit(game_code, {"type": "game_ended", "end_time": end_time})
+
+    def send_reminder(self, game_code: str, seconds: int):
         if game_code not in self.games: return
         game = self.games[game_code]
-        
-        teams_list = [t.to_dict() for t in game["teams"].values()]
-        teams_list.sort(key=lambda x: x["score"], reverse=True)
+        left = f"{seconds // 60} minute{'s' if seconds >= 120 else ''}" if seconds >= 60 else f"{seconds} seconds"
+        toast = Frames({"type": "TOAST", "msg": f"{left} left!", "color": "warning"})
+        for ws in game["socket_map"]:
+            self.send_frames(ws, toast)
+        if game["admin_socket"]:
+            self.send_frames(game["admin_socket"], toast)
+
+    # --- MEMBERSHIP ---
+    def find_player(self, game: dict, player_id: Optional[str]):
+        return game["players"].get(player_id, (None, None))
+
+    def add_team(self, game: dict, team: Team):
+        game["teams"][team.id] = team
+        game["team_names"].add(team.name.lower())
+        ranks = game["leaderboard"].add(team)
+        self.publish_team(game, team)
+        ranks.pop(team.id, None) # Already in the team op
+        self.publish_ranks(game, ranks)
+
+    def add_player(self, game: dict, team: Team, player: Player):
+        team.add_member(player)
+        game["players"][player.id] = (team, player)
+        game["player_names"].add(player.name.lower())
+        self.publish_member(game, team, player)
+
+    def remove_player(self, game: dict, team: Team, player_id: str):
+        team.remove_member(player_id)
+        game["player_limits"].forget(player_id)
+        _, player = game["players"].pop(player_id, (None, None))
+        if player: game["player_names"].discard(player.name.lower())
+        if not team.members:
+            self.remove_team(game, team)
+        else:
+            self.publish_member_removed(game, team, player_id)
+            self.publish_score(game, team)
+
+    def remove_team(self, game: dict, team: Team):
+        game["teams"].pop(team.id, None)
+        game["team_limits"].forget(team.id)
+        game["team_names"].discard(team.name.lower())
+        for p_id, player in team.members.items():
+            game["players"].pop(p_id, None)
+            game["player_names"].discard(player.name.lower())
+        self.publish_team_removed(game, team)
+        self.publish_ranks(game, game["leaderboard"].remove(team.id))
+
+    async def bind_socket(self, game_code: str, websocket: WebSocket, player: Player):
+        # Local half of a connection; the presence event updates everyone's view
+        self.games[game_code]["socket_map"][websocket] = player.id
+        player.sockets.append(websocket)
+        await self.backend.commit(game_code, {"type": "presence", "player_id": player.id, "delta": 1}, durable=False)
+
+    async def release_socket(self, game_code: str, websocket: WebSocket):
+        # Detach a socket from whoever it was playing as, if anyone
+        game = self.games[game_code]
+        p_id = game["socket_map"].pop(websocket, None)
+        game["snapshot_waiting"].discard(websocket)
+        _, player = self.find_player(game, p_id)
+        if player and websocket in player.sockets:
+            player.sockets.remove(websocket)
+            await self.backend.commit(game_code, {"type": "presence", "player_id": p_id, "delta": -1}, durable=False)
+
+    def kick_sockets(self, game: dict, player: Player, keep: Optional[WebSocket] = None):
+        for sock in player.sockets:
+            game["socket_map"].pop(sock, None)
+            if sock != keep:
+                self.send(sock, {"type": "KICKED"})
+                self.close(sock)
+        player.sockets = []
+
+    # --- EVENTS ---
+    # Handlers validate against the game under backend.lock(), then commit an
+    # event. apply_event is the only place replicated state changes: it runs on
+    # every worker holding the game, and also replays history when a worker
+    # loads a game it has not seen. Replies to the acting socket stay in the
+    # handler; anything addressed to a team or the room is sent from here so
+    # each worker reaches the sockets it holds.
+    def apply_event(self, game_code: str, event: dict):
+        game = self.games.get(game_code)
+        if game is None: return
+        kind = event["type"]
+        game["last_seen"] = time.time()
+
+        if kind == "player_joined":
+            if event.get("new_team"):
+                team = Team(event["team_name"], is_solo=event["is_solo"])
+                team.id = event["team_id"]
+                self.add_team(game, team)
+            team = game["teams"][event["team_id"]]
+            player = Player(event["name"])
+            player.id = event["player_id"]
+            self.add_player(game, team, player)
+
+        elif kind == "presence":
+            team, player = self.find_player(game, event["player_id"])
+            if not player: return
+            player.connections = max(player.connections + event["delta"], 0)
+            self.publish_member(game, team, player)
+
+        elif kind == "player_removed":
+            team, player = self.find_player(game, event["player_id"])
+            if not player: return
+            self.kick_sockets(game, player)
+            self.remove_player(game, team, player.id)
+
+        elif kind == "team_removed":
+            team = game["teams"].get(event["team_id"])
+            if not team: return
+            for member in team.members.values():
+                self.kick_sockets(game, member)
+            self.remove_team(game, team)
+
+        elif kind == "hint_unlocked":
+            team = game["teams"].get(event["team_id"])
+            if not team: return
+            team.unlock_hint(event["challenge_id"], event["hint_id"])
+            # Send the team their new hint content
+            self.send_hints(game, team)
+
+        elif kind == "solve":
+            self.apply_solve(game, event)
+
+        elif kind == "game_started":
+            game["status"] = "active"
+            game["start_time"] = event["start_time"]
+            game["end_time"] = event["end_time"]
+            game["challenge_stats"] = dict.fromkeys(game["challenges"], 0)
+            game["solve_log"] = SolveLog()
+            game["scoring"] = ScoringEngine(game["scoring"].model, game["challenges"])
+            self.start_clock(game_code)
+            self.broadcast_snapshot(game_code)
+
+        elif kind == "game_ended":
+            game["end_time"] = event["end_time"]
+            self.stop_clock(game)
+            game["status"] = "ended"
+            self.broadcast_snapshot(game_code)
+
+        elif kind == "game_restored":
+            # Reloaded from the archive; nobody is connected yet
+            self.restore_game(game_code, event["state"])
+
+        self.broadcast_status(game_code)
+
+    def apply_solve(self, game: dict, event: dict):
+        player_team, current_player = self.find_player(game, event["player_id"])
+        if not player_team: return
+        chal_id = event["challenge_id"]
+        challenge_cfg = game["challenges"][chal_id]
+        points = event["points"]
+        solves_count = game["challenge_stats"][chal_id]
+
+        # Update Stats
+        player_team.record_solve(current_player, chal_id, points, event["at"])
+        game["challenge_stats"][chal_id] += 1
+        penalty = event.get("penalty", 0) # Not recorded before scoring was configurable
+        changes = game["scoring"].solve(chal_id, game["challenge_stats"][chal_id], player_team.id, current_player.id, points, penalty)
+
+        entry = game["solve_log"].append(event["at"], player_team.id, player_team.name, current_player.id, current_player.name,
+                                         chal_id, points, penalty, player_team.score)
+
+        self.publish_member(game, player_team, current_player)
+        self.publish_score(game, player_team)
+        self.rescore(game, changes, event["at"])
+        self.publish_challenge(game, challenge_cfg)
+        # Only the new entry; the admin fetches anything it missed with GET_SOLVES
+        self.publish(game, {"op": "solve_log", "entry": entry}, admin_only=True)
+
+        for member in player_team.members.values():
+            for sock in member.sockets:
+                self.send(sock, {"type": "TOAST", "msg": f"{current_player.name} solved {challenge_cfg.title}! +{points}", "color": "success"})
+                if member.id == current_player.id:
+                    self.send(sock, {"type": "SOLVE_CONFIRMED", "id": chal_id})
+
+        if solves_count == 0:
+             for ws in game["socket_map"]:
+                 self.send(ws, {"type": "TOAST", "msg": f"FIRST BLOOD: {player_team.name} solved {challenge_cfg.title}!", "color": "error"})
+
+    def rescore(self, game: dict, changes, at: float):
+        # Earlier solvers of a challenge whose value moved: one delta per team,
+        # then one re-rank for all of them
+        teams = []
+        for award, delta in changes:
+            team, player = self.find_player(game, award.player_id)
+            if player is None or team.id != award.team_id: continue # Left the game since
+            team.adjust(player, delta)
+            game["solve_log"].rescore(at, team.id, delta)
+            self.publish_member(game, team, player)
+            self.publish(game, {"op": "score", "teamId": team.id, "score": team.score})
+            teams.append(team)
+        if teams: self.publish_ranks(game, game["leaderboard"].update_many(teams))
+
+    # --- RATE LIMITS ---
+    def allow_attempt(self, game_code: str, websocket: WebSocket) -> bool:
+        # Plain dict lookups and token buckets only: runs before the game lock.
+        # The socket is charged first, whether or not it plays as anyone
+        game = self.games[game_code]
+        allowed = self.socket_limits.allow(websocket)
+        p_id = game["socket_map"].get(websocket)
+        team, _ = self.find_player(game, p_id)
+        if team is None:
+            if allowed: return True # Not playing; the handler ignores it anyway
+        elif allowed and game["player_limits"].allow(p_id) and game["team_limits"].allow(team.id):
+            return True
+        else:
+            game["throttled"][team.id] = game["throttled"].get(team.id, 0) + 1
+            game["throttle_pending"].add(team.id)
+            self.broadcast_status(game_code)
+
+        now = time.monotonic()
+        if now - self.throttle_notices.get(websocket, 0.0) >= 1.0:
+            self.throttle_notices[websocket] = now
+            self.send_frames(websocket, THROTTLED_TOAST)
+        return False
+
+    def publish_throttled(self, game: dict):
+        # Straight to the admin, outside the versioned patches: refused attempts
+        # change nothing players or spectators see
+        pending = game["throttle_pending"]
+        if not pending: return
+        if game["admin_socket"]:
+            self.send(game["admin_socket"], {"type": "THROTTLED", "counts": {t_id: game["throttled"][t_id] for t_id in pending}})
+        pending.clear()
+
+    # --- COMMANDS ---
+    # Client messages become Commands run by the game's actor, one at a time. Handlers
+    # validate against current state, commit events and queue replies; returning
+    # True ends the connection.
+    def actor(self, game_code: str) -> GameActor:
+        game = self.games[game_code]
+        if game["actor"] is None:
+            game["actor"] = GameActor(game_code, self.backend.lock, self.observe_command)
+        return game["actor"]
+
+    def submit(self, game_code: str, handler, websocket: Optional[WebSocket], payload: dict, label: str) -> asyncio.Future:
+        return self.actor(game_code).submit(Command(handler, websocket, payload, label))
+
+    def observe_command(self, command: Command, queued: float, total: float):
+        COMMAND_QUEUE_SECONDS.observe(queued, command.label)
+        MESSAGE_SECONDS.observe(total, command.label)
+
+    def is_admin(self, game_code: str, websocket: WebSocket) -> bool:
+        return self.games[game_code]["admin_socket"] == websocket
+
+    async def on_admin_auth(self, game_code: str, websocket: WebSocket, payload: dict):
+        game = self.games[game_code]
+        if payload.get("token") == game["admin_token"]:
+            game["admin_socket"] = websocket
+            self.send(websocket, {"type": "ADMIN_CONFIRMED"})
+            self.send_snapshot(game_code, websocket)
+        else:
+            self.send(websocket, {"type": "ERROR", "msg": "Invalid Admin Token"})
+
+    async def on_player_join(self, game_code: str, websocket: WebSocket, payload: dict):
+        game = self.games[game_code]
+        reconnect_id = text_field(payload, "playerId")
+        found_team, found_player = self.find_player(game, reconnect_id)
+
+        if found_player:
+            await self.release_socket(game_code, websocket)
+            await self.bind_socket(game_code, websocket, found_player)
+            self.send(websocket, {
+                "type": "PLAYER_RESTORED", 
+                "playerId": found_player.id,
+                "teamId": found_team.id,
+                "teamName": found_team.name,
+                "isSolo": found_team.is_solo,
+                "solves": list(found_team.solves)
+            })
+            self.send_snapshot(game_code, websocket, found_team)
+        else:
+            self.send(websocket, {
+                "type": "READY_TO_PICK_TEAM",
+                "teamsEnabled": game["config"].teams_enabled
+            })
+
+    # --- JOIN / CREATE ---
+    async def on_join(self, game_code: str, websocket: WebSocket, payload: dict):
+        # CREATE_TEAM, JOIN_TEAM and JOIN_SOLO
+        game = self.games[game_code]
+        msg_type = payload.get("type")
+        nickname = text_field(payload, "nickname")
+
+        # VALIDATION 1: Player Name
+        if not nickname: return
+        if nickname.lower() in game["player_names"]:
+            self.send(websocket, {"type": "TOAST", "msg": "Nickname already taken", "color": "error"})
+            return
+
+        event = {"type": "player_joined", "player_id": generate_id(), "name": nickname}
+
+        # VALIDATION 2: Team Logic
+        if msg_type == "CREATE_TEAM":
+            if not game["config"].teams_enabled: return
+            team_name = text_field(payload, "teamName")
+            if not team_name: return
+            if team_name.lower() in game["team_names"]:
+                self.send(websocket, {"type": "TOAST", "msg": "Team name already taken", "color": "error"})
+                return
+            event.update(new_team=True, team_name=team_name, is_solo=False)
+
+        elif msg_type == "JOIN_TEAM":
+            if not game["config"].teams_enabled: return
+            t_code = text_field(payload, "teamCode")
+            if t_code not in game["teams"]:
+                self.send(websocket, {"type": "TOAST", "msg": "Team not found", "color": "error"})
+                return
+
+            if game["config"].max_team_size > 0 and len(game["teams"][t_code].members) >= game["config"].max_team_size:
+                self.send(websocket, {"type": "TOAST", "msg": "Team is full", "color": "error"})
+                return
+            event["team_id"] = t_code
+
+        elif msg_type == "JOIN_SOLO":
+            # Check if nickname (team name) is taken by another team
+            if nickname.lower() in game["team_names"]:
+                self.send(websocket, {"type": "TOAST", "msg": "Name already taken by a team", "color": "error"})
+                return
+            event.update(new_team=True, team_name=nickname, is_solo=True)
+
+        if event.get("new_team"):
+            # Unique across workers: we hold the lock and our copy is current
+            t_id = generate_team_code()
+            while t_id in game["teams"]: t_id = generate_team_code()
+            event["team_id"] = t_id
+
+        # --- COMMIT ---
+        await self.release_socket(game_code, websocket)
+        await self.backend.commit(game_code, event)
+        target_team, new_player = self.find_player(game, event["player_id"])
+        await self.bind_socket(game_code, websocket, new_player)
+
+        self.send(websocket, {
+            "type": "PLAYER_CONFIRMED", 
+            "playerId": new_player.id,
+            "teamId": target_team.id,
+            "teamName": target_team.name,
+            "isSolo": target_team.is_solo,
+            "solves": list(target_team.solves)
+        })
+        self.send_snapshot(game_code, websocket, target_team)
+
+    # --- GAME COMMANDS ---
+    async def on_start_game(self, game_code: str, websocket: WebSocket, payload: dict):
+        if not self.is_admin(game_code, websocket): return
+        now = time.time()
+        await self.backend.commit(game_code, {
+            "type": "game_started",
+            "start_time": now,
+            "end_time": now + self.games[game_code]["config"].duration_seconds
+        })
+
+    async def on_resync(self, game_code: str, websocket: WebSocket, payload: dict):
+        # Client missed a LOBBY_PATCH version; send it the full state again
+        game = self.games[game_code]
+        player_team, _ = self.find_player(game, game["socket_map"].get(websocket))
+        self.send_snapshot(game_code, websocket, player_team)
+
+    async def on_end_game(self, game_code: str, websocket: WebSocket, payload: dict):
+        if self.is_admin(game_code, websocket): await self.commit_end(game_code, time.time())
+
+    async def on_expire(self, game_code: str, websocket: None, payload: dict):
+        # Scheduled by the game clock rather than sent by a client
+        await self.commit_end(game_code, payload["end_time"])
+
+    async def on_kick_player(self, game_code: str, websocket: WebSocket, payload: dict):
+        if not self.is_admin(game_code, websocket): return
+        p_id = text_field(payload, "playerId")
+        _, victim = self.find_player(self.games[game_code], p_id)
+        if victim:
+            await self.backend.commit(game_code, {"type": "player_removed", "player_id": p_id})
+
+    async def on_kick_team(self, game_code: str, websocket: WebSocket, payload: dict):
+        if not self.is_admin(game_code, websocket): return
+        t_id = text_field(payload, "teamId")
+        if t_id in self.games[game_code]["teams"]:
+            await self.backend.commit(game_code, {"type": "team_removed", "team_id": t_id})
+
+    async def on_get_solves(self, game_code: str, websocket: WebSocket, payload: dict):
+        if not self.is_admin(game_code, websocket): return
+        log = self.games[game_code]["solve_log"]
+        since = payload.get("since")
+        since = since if isinstance(since, int) else 0
+        self.send(websocket, {
+            "type": "SOLVE_LOG",
+            "since": since,
+            "entries": log.since(since, SOLVE_LOG_PAGE),
+            "total": len(log)
+        })
+
+    async def on_get_timeline(self, game_code: str, websocket: WebSocket, payload: dict):
+        if not self.is_admin(game_code, websocket): return
+        game = self.games[game_code]
+        self.send(websocket, {"type": "TIMELINE", "series": game["solve_log"].timeline(game["teams"])})
+
+    # --- HINTS ---
+    async def on_buy_hint(self, game_code: str, websocket: WebSocket, payload: dict):
+        game = self.games[game_code]
+        if game["status"] != "active": return
+
+        p_id = game["socket_map"].get(websocket)
+        player_team, _ = self.find_player(game, p_id)
+        if not player_team: return
+
+        # Extract from nested payload if present
+        data_payload = inner_payload(payload)
+        chal_id = text_field(data_payload, "challengeId")
+        hint_id = text_field(data_payload, "hintId")
+
+        challenge_cfg = game["challenges"].get(chal_id)
+        if not challenge_cfg: return
+
+        # Find hint and its index
+        hint_index = game["hint_index"][chal_id].get(hint_id)
+        if hint_index is None: return
+        hint = challenge_cfg.hints[hint_index]
+
+        # Check if previous hint is unlocked
+        if hint_index > 0:
+            prev_hint = challenge_cfg.hints[hint_index - 1]
+            if not player_team.has_hint(chal_id, prev_hint.id):
+                self.send(websocket, {"type": "TOAST", "msg": "You must unlock previous hints first!", "color": "error"})
+                return
+
+        if not player_team.has_hint(chal_id, hint_id):
+            await self.backend.commit(game_code, {
+                "type": "hint_unlocked",
+                "team_id": player_team.id,
+                "challenge_id": chal_id,
+                "hint_id": hint_id
+            })
+            self.send(websocket, {"type": "TOAST", "msg": f"Hint unlocked! -{hint.cost} potential points", "color": "warning"})
+
+    # --- FLAGS ---
+    async def on_submit_flag(self, game_code: str, websocket: WebSocket, payload: dict):
+        game = self.games[game_code]
+        if game["status"] != "active": return
+
+        p_id = game["socket_map"].get(websocket)
+        player_team, current_player = self.find_player(game, p_id)
+        if not player_team: return
+
+        # Extract from nested payload if present
+        data_payload = inner_payload(payload)
+        chal_id = text_field(data_payload, "challengeId")
+        flag_guess = data_payload.get("flag")
+        challenge_cfg = game["challenges"].get(chal_id)
+        if not challenge_cfg: return
+
+        if chal_id in player_team.solves: # Check team solves
+            self.send(websocket, {"type": "TOAST", "msg": "You already solved this!", "color": "info"})
+        elif game["flags"][chal_id].matches(flag_guess, player_team.id):
+            # Points are read and the solve committed in one command, so two teams
+            # solving together each see the other's solve count
+            penalty = sum(h.cost for h in challenge_cfg.hints if player_team.has_hint(chal_id, h.id))
+            points = game["scoring"].points(chal_id, game["challenge_stats"][chal_id], penalty)
+
+            await self.backend.commit(game_code, {
+                "type": "solve",
+                "team_id": player_team.id,
+                "player_id": current_player.id,
+                "challenge_id": chal_id,
+                "points": points,
+                "penalty": penalty,
+                "at": time.time()
+            })
+        else:
+            self.send(websocket, {"type": "TOAST", "msg": "Incorrect Flag", "color": "error"})
+
+    async def on_leave_game(self, game_code: str, websocket: WebSocket, payload: dict):
+        game = self.games[game_code]
+        # If game ended, treat leave as disconnect (preserve state)
+        if game["status"] == "ended":
+            await self.release_socket(game_code, websocket)
+        else:
+            p_id = game["socket_map"].pop(websocket, None)
+            _, player = self.find_player(game, p_id)
+            if player:
+                # Other sockets of this player get KICKED to force reload/home
+                player.sockets.remove(websocket)
+                await self.backend.commit(game_code, {"type": "player_removed", "player_id": p_id})
+        self.close(websocket)
+        return True
+
+    async def on_disconnect(self, game_code: str, websocket: WebSocket, payload: dict):
+        game = self.games[game_code]
+        await self.release_socket(game_code, websocket)
+        if game["admin_socket"] == websocket:
+            game["admin_socket"] = None
+
+    # --- METRICS ---
+    def queue_depth(self) -> int:
+        return sum(len(outbox.queue) for outbox in self.outboxes.values())
+
+    # --- OUTBOUND ---
+    def attach(self, websocket: WebSocket, codec: Codec, game_code: str) -> Outbox:
+        game = self.games[game_code]
+        outbox = self.outboxes[websocket] = Outbox(websocket, codec, OUTBOX_MAX_MESSAGES, OUTBOX_MAX_LAG_SECONDS,
+                                                   on_dead=lambda reason: self.reap(websocket, reason))
+        self.socket_games[websocket] = game_code
+        game["sockets"].add(websocket)
+        game["last_seen"] = time.time()
+        return outbox
+
+    def detach(self, websocket: WebSocket, game: dict):
+        game["sockets"].discard(websocket)
+        game["last_seen"] = time.time()
+        self.socket_limits.forget(websocket)
+        self.throttle_notices.pop(websocket, None)
+        self.socket_games.pop(websocket, None)
+        outbox = self.outboxes.pop(websocket, None)
+        if outbox: outbox.cancel()
+
+    def reap(self, websocket: WebSocket, reason: str):
+        # A socket that failed a send, fell behind or went silent leaves its game now,
+        # so broadcasts stop paying for it before its reader sees the disconnect
+        game_code = self.socket_games.pop(websocket, None)
+        if game_code is None: return # Already reaped, or gone
+        REAPED.inc(reason)
+        outbox = self.outboxes.get(websocket)
+        if outbox: outbox.abort()
+        if game_code in self.games:
+            self.submit(game_code, self.on_disconnect, websocket, {}, "reaped")
+
+    async def heartbeat_forever(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+            now = time.monotonic()
+            for websocket, outbox in list(self.outboxes.items()):
+                if now - outbox.last_heard > HEARTBEAT_TIMEOUT_SECONDS:
+                    self.reap(websocket, "heartbeat")
+                else:
+                    self.send_frames(websocket, PING)
+
+    async def admit_reconnect(self, outbox: Outbox):
+        # Past the burst, wait for this reconnect's turn, plus jitter so the
+        # waiting ones do not all come back in the same tick
+        if self.reconnects is None: return
+        wait = self.reconnects.reserve()
+        if wait: wait += random.uniform(0, RECONNECT_JITTER_SECONDS)
+        RECONNECT_WAIT_SECONDS.observe(wait)
+        if wait:
+            outbox.last_heard = time.monotonic() + wait # Not silent, just waiting
+            await asyncio.sleep(wait)
+
+    def send(self, websocket: WebSocket, msg: dict):
+        outbox = self.outboxes.get(websocket)
+        if outbox: outbox.send(outbox.codec.finish(outbox.codec.encode(msg)))
+
+    # The senders below take a message shared by many sockets, encode it in each
+    # socket's codec on first use, and return the bytes queued
+    def send_frames(self, websocket: WebSocket, frames: Frames) -> int:
+        outbox = self.outboxes.get(websocket)
+        if not outbox: return 0
+        frame = frames.get(outbox.codec)
+        outbox.send(frame)
+        return len(frame)
+
+    def send_update(self, websocket: WebSocket, frames: Frames) -> int:
+        outbox = self.outboxes.get(websocket)
+        if not outbox: return 0
+        frame = frames.get(outbox.codec)
+        outbox.send_update(frame)
+        return len(frame)
+
+    def send_patch(self, websocket: WebSocket, frames: Frames) -> int:
+        outbox = self.outboxes.get(websocket)
+        if not outbox: return 0
+        frame = frames.get(outbox.codec)
+        outbox.send_patch(frame)
+        return len(frame)
+
+    def close(self, websocket: WebSocket):
+        outbox = self.outboxes.get(websocket)
+        if outbox: outbox.close()
+
+    # --- STATE PATCHES ---
+    # Every change to shared game state is recorded as a small op. broadcast_status
+    # marks the game dirty and flush_patches ships the pending ops as one versioned
+    # LOBBY_PATCH per tick; clients that see a gap in versions send RESYNC and get
+    # a fresh LOBBY_UPDATE snapshot. Ops are idempotent, so a snapshot taken while
+    # ops are still pending stays correct when the next patch re-applies them.
+    def publish(self, game: dict, op: dict, admin_only: bool = False):
+        game["pending_admin_ops" if admin_only else "pending_ops"].append(op)
+
+    def publish_team(self, game: dict, team: Team):
+        self.publish(game, {"op": "team", "team": self.team_entry(game, team)})
+
+    def publish_team_removed(self, game: dict, team: Team):
+        self.publish(game, {"op": "team_removed", "teamId": team.id})
+
+    def publish_member(self, game: dict, team: Team, player: Player):
+        self.publish(game, {"op": "member", "teamId": team.id, "member": player.to_dict()})
+
+    def publish_member_removed(self, game: dict, team: Team, player_id: str):
+        self.publish(game, {"op": "member_removed", "teamId": team.id, "memberId": player_id})
+
+    def publish_score(self, game: dict, team: Team):
+        self.publish(game, {"op": "score", "teamId": team.id, "score": team.score})
+        self.publish_ranks(game, game["leaderboard"].update(team))
+
+    def publish_ranks(self, game: dict, ranks: Dict[str, int]):
+        if ranks: self.publish(game, {"op": "ranks", "ranks": ranks})
+
+    def team_entry(self, game: dict, team: Team) -> dict:
+        entry = team.to_dict()
+        entry["rank"] = game["leaderboard"].rank(team.id)
+        return entry
+
+    def publish_challenge(self, game: dict, challenge: Challenge):
+        solves = game["challenge_stats"].get(challenge.id, 0)
+        self.publish(game, {
+            "op": "challenge",
+            "id": challenge.id,
+            "points": self.challenge_points(game, challenge.id),
+            "solves": solves
+        })
+
+    def hint_overlay(self, game: dict, team: Team, codec: Codec):
+        # Per-team LOBBY_UPDATE fields, encoded once per codec and reused until a hint is bought
+        if team.hint_overlay is None: team.hint_overlay = {}
+        fragment = team.hint_overlay.get(codec)
+        if fragment is None:
+            content = game["hint_content"]
+            unlocked_content = {h_id: content[c_id][h_id] for c_id, h_ids in team.unlocked_hints.items() for h_id in h_ids}
+            fragment = team.hint_overlay[codec] = codec.fragment({
+                "my_unlocked_hints": team.hints_dict(),
+                "hint_content": unlocked_content
+            })
+        return fragment
+
+    def team_frames(self, game: dict, team: Team, shared: Shared) -> Spliced:
+        return Spliced(shared, lambda codec: self.hint_overlay(game, team, codec))
+
+    def send_hints(self, game: dict, team: Team):
+        # Hints are private to a team, so they bypass the shared patch stream
+        frames = self.team_frames(game, team, Shared({"type": "HINTS_UPDATE"}))
+        for player in team.members.values():
+            for sock in player.sockets:
+                self.send_frames(sock, frames)
+
+    def snapshot(self, game: dict, admin: bool = False) -> dict:
+        # Already in rank order; no per-broadcast sort
+        teams_list = []
+        for rank, team_id in enumerate(game["leaderboard"].team_ids(), start=1):
+            entry = game["teams"][team_id].to_dict()
+            entry["rank"] = rank
+            teams_list.append(entry)
 
         # Base challenge payload (for players)
-        base_challenges = []
+        challenges = []
         if game["status"] == "active" or game["status"] == "ended":
             for c in game["config"].challenges:
                 solves = game["challenge_stats"].get(c.id, 0)
-                current_points = self.calculate_points(c, solves)
+                current_points = self.challenge_points(game, c.id)
                 
-                base_challenges.append({
+                entry = {
                     "id": c.id, 
                     "title": c.title, 
                     "category": c.category, 
@@ -116,449 +1116,370 @@ class GameManager:
                     "desc": c.desc,
                     "files": c.files,
                     "solves": solves,
-                    "flag_mask": self.generate_flag_mask(c.flag),
+                    "flag_mask": game["flag_masks"][c.id],
                     "hints": [{"id": h.id, "cost": h.cost} for h in c.hints],
-                    # Players don't get the history log to save bandwidth/prevent cheating
-                })
+                }
+                challenges.append(entry)
 
-        # Broadcast to Admin (WITH LOGS)
-        if game["admin_socket"]:
-            admin_challenges = []
-            for c in base_challenges:
-                # Add history
-                c_copy = c.copy()
-                c_copy["solve_history"] = game["detailed_solves"].get(c["id"], [])
-                admin_challenges.append(c_copy)
-
-            admin_msg = {
-                "type": "LOBBY_UPDATE",
-                "status": game["status"],
-                "leaderboard": teams_list,
-                "challenges": admin_challenges,
-                "endTime": game["end_time"]
-            }
-            try: await game["admin_socket"].send_text(json.dumps(admin_msg))
-            except: pass
-
-        # Broadcast to Players (WITHOUT LOGS)
-        player_msg = {
+        snapshot = {
             "type": "LOBBY_UPDATE",
+            "version": game["version"],
             "status": game["status"],
             "leaderboard": teams_list,
-            "challenges": base_challenges,
+            "challenges": challenges,
             "endTime": game["end_time"]
         }
+        if admin:
+            snapshot["throttled"] = game["throttled"]
+            # Log length rather than the log itself, which the admin pages in from its cursor
+            snapshot["solve_log"] = len(game["solve_log"])
+            snapshot["startTime"] = game["start_time"]
+        return snapshot
+
+    def send_snapshot(self, game_code: str, websocket: WebSocket, team: Optional[Team] = None):
+        # Full state for one socket: on connect, restore or RESYNC. Players get theirs
+        # at the next flush, which builds one snapshot for everyone waiting
+        game = self.games[game_code]
+        if websocket == game["admin_socket"]:
+            self.send_update(websocket, Frames(self.snapshot(game, admin=True)))
+        elif team:
+            game["snapshot_waiting"].add(websocket)
+            self.broadcast_status(game_code)
+
+    def flush_snapshots(self, game: dict):
+        # Sent ahead of the patch of the same flush, which they may already include;
+        # ops are idempotent, so re-applying it is harmless
+        waiting = game["snapshot_waiting"]
+        if not waiting: return
+        game["snapshot_waiting"] = set()
+        started = time.perf_counter()
+        shared = Shared(self.snapshot(game))
+        frames: Dict[str, Spliced] = {} # team_id -> frames, shared by the team's sockets
+        sent = 0
+        for sock in waiting:
+            team, _ = self.find_player(game, game["socket_map"].get(sock))
+            if not team: continue # Left or was kicked meanwhile
+            if team.id not in frames: frames[team.id] = self.team_frames(game, team, shared)
+            sent += self.send_update(sock, frames[team.id])
+        BROADCAST_SECONDS.observe(time.perf_counter() - started, "resync")
+        BROADCAST_BYTES.inc("resync", amount=sent)
+
+    def broadcast_snapshot(self, game_code: str):
+        # Used when the whole view changes (game started/ended)
+        if game_code not in self.games: return
+        started = time.perf_counter()
+        game = self.games[game_code]
+        game["version"] += 1
+        game["pending_ops"] = []
+        game["pending_admin_ops"] = []
+        game["snapshot_waiting"] = set() # Everyone gets this one
+        sent = 0
+
+        # Broadcast to Admin (WITH LOGS)
+        if game["admin_socket"]:
+            sent += self.send_update(game["admin_socket"], Frames(self.snapshot(game, admin=True)))
+
+        # Broadcast to Players (WITHOUT LOGS)
+        # Encode the shared part once per codec; each team only splices in its hint fields
+        shared = Shared(self.snapshot(game))
         
         for team in game["teams"].values():
-            # Prepare unlocked hint content for this team
-            unlocked_content = {}
+            team_frames = self.team_frames(game, team, shared)
+            for player in team.members.values():
+                for sock in player.sockets:
+                    sent += self.send_update(sock, team_frames)
+
+        BROADCAST_SECONDS.observe(time.perf_counter() - started, "snapshot")
+        BROADCAST_BYTES.inc("snapshot", amount=sent)
+        self.publish_scoreboard(game_code)
+
+    def broadcast_status(self, game_code: str):
+        # Coalesce: schedule one flush for this tick instead of fanning out per event
+        if game_code not in self.games: return
+        game = self.games[game_code]
+        if game["flush_handle"]: return
+
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, game["last_flush"] + BROADCAST_TICK_SECONDS - loop.time())
+        game["flush_handle"] = loop.call_later(delay, self.flush_patches, game_code)
+
+    def flush_patches(self, game_code: str):
+        if game_code not in self.games: return
+        game = self.games[game_code]
+        game["flush_handle"] = None
+        game["last_flush"] = asyncio.get_running_loop().time()
+        self.publish_throttled(game)
+        self.flush_snapshots(game)
+        if not game["pending_ops"]: return # Admin-only ops ride along with the next public change
+
+        started = time.perf_counter()
+        game["version"] += 1
+        ops = game["pending_ops"]
+        admin_ops = ops + game["pending_admin_ops"]
+        game["pending_ops"] = []
+        game["pending_admin_ops"] = []
+
+        sent = 0
+
+        if game["admin_socket"]:
+            sent += self.send_patch(game["admin_socket"], Frames({"type": "LOBBY_PATCH", "version": game["version"], "ops": admin_ops}))
+
+        # Every player sees the same patch, so it is encoded once per codec
+        player_patch = Frames({"type": "LOBBY_PATCH", "version": game["version"], "ops": ops})
+        for sock in game["socket_map"]:
+            sent += self.send_patch(sock, player_patch)
+
+        BROADCAST_SECONDS.observe(time.perf_counter() - started, "patch")
+        BROADCAST_BYTES.inc("patch", amount=sent)
+        self.publish_scoreboard(game_code)
+
+    # --- SPECTATORS ---
+    def scoreboard(self, game: dict) -> dict:
+        # Public view for projectors: no flags, hints or IDs (team IDs are join codes,
+        # player IDs reconnect tokens)
+        teams_list = []
+        for rank, team_id in enumerate(game["leaderboard"].team_ids(), start=1):
+            team = game["teams"][team_id]
+            members = sorted(team.members.values(), key=lambda p: p.score, reverse=True)
+            teams_list.append({
+                "rank": rank,
+                "name": team.name,
+                "score": team.score,
+                "is_solo": team.is_solo,
+                "solves": len(team.solves),
+                "members": [{"name": p.name, "score": p.score} for p in members]
+            })
+
+        challenges = []
+        if game["status"] == "active" or game["status"] == "ended":
             for c in game["config"].challenges:
-                if c.id in team.unlocked_hints:
-                    for h in c.hints:
-                        if h.id in team.unlocked_hints[c.id]:
-                            unlocked_content[h.id] = h.content
+                solves = game["challenge_stats"].get(c.id, 0)
+                challenges.append({
+                    "title": c.title,
+                    "category": c.category,
+                    "points": self.challenge_points(game, c.id),
+                    "solves": solves
+                })
+
+        return {
+            "version": game["version"],
+            "status": game["status"],
+            "leaderboard": teams_list,
+            "challenges": challenges,
+            "endTime": game["end_time"]
+        }
 
-            # Create a team-specific message
-            team_msg = player_msg.copy()
-            team_msg["my_unlocked_hints"] = team.unlocked_hints
-            team_msg["hint_content"] = unlocked_content
+    def scoreboard_feed(self, game: dict) -> ScoreboardFeed:
+        # Built at most once per version, however many spectators ask
+        feed = game["feed"]
+        if feed.version != game["version"]: feed.update(game["version"], self.scoreboard(game))
+        return feed
 
-            for player in team.members.values():
-                for sock in player.sockets:
-                    try: await sock.send_text(json.dumps(team_msg))
-                    except: pass
+    def publish_scoreboard(self, game_code: str):
+        # Only with someone streaming; plain GETs rebuild on demand
+        feed = self.games[game_code]["feed"]
+        if not feed.viewers or feed.handle: return
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, feed.last_publish + SCOREBOARD_TICK_SECONDS - loop.time())
+        feed.handle = loop.call_later(delay, self.flush_scoreboard, game_code)
+
+    def flush_scoreboard(self, game_code: str):
+        if game_code not in self.games: return
+        feed = self.games[game_code]["feed"]
+        feed.handle = None
+        feed.last_publish = asyncio.get_running_loop().time()
+        self.scoreboard_feed(self.games[game_code])
+
+manager = GameManager(backend_from_env())
 
-manager = GameManager()
+# Sampled at scrape time, so they cost nothing between scrapes
+REGISTRY.gauge("dashflag_games_loaded", "Games held in this worker", lambda: len(manager.games))
+REGISTRY.gauge("dashflag_games_running", "Loaded games that have started and not ended", lambda: sum(g["status"] == "active" for g in manager.games.values()))
+REGISTRY.gauge("dashflag_challenge_sets", "Distinct challenge sets shared by the loaded games", interned_count)
+REGISTRY.gauge("dashflag_connected_sockets", "Open websockets on this worker", lambda: len(manager.outboxes))
+REGISTRY.gauge("dashflag_outbound_queue_depth", "Messages waiting in all outbound queues", manager.queue_depth)
+REGISTRY.gauge("dashflag_spectator_streams", "Open scoreboard streams on this worker", lambda: sum(g["feed"].viewers for g in manager.games.values()))
 
 # --- API ---
 
+async def resolve_premade(config: GameConfig):
+    # Pre-made challenges are sent without their flag; the catalog fills it in
+    await catalog.ready()
+    for i, chosen in enumerate(config.challenges):
+        if not chosen.is_premade: continue
+        try:
+            challenge = await catalog.resolve(chosen)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if challenge is None: raise HTTPException(status_code=422, detail=f"Unknown pre-made challenge: {chosen.id}")
+        config.challenges[i] = challenge
+
 @app.post("/api/create")
 async def create_game_endpoint(config: GameConfig):
-    code, token = manager.create_game(config)
+    await resolve_premade(config)
+    try:
+        code, token = await manager.create_game(config)
+    except CodesExhausted:
+        raise HTTPException(status_code=503, detail="No game codes left")
     return {"gameCode": code, "adminToken": token}
 
+@app.post("/api/create/bulk")
+async def create_games_endpoint(request: BulkCreate):
+    # `count` games from one config, e.g. one per room of a league
+    if not 1 <= request.count <= BULK_CREATE_MAX:
+        raise HTTPException(status_code=422, detail=f"count must be between 1 and {BULK_CREATE_MAX}")
+    await resolve_premade(request.config)
+    try:
+        created = await manager.create_games(request.config, request.count)
+    except CodesExhausted:
+        raise HTTPException(status_code=503, detail="No game codes left")
+    return {"games": [{"gameCode": code, "adminToken": token} for code, token in created]}
+
+file_store = FileStore("uploads", UPLOAD_MAX_BYTES, FILE_CACHE_BYTES, FILE_CACHE_MAX_FILE_BYTES)
+
+@app.api_route("/uploads/{path:path}", methods=["GET", "HEAD"])
+async def download_file(path: str, request: Request):
+    return await file_store.serve(path, request)
+
+catalog = ChallengeCatalog(PREMADE_CHALLENGES, CHALLENGE_PACKS_DIR, files_url="/packs")
+# Files attached to pack challenges, read from the pack on first download
+pack_store = FileStore(CHALLENGE_PACKS_DIR, 0, FILE_CACHE_BYTES, FILE_CACHE_MAX_FILE_BYTES) if CHALLENGE_PACKS_DIR else None
+
+@app.api_route("/packs/{path:path}", methods=["GET", "HEAD"])
+async def download_pack_file(path: str, request: Request):
+    await catalog.ready()
+    if pack_store is None or path not in catalog.files: return Response(status_code=404)
+    return await pack_store.serve(path, request)
+
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    # Sanitize the filename to ensure it's just the name, no paths
-    safe_filename = os.path.basename(file.filename)
-    
-    # Create a unique filename
-    file_location = f"uploads/{secrets.token_hex(8)}_{safe_filename}"
-    
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
-        
-    return {"filename": safe_filename, "url": f"/uploads/{os.path.basename(file_location)}"}
+async def upload_file(request: Request):
+    # The form is parsed by file_store.save as the body streams in, not spooled by
+    # FastAPI first, so the size limit holds for chunked bodies too
+    length = request.headers.get("content-length")
+    if length is not None and not length.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    try:
+        if length and int(length) > file_store.max_body_bytes: raise UploadTooLarge() # Refused unread
+        path, _ = await file_store.save(request)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="File too large")
+    except UploadInvalid as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Identical content returns the URL it was first stored under
+    return {"filename": path.split("/")[-1], "url": f"/uploads/{path}"}
+
+@app.get("/metrics")
+async def metrics():
+    # Per worker; scrape each one when running several
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/games/{game_code}/scoreboard")
+async def get_scoreboard(game_code: str, request: Request):
+    game = await manager.get_game(game_code)
+    if game is None: raise HTTPException(status_code=404, detail="Game not found")
+    feed = manager.scoreboard_feed(game)
+    headers = {"ETag": feed.etag, "Cache-Control": "no-cache"}
+    if feed.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(feed.body, media_type="application/json", headers=headers)
+
+@app.get("/api/games/{game_code}/scoreboard/stream")
+async def stream_scoreboard(game_code: str, request: Request):
+    # Server-sent events: one "scoreboard" event per published version, event id = version
+    game = await manager.get_game(game_code)
+    if game is None: raise HTTPException(status_code=404, detail="Game not found")
+    feed = manager.scoreboard_feed(game)
+    last_id = request.headers.get("last-event-id", "")
+    return StreamingResponse(
+        feed.stream(int(last_id) if last_id.isdigit() else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/premade-challenges")
-async def get_premade_challenges():
-    return PREMADE_CHALLENGES
+async def get_premade_challenges(request: Request, category: Optional[str] = None, tag: Optional[str] = None,
+                                 min_points: Optional[int] = None, max_points: Optional[int] = None,
+                                 q: Optional[str] = None, offset: int = 0, limit: int = 50):
+    # One page of the catalog, without flags: {total, offset, limit, facets, items}
+    await catalog.ready()
+    key = catalog.query_key(category, tag, min_points, max_points, q, offset, limit)
+    etag = catalog.page_etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    _, body = catalog.page(key)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/api/premade-challenges/{challenge_id}")
+async def get_premade_challenge(challenge_id: str, request: Request):
+    # The whole challenge (description included, flag not), to add it to a game
+    await catalog.ready()
+    detail = await catalog.detail(challenge_id)
+    if detail is None: raise HTTPException(status_code=404, detail="Challenge not found")
+    etag, body, _ = detail
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.websocket("/ws/{game_code}")
 async def websocket_endpoint(websocket: WebSocket, game_code: str):
-    await websocket.accept()
+    subprotocol, codec = negotiate(CODECS, websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol)
     
-    if game_code not in manager.games:
-        await websocket.send_json({"type": "ERROR", "payload": "INVALID_CODE"})
+    game = await manager.get_game(game_code)
+    if game is None:
+        frame = codec.finish(codec.encode({"type": "ERROR", "payload": "INVALID_CODE"}))
+        await (websocket.send_bytes(frame) if isinstance(frame, bytes) else websocket.send_text(frame))
         await websocket.close()
         return
 
-    game = manager.games[game_code]
+    outbox = manager.attach(websocket, codec, game_code)
 
     try:
-        await websocket.send_json({"type": "CONNECTED_WAITING_AUTH"})
-        
-        # Helper to clean up socket from previous player if exists
-        def remove_socket_from_previous_player(ws):
-            old_p_id = game["socket_map"].get(ws)
-            if old_p_id:
-                for team in game["teams"].values():
-                    if old_p_id in team.members:
-                        player = team.members[old_p_id]
-                        if ws in player.sockets:
-                            player.sockets.remove(ws)
-                        player.is_connected = len(player.sockets) > 0
-                        break
-                del game["socket_map"][ws]
+        manager.send(websocket, {"type": "CONNECTED_WAITING_AUTH"})
 
         while True:
-            data = await websocket.receive_text()
-            payload = json.loads(data)
-            msg_type = payload.get("type")
-
-            # --- AUTH ---
-            if msg_type == "ADMIN_AUTH":
-                if payload.get("token") == game["admin_token"]:
-                    game["admin_socket"] = websocket
-                    await websocket.send_json({"type": "ADMIN_CONFIRMED"})
-                    await manager.broadcast_status(game_code)
-                else:
-                    await websocket.send_json({"type": "ERROR", "msg": "Invalid Admin Token"})
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if websocket not in manager.socket_games: continue # Reaped; the disconnect is on its way
+            outbox.last_heard = time.monotonic()
+            try:
+                payload = codec.decode(message.get("text") or message.get("bytes"))
+            except (ValueError, TypeError): # Malformed; orjson and msgpack errors are ValueErrors
+                payload = None
+            if not isinstance(payload, dict):
+                MESSAGES.inc("other")
+                continue
+            msg_type = text_field(payload, "type")
+            label = msg_type if msg_type in MESSAGE_TYPES else "other"
+            MESSAGES.inc(label)
+            if msg_type == "PONG": continue # Hearing it was the point
 
-            if msg_type == "PLAYER_JOIN":
-                reconnect_id = payload.get("playerId")
-                found_player = None
-                found_team = None
-                
-                if reconnect_id:
-                    for team in game["teams"].values():
-                        if reconnect_id in team.members:
-                            found_player = team.members[reconnect_id]
-                            found_team = team
-                            break
-                
-                if found_player:
-                    remove_socket_from_previous_player(websocket)
-                    found_player.sockets.append(websocket)
-                    found_player.is_connected = True
-                    game["socket_map"][websocket] = found_player.id
-                    await websocket.send_json({
-                        "type": "PLAYER_RESTORED", 
-                        "playerId": found_player.id,
-                        "teamId": found_team.id,
-                        "teamName": found_team.name,
-                        "isSolo": found_team.is_solo,
-                        "solves": found_team.solves
-                    })
-                    await manager.broadcast_status(game_code)
-                else:
-                    await websocket.send_json({
-                        "type": "READY_TO_PICK_TEAM",
-                        "teamsEnabled": game["config"].teams_enabled
-                    })
-
-            # --- JOIN / CREATE ---
-            if msg_type in ["CREATE_TEAM", "JOIN_TEAM", "JOIN_SOLO"]:
-                nickname = payload.get("nickname")
-                
-                # VALIDATION 1: Player Name
-                if any(p.name.lower() == nickname.lower() for t in game["teams"].values() for p in t.members.values()):
-                    await websocket.send_json({"type": "TOAST", "msg": "Nickname already taken", "color": "error"})
-                    continue
+            # Reconnect storms are spread out before they reach the game
+            if msg_type == "PLAYER_JOIN" and payload.get("playerId"):
+                await manager.admit_reconnect(outbox)
 
-                target_team = None
-                
-                # VALIDATION 2: Team Logic
-                if msg_type == "CREATE_TEAM":
-                    if not game["config"].teams_enabled: continue 
-                    team_name = payload["teamName"]
-                    if any(t.name.lower() == team_name.lower() for t in game["teams"].values()):
-                        await websocket.send_json({"type": "TOAST", "msg": "Team name already taken", "color": "error"})
-                        continue
-                    
-                    # Prepare team creation
-                    t_id = generate_team_code()
-                    new_team = Team(team_name, is_solo=False)
-                    new_team.id = t_id
-                    target_team = new_team
-
-                elif msg_type == "JOIN_TEAM":
-                    if not game["config"].teams_enabled: continue
-                    t_code = payload["teamCode"]
-                    if t_code not in game["teams"]:
-                        await websocket.send_json({"type": "TOAST", "msg": "Team not found", "color": "error"})
-                        continue
-                    
-                    target_team = game["teams"][t_code]
-                    if game["config"].max_team_size > 0 and len(target_team.members) >= game["config"].max_team_size:
-                        await websocket.send_json({"type": "TOAST", "msg": "Team is full", "color": "error"})
-                        continue
-
-                elif msg_type == "JOIN_SOLO":
-                    # Check if nickname (team name) is taken by another team
-                    if any(t.name.lower() == nickname.lower() for t in game["teams"].values()):
-                        await websocket.send_json({"type": "TOAST", "msg": "Name already taken by a team", "color": "error"})
-                        continue
-                    
-                    solo_team = Team(nickname, is_solo=True)
-                    solo_team.id = generate_team_code()
-                    target_team = solo_team
-
-                # --- COMMIT ---
-                new_player = Player(nickname, socket=websocket)
-                
-                remove_socket_from_previous_player(websocket)
-                game["socket_map"][websocket] = new_player.id
-                
-                # If it's a new team, add it to the game
-                if msg_type == "CREATE_TEAM" or msg_type == "JOIN_SOLO":
-                    game["teams"][target_team.id] = target_team
-
-                target_team.add_member(new_player)
-                
-                await websocket.send_json({
-                    "type": "PLAYER_CONFIRMED", 
-                    "playerId": new_player.id,
-                    "teamId": target_team.id,
-                    "teamName": target_team.name,
-                    "isSolo": target_team.is_solo,
-                    "solves": target_team.solves
-                })
-                await manager.broadcast_status(game_code)
-
-            # --- GAME COMMANDS ---
-            if msg_type == "START_GAME" and game["admin_socket"] == websocket:
-                game["status"] = "active"
-                game["start_time"] = time.time()
-                game["end_time"] = time.time() + game["config"].duration_seconds
-                game["challenge_stats"] = {c.id: 0 for c in game["config"].challenges}
-                # Reset detailed logs
-                game["detailed_solves"] = {c.id: [] for c in game["config"].challenges}
-                await manager.broadcast_status(game_code)
-
-            if msg_type == "CHECK_TIME":
-                if game["status"] == "active" and game["end_time"] and time.time() >= game["end_time"]:
-                    game["status"] = "ended"
-                    await manager.broadcast_status(game_code)
-
-            if msg_type == "END_GAME" and game["admin_socket"] == websocket:
-                game["status"] = "ended"
-                game["end_time"] = time.time() 
-                await manager.broadcast_status(game_code)
-
-            if msg_type == "KICK_PLAYER" and game["admin_socket"] == websocket:
-                p_id = payload.get("playerId")
-                for t_id, team in list(game["teams"].items()):
-                    if p_id in team.members:
-                        victim = team.members[p_id]
-                        for sock in victim.sockets:
-                            try:
-                                await sock.send_json({"type": "KICKED"})
-                                await sock.close()
-                            except: pass
-                        victim.sockets = []
-                        team.remove_member(p_id)
-                        if not team.members: del game["teams"][t_id]
-                        break
-                await manager.broadcast_status(game_code)
-
-            if msg_type == "KICK_TEAM" and game["admin_socket"] == websocket:
-                t_id = payload.get("teamId")
-                if t_id in game["teams"]:
-                    team = game["teams"][t_id]
-                    for member in team.members.values():
-                        for sock in member.sockets:
-                            try:
-                                await sock.send_json({"type": "KICKED"})
-                                await sock.close()
-                            except: pass
-                        member.sockets = []
-                    del game["teams"][t_id]
-                await manager.broadcast_status(game_code)
-
-            # --- HINTS ---
-            if msg_type == "BUY_HINT":
-                if game["status"] != "active": continue
-                
-                p_id = game["socket_map"].get(websocket)
-                if not p_id: continue
-
-                player_team = None
-                for team in game["teams"].values():
-                    if p_id in team.members:
-                        player_team = team
-                        break
-                
-                if not player_team: continue
+            # Cheap rejection for scripted spam, before any game state is touched
+            if msg_type in ("SUBMIT_FLAG", "BUY_HINT") and not manager.allow_attempt(game_code, websocket):
+                THROTTLED.inc(label)
+                continue
 
-                # Extract from nested payload if present
-                data_payload = payload.get("payload", payload)
-                chal_id = data_payload.get("challengeId")
-                hint_id = data_payload.get("hintId")
-                
-                challenge_cfg = next((c for c in game["config"].challenges if c.id == chal_id), None)
-                if not challenge_cfg: continue
-                
-                # Find hint and its index
-                hint = None
-                hint_index = -1
-                for i, h in enumerate(challenge_cfg.hints):
-                    if h.id == hint_id:
-                        hint = h
-                        hint_index = i
-                        break
-                
-                if not hint: continue
-
-                # Initialize if needed
-                if chal_id not in player_team.unlocked_hints:
-                    player_team.unlocked_hints[chal_id] = []
-
-                # Check if previous hint is unlocked
-                if hint_index > 0:
-                    prev_hint = challenge_cfg.hints[hint_index - 1]
-                    if prev_hint.id not in player_team.unlocked_hints[chal_id]:
-                        await websocket.send_json({"type": "TOAST", "msg": "You must unlock previous hints first!", "color": "error"})
-                        continue
-
-                if hint_id not in player_team.unlocked_hints[chal_id]:
-                    player_team.unlocked_hints[chal_id].append(hint_id)
-                    # Broadcast update so they get the content
-                    await manager.broadcast_status(game_code)
-                    await websocket.send_json({"type": "TOAST", "msg": f"Hint unlocked! -{hint.cost} potential points", "color": "warning"})
-
-            # --- FLAGS ---
-            if msg_type == "SUBMIT_FLAG":
-                if game["status"] != "active": continue
-                
-                p_id = game["socket_map"].get(websocket)
-                if not p_id: continue
-
-                player_team = None
-                current_player = None
-                for team in game["teams"].values():
-                    if p_id in team.members:
-                        player_team = team
-                        current_player = team.members[p_id]
-                        break
-                
-                if not player_team: continue
-
-                # Extract from nested payload if present
-                data_payload = payload.get("payload", payload)
-                chal_id = data_payload.get("challengeId")
-                flag_guess = data_payload.get("flag")
-                challenge_cfg = next((c for c in game["config"].challenges if c.id == chal_id), None)
-
-                if challenge_cfg:
-                    if chal_id in player_team.solves: # Check team solves
-                        await websocket.send_json({"type": "TOAST", "msg": "You already solved this!", "color": "info"})
-                    elif flag_guess == challenge_cfg.flag:
-                        solves_count = game["challenge_stats"][chal_id]
-                        base_points = manager.calculate_points(challenge_cfg, solves_count)
-                        
-                        # Calculate penalties
-                        penalties = 0
-                        if chal_id in player_team.unlocked_hints:
-                            for h in challenge_cfg.hints:
-                                if h.id in player_team.unlocked_hints[chal_id]:
-                                    penalties += h.cost
-                        
-                        points = max(base_points - penalties, 0)
-                        
-                        # Update Stats
-                        current_player.score += points
-                        player_team.solves.append(chal_id)
-                        current_player.solves.append(chal_id)
-                        game["challenge_stats"][chal_id] += 1
-                        
-                        # Log detailed history
-                        time_taken = time.time() - game["start_time"]
-                        log_entry = {
-                            "team_name": player_team.name,
-                            "time_str": manager.format_time(time_taken)
-                        }
-                        game["detailed_solves"][chal_id].append(log_entry)
-                        
-                        for member in player_team.members.values():
-                            for sock in member.sockets:
-                                try:
-                                    await sock.send_json({"type": "TOAST", "msg": f"{current_player.name} solved {challenge_cfg.title}! +{points}", "color": "success"})
-                                    if member.id == current_player.id:
-                                        await sock.send_json({"type": "SOLVE_CONFIRMED", "id": chal_id})
-                                except: pass
-
-                        if solves_count == 0:
-                             for ws in game["socket_map"]:
-                                 try: await ws.send_json({"type": "TOAST", "msg": f"FIRST BLOOD: {player_team.name} solved {challenge_cfg.title}!", "color": "error"})
-                                 except: pass
-
-                        await manager.broadcast_status(game_code)
-                    else:
-                        await websocket.send_json({"type": "TOAST", "msg": "Incorrect Flag", "color": "error"})
-
-            if msg_type == "LEAVE_GAME":
-                p_id = game["socket_map"].get(websocket)
-                if p_id:
-                    # If game ended, treat leave as disconnect (preserve state)
-                    if game["status"] == "ended":
-                        for team in game["teams"].values():
-                            if p_id in team.members:
-                                player = team.members[p_id]
-                                if websocket in player.sockets:
-                                    player.sockets.remove(websocket)
-                                player.is_connected = len(player.sockets) > 0
-                                break
-                        if websocket in game["socket_map"]:
-                            del game["socket_map"][websocket]
-                        await websocket.close()
-                        await manager.broadcast_status(game_code)
-                        break
-
-                    for t_id, team in list(game["teams"].items()):
-                        if p_id in team.members:
-                            # Notify other sockets of this player that they left
-                            player = team.members[p_id]
-                            for sock in player.sockets:
-                                if sock != websocket:
-                                    try:
-                                        await sock.send_json({"type": "KICKED"}) # Reuse KICKED to force reload/home
-                                        await sock.close()
-                                    except: pass
-                            player.sockets = []
-                            
-                            team.remove_member(p_id)
-                            if not team.members: del game["teams"][t_id]
-                            break
-                    del game["socket_map"][websocket]
-                await websocket.close()
-                await manager.broadcast_status(game_code)
+            # Run by the game's actor, after any command already queued for it
+            handler = manager.commands.get(msg_type)
+            if handler and await manager.submit(game_code, handler, websocket, payload, label):
                 break
 
+        # Only LEAVE_GAME leaves the loop; let the queue flush before detaching
+        await outbox.wait_closed()
+
     except WebSocketDisconnect:
-        p_id = game.get("socket_map", {}).get(websocket)
-        if p_id:
-            for team in game["teams"].values():
-                if p_id in team.members:
-                    player = team.members[p_id]
-                    if websocket in player.sockets:
-                        player.sockets.remove(websocket)
-                    player.is_connected = len(player.sockets) > 0
-                    break
-            if websocket in game["socket_map"]:
-                del game["socket_map"][websocket]
-        
-        if game["admin_socket"] == websocket:
-            game["admin_socket"] = None
-            
-        await manager.broadcast_status(game_code)
\ No newline at end of file
+        pass
+    except Exception:
+        logger.exception("Websocket for game %s failed", game_code)
+    finally:
+        # However the connection ended, the game forgets the socket before its outbox goes
+        try: await manager.submit(game_code, manager.on_disconnect, websocket, {}, "disconnect")
+        finally: manager.detach(websocket, game)
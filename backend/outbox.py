@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from metrics import REGISTRY
+
+_CLOSE = object() # Sentinel queued by close() so pending messages flush first
+
+# Message kinds, so a fresh snapshot can supersede queued game state
+DIRECT = 0
+SNAPSHOT = 1
+PATCH = 2
+
+SEND_FAILURES = REGISTRY.counter("dashflag_ws_send_failures_total", "Websocket sends that raised or timed out")
+DISCONNECTS = REGISTRY.counter("dashflag_ws_slow_consumer_disconnects_total", "Sockets dropped for falling behind", ("reason",))
+
+# --- OUTBOX ---
+class Outbox:
+    """
+    Bounded outbound queue with its own writer task for a single websocket.
+
+    Handlers never await the network: they enqueue and move on. Everything is
+    delivered in order, except that a new LOBBY_UPDATE snapshot drops any
+    snapshot or LOBBY_PATCH still waiting in front of it, so a slow phone skips
+    stale state instead of building a backlog. If patches alone overflow the
+    queue they are dropped too; the client notices the version gap and asks
+    for a resync. A consumer that falls more than `max_lag` seconds behind, or
+    overflows `max_size` with direct messages, is disconnected. Either way, and
+    when a send fails, `on_dead(reason)` is called so the owner can forget the
+    socket at once instead of waiting for its reader to notice.
+    """
+
+    def __init__(self, websocket, codec, max_size: int = 64, max_lag: float = 10.0, on_dead: Optional[Callable[[str], None]] = None):
+        self.websocket = websocket
+        self.codec = codec # What this client asked to receive
+        self.max_size = max_size
+        self.max_lag = max_lag
+        self.on_dead = on_dead
+        self.last_heard = time.monotonic() # Last message from the client, for heartbeats
+        self.queue: deque = deque() # (queued_at, kind, frame)
+        self.closing = False
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def send(self, frame):
+        self._enqueue(DIRECT, frame)
+
+    def send_patch(self, frame):
+        self._enqueue(PATCH, frame)
+
+    def send_update(self, frame):
+        if self.closing or self.closed: return
+        # Everything this snapshot describes no longer needs to go out
+        self._drop_state()
+        self._enqueue(SNAPSHOT, frame)
+
+    def close(self):
+        # Flush what is already queued, then close the socket
+        if self.closing or self.closed: return
+        self.closing = True
+        self.queue.append((time.monotonic(), DIRECT, _CLOSE))
+        self._wakeup.set()
+
+    async def wait_closed(self):
+        try: await asyncio.wait_for(asyncio.shield(self._task), self.max_lag)
+        except Exception: self.abort()
+
+    def abort(self):
+        # Slow or broken consumer: stop writing and drop the connection
+        if self.closed: return
+        self.closed = True
+        self.queue.clear()
+        self._wakeup.set()
+        self._task.cancel()
+        asyncio.create_task(self._close_socket())
+
+    def cancel(self):
+        # Also wake the writer, in case wait_for swallowed the cancellation
+        self.closed = True
+        self._wakeup.set()
+        self._task.cancel()
+
+    def _enqueue(self, kind: int, frame):
+        if self.closing or self.closed: return
+        if self.queue and time.monotonic() - self.queue[0][0] > self.max_lag:
+            DISCONNECTS.inc("lag")
+            self.abort()
+            self._dead("lag")
+            return
+        if len(self.queue) >= self.max_size:
+            self._drop_state()
+            if len(self.queue) >= self.max_size:
+                DISCONNECTS.inc("overflow")
+                self.abort()
+                self._dead("overflow")
+                return
+        self.queue.append((time.monotonic(), kind, frame))
+        self._wakeup.set()
+
+    def _dead(self, reason: str):
+        if self.on_dead: self.on_dead(reason)
+
+    def _drop_state(self):
+        if any(kind != DIRECT for _, kind, _ in self.queue):
+            self.queue = deque(entry for entry in self.queue if entry[1] == DIRECT)
+
+    async def _close_socket(self):
+        try: await asyncio.wait_for(self.websocket.close(), self.max_lag)
+        except Exception: pass
+
+    async def _run(self):
+        try:
+            while not self.closed:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.queue and not self.closed:
+                    _, _, frame = self.queue.popleft()
+                    if frame is _CLOSE:
+                        self.closed = True
+                        await self._close_socket()
+                        return
+                    send = self.websocket.send_bytes if isinstance(frame, bytes) else self.websocket.send_text
+                    await asyncio.wait_for(send(frame), self.max_lag)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or timed out
+            SEND_FAILURES.inc()
+            self.closed = True
+            self.queue.clear()
+            self._dead("send_failed")
+            await self._close_socket()
@@ -0,0 +1,53 @@
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+# --- TOKEN BUCKET ---
+class TokenBucket:
+    """Allows `rate` actions per second on average, in bursts of up to `burst`."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def allow(self) -> bool:
+        self.refill()
+        if self.tokens < 1: return False
+        self.tokens -= 1
+        return True
+
+    def reserve(self) -> float:
+        # Take a token even if none is left; returns the seconds until it is earned
+        self.refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+class RateLimiter:
+    """One token bucket per key (a player or team id), created on first use."""
+
+    def __init__(self, limit: Optional[Tuple[float, float]]):
+        self.limit = limit # (rate, burst), or None for unlimited
+        self.buckets: Dict[Hashable, TokenBucket] = {}
+
+    def allow(self, key: Hashable) -> bool:
+        if self.limit is None: return True
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(*self.limit)
+        return bucket.allow()
+
+    def forget(self, key: Hashable):
+        self.buckets.pop(key, None)
+
+def parse_limit(value: str) -> Optional[Tuple[float, float]]:
+    # "rate,burst" in attempts per second, e.g. "2,10"; empty disables the limit
+    if not value: return None
+    rate, burst = value.split(",")
+    return float(rate), float(burst)
@@ -0,0 +1,106 @@
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+
+from challenges import Challenge
+
+# --- SCORING MODELS ---
+class ScoringModel(ABC):
+    """
+    What a challenge is worth once it has `solves` solves (the newest one
+    included, so the first solver is valued at 1). Retroactive models apply
+    the current value to everyone who solved it; the others fix each solve's
+    value when it happens.
+    """
+    retroactive = True
+
+    @abstractmethod
+    def value(self, challenge: Challenge, solves: int) -> int:
+        pass
+
+class LinearScoring(ScoringModel):
+    # `decay` points less per solve after the first, for everyone
+    def value(self, challenge: Challenge, solves: int) -> int:
+        return max(challenge.points - challenge.decay * (solves - 1), challenge.min_points)
+
+class StaticScoring(LinearScoring):
+    # Linear, but each solver keeps what the challenge was worth when they solved it
+    retroactive = False
+
+class LogScoring(ScoringModel):
+    # `decay` points less each time the number of solves doubles
+    def value(self, challenge: Challenge, solves: int) -> int:
+        return max(round(challenge.points - challenge.decay * math.log2(max(solves, 1))), challenge.min_points)
+
+class CtfdScoring(ScoringModel):
+    # CTFd's dynamic value: a parabola from `points` down to `min_points` at `decay` solves
+    def value(self, challenge: Challenge, solves: int) -> int:
+        if challenge.decay <= 0: return challenge.points
+        drop = (challenge.points - challenge.min_points) / challenge.decay ** 2 * max(solves - 1, 0) ** 2
+        return max(math.ceil(challenge.points - drop), challenge.min_points)
+
+SCORING_MODELS: Dict[str, ScoringModel] = {
+    "static": StaticScoring(),
+    "linear": LinearScoring(),
+    "log": LogScoring(),
+    "ctfd": CtfdScoring(),
+}
+
+# --- SCORING ENGINE ---
+class Award:
+    """One solve's share of a challenge: who holds it and how many points it is worth now."""
+    __slots__ = ("team_id", "player_id", "penalty", "points")
+
+    def __init__(self, team_id: str, player_id: str, penalty: int, points: int):
+        self.team_id = team_id
+        self.player_id = player_id
+        self.penalty = penalty # Cost of the team's hints for the challenge when it solved it
+        self.points = points
+
+class ScoringEngine:
+    """
+    The awards made from every challenge in a game. Solve counts are the
+    game's own (`challenge_stats`), passed in.
+
+    A solve adds an award and, with a retroactive model, moves every earlier
+    award of that challenge to the new value less its own hint penalty. Only
+    those awards change, and `solve` returns them with their deltas, so the
+    caller adjusts just the affected players and teams rather than rescoring
+    the whole game.
+    """
+
+    def __init__(self, model: ScoringModel, challenges: Dict[str, Challenge]):
+        self.model = model
+        self.challenges = challenges # By id; shared with the game's ChallengeSet
+        self.awards: Dict[str, List[Award]] = {c_id: [] for c_id in challenges}
+
+    def value(self, challenge_id: str, solves: int) -> int:
+        # What solving it now is worth, before hint penalties, given the solves so far
+        return self.model.value(self.challenges[challenge_id], solves + 1)
+
+    def points(self, challenge_id: str, solves: int, penalty: int) -> int:
+        return max(self.value(challenge_id, solves) - penalty, 0)
+
+    def solve(self, challenge_id: str, solves: int, team_id: str, player_id: str, points: int, penalty: int) -> List[Tuple[Award, int]]:
+        # `solves` includes this one; `points` is what the solver was awarded, from points() just before
+        awards = self.awards[challenge_id]
+        awards.append(Award(team_id, player_id, penalty, points))
+        if not self.model.retroactive: return []
+
+        current = self.model.value(self.challenges[challenge_id], solves)
+        changes = []
+        for award in awards[:-1]:
+            new = max(current - award.penalty, 0)
+            if new != award.points:
+                changes.append((award, new - award.points))
+                award.points = new
+        return changes
+
+    def export(self) -> Dict[str, List[list]]:
+        # Every award at its current value, for a snapshot
+        return {c_id: [[a.team_id, a.player_id, a.penalty, a.points] for a in awards] for c_id, awards in self.awards.items() if awards}
+
+    def restore(self, awards: Dict[str, List[list]]):
+        # From export(): the values are already current, so nothing is rescored
+        for c_id, held in awards.items():
+            if c_id in self.awards: self.awards[c_id] = [Award(*a) for a in held]
@@ -0,0 +1,59 @@
+from typing import Dict, List
+
+# --- SOLVE LOG ---
+class SolveLog:
+    """
+    Every solve of a game, in order, with raw timestamps and the hint penalty
+    it was scored with.
+
+    Entries are only ever appended and `seq` is an entry's position, so a
+    client's cursor is simply how many entries it holds: it asks for the
+    rest with `since(cursor)` and extends its copy from `solve_log` patch
+    ops. `series` is each team's score after every change, [[at, score], ...]:
+    its own solves, and earlier solves losing value under retroactive
+    scoring. It is appended as they happen, so charts never rescan the log.
+    """
+
+    def __init__(self):
+        self.entries: List[dict] = []
+        self.series: Dict[str, List[list]] = {} # team_id -> [[at, score], ...]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, at: float, team_id: str, team_name: str, player_id: str, player_name: str,
+               challenge_id: str, points: int, penalty: int, score: int) -> dict:
+        entry = {
+            "seq": len(self.entries),
+            "at": at,
+            "teamId": team_id,
+            "team": team_name,
+            "playerId": player_id,
+            "player": player_name,
+            "challengeId": challenge_id,
+            "points": points, # Awarded at the time; retroactive scoring moves it later
+            "penalty": penalty,
+            "score": score # Team score after this solve
+        }
+        self.add(entry)
+        return entry
+
+    def add(self, entry: dict):
+        self.entries.append(entry)
+        self.series.setdefault(entry["teamId"], []).append([entry["at"], entry["score"]])
+
+    def restore(self, entries: List[dict], series: Dict[str, List[list]]):
+        # A snapshot's entries and series, rescores included
+        self.entries = entries
+        self.series = series
+
+    def rescore(self, at: float, team_id: str, delta: int):
+        points = self.series.setdefault(team_id, [])
+        points.append([at, (points[-1][1] if points else 0) + delta])
+
+    def since(self, cursor: int, limit: int) -> List[dict]:
+        return self.entries[max(cursor, 0):max(cursor, 0) + limit]
+
+    def timeline(self, team_ids) -> Dict[str, List[list]]:
+        # Teams that never solved anything have no points yet
+        return {t_id: self.series[t_id] for t_id in team_ids if t_id in self.series}
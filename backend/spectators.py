@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+from typing import AsyncIterator, Optional
+
+from codec import JsonCodec
+
+KEEPALIVE_SECONDS = 15
+JSON = JsonCodec("json")
+
+# --- SCOREBOARD FEED ---
+class ScoreboardFeed:
+    """
+    The public scoreboard of one game, encoded once per state version and
+    shared by every spectator.
+
+    `body` and `etag` answer plain and conditional GETs; `event` is the same
+    body framed as a server-sent event. Streams have no queue of their own:
+    they all wait on one future that is resolved whenever a new version is
+    published, then send whatever is latest, so a slow viewer skips versions
+    instead of building a backlog.
+    """
+
+    def __init__(self):
+        self.version = -1
+        self.body = b""
+        self.etag = ""
+        self.event = b""
+        self.viewers = 0 # Open SSE streams
+        self.changed: Optional[asyncio.Future] = None
+        self.handle: Optional[asyncio.TimerHandle] = None # Scheduled publish, if any
+        self.last_publish = 0.0
+
+    def update(self, version: int, scoreboard: dict):
+        self.version = version
+        self.body = JSON.encode(scoreboard)
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+        self.event = b"id: %d\nevent: scoreboard\ndata: %b\n\n" % (version, self.body)
+        if self.changed and not self.changed.done(): self.changed.set_result(None)
+        self.changed = None
+
+    async def stream(self, last_version: Optional[int] = None) -> AsyncIterator[bytes]:
+        self.viewers += 1
+        try:
+            yield b"retry: 3000\n\n"
+            sent = last_version # A reconnecting client already has this one
+            while True:
+                if self.version != sent:
+                    sent = self.version
+                    yield self.event
+                if self.changed is None: self.changed = asyncio.get_running_loop().create_future()
+                try:
+                    await asyncio.wait_for(asyncio.shield(self.changed), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n" # Keeps proxies from closing an idle stream
+        finally:
+            self.viewers -= 1
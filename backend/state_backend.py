@@ -0,0 +1,258 @@
+import asyncio
+import contextlib
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+from event_log import EventLog
+
+# --- ABSTRACT BASE CLASS ---
+class StateBackend(ABC):
+    """
+    Where game state lives beyond a single worker process.
+
+    GameManager expresses every change to shared game state as a small JSON
+    event and applies it in GameManager.apply_event. A backend stores each
+    game's metadata and event stream, serializes changes to a game across
+    workers (lock), and hands every committed event, local or remote, to
+    `on_event` so each worker keeps its replica current and broadcasts to the
+    sockets it holds.
+    """
+
+    def __init__(self):
+        self.on_event: Optional[Callable[[str, dict], None]] = None
+        self.on_snapshot: Optional[Callable[[str], dict]] = None # Full game state, for backends that snapshot
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stored_games(self) -> List[str]:
+        """Codes of games that outlived the previous process, to recover on startup."""
+        return []
+
+    @abstractmethod
+    async def create_game(self, code: str, meta: dict) -> bool:
+        """Store a new game. Returns False if the code is already taken."""
+
+    @abstractmethod
+    async def load_game(self, code: str) -> Optional[Tuple[dict, Optional[dict], List[dict]]]:
+        """Metadata, snapshot state (or None) and the events after it, for a
+        game this worker does not hold yet."""
+
+    async def sync(self, code: str):
+        """Deliver anything committed elsewhere since load_game returned."""
+
+    async def drop_game(self, code: str):
+        """Forget a game this worker has evicted (call while holding the lock).
+        Anything stored only for this worker goes with it."""
+
+    @abstractmethod
+    def lock(self, code: str):
+        """Async context manager serializing changes to one game. Once held,
+        every event committed before it has been delivered to on_event."""
+
+    @abstractmethod
+    async def commit(self, code: str, event: dict, durable: bool = True):
+        """Record an event (call while holding the lock) and deliver it
+        everywhere. Non-durable events (presence) skip the event stream."""
+
+# --- IN-MEMORY ---
+class InMemoryBackend(StateBackend):
+    """
+    Single-process backend: the local replica is the only copy. With an
+    EventLog, every durable event is also appended to disk so games survive
+    a restart.
+    """
+
+    def __init__(self, log: Optional[EventLog] = None):
+        super().__init__()
+        self.log = log
+        self.codes = set(log.codes()) if log else set()
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    async def start(self):
+        if self.log: self.log.start()
+
+    async def stop(self):
+        if self.log: await self.log.stop()
+
+    def stored_games(self) -> List[str]:
+        return sorted(self.codes)
+
+    async def create_game(self, code: str, meta: dict) -> bool:
+        if code in self.codes: return False
+        self.codes.add(code)
+        if self.log: await self.log.create(code, meta)
+        return True
+
+    async def load_game(self, code: str):
+        # Only games from a previous run are ever missing locally
+        if not self.log or code not in self.codes: return None
+        return self.log.load(code)
+
+    async def drop_game(self, code: str):
+        # Evicted games are not recovered on the next start either
+        self.codes.discard(code)
+        self.locks.pop(code, None)
+        if self.log: self.log.drop(code)
+
+    def lock(self, code: str):
+        if code not in self.locks: self.locks[code] = asyncio.Lock()
+        return self.locks[code]
+
+    async def commit(self, code: str, event: dict, durable: bool = True):
+        self.on_event(code, event)
+        if durable and self.log and self.log.append(code, event):
+            self.log.snapshot(code, self.on_snapshot(code))
+
+# --- REDIS ---
+class RedisBackend(StateBackend):
+    """
+    Shared backend for running several workers against one Redis.
+
+    Per game: `meta` holds config and admin token, `events` is the ordered
+    event list (an event's seq is its 1-based index), `presence` counts open
+    sockets per player, and a pub/sub channel fans committed events out to
+    every worker. Workers that miss a message notice the seq gap and read the
+    missing tail from `events`.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None, prefix: str = "dashflag", lock_timeout: float = 5.0):
+        super().__init__()
+        if client is None:
+            import redis.asyncio as redis # Optional dependency, only needed for multi-worker
+            client = redis.from_url(url)
+        self.redis = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.worker_id = uuid.uuid4().hex
+        self.seq: Dict[str, int] = {} # game code -> last event seq applied here
+        self.local_locks: Dict[str, asyncio.Lock] = {}
+        self.pubsub = self.redis.pubsub()
+        self.listener: Optional[asyncio.Task] = None
+
+    def key(self, code: str, part: str) -> str:
+        return f"{self.prefix}:game:{code}:{part}"
+
+    def channel(self, code: str) -> str:
+        return f"{self.prefix}:game:{code}"
+
+    async def stop(self):
+        if self.listener: self.listener.cancel()
+        await self.pubsub.aclose()
+
+    async def subscribe(self, code: str):
+        await self.pubsub.subscribe(self.channel(code))
+        if self.listener is None:
+            self.listener = asyncio.create_task(self.listen())
+
+    async def create_game(self, code: str, meta: dict) -> bool:
+        if not await self.redis.set(self.key(code, "meta"), json.dumps(meta), nx=True):
+            return False
+        self.seq[code] = 0
+        await self.subscribe(code)
+        return True
+
+    async def load_game(self, code: str):
+        raw_meta = await self.redis.get(self.key(code, "meta"))
+        if raw_meta is None: return None
+        # Subscribe before reading so nothing committed meanwhile is lost
+        await self.subscribe(code)
+        raw_events = await self.redis.lrange(self.key(code, "events"), 0, -1)
+        presence = await self.redis.hgetall(self.key(code, "presence"))
+        self.seq[code] = len(raw_events)
+
+        events = [json.loads(e) for e in raw_events]
+        for player_id, count in presence.items():
+            if int(count) > 0:
+                events.append({"type": "presence", "player_id": _str(player_id), "delta": int(count)})
+        return json.loads(raw_meta), None, events
+
+    @contextlib.asynccontextmanager
+    async def lock(self, code: str):
+        if code not in self.local_locks: self.local_locks[code] = asyncio.Lock()
+        # Queue locally first so one worker doesn't spin many waiters on Redis
+        async with self.local_locks[code]:
+            async with self.redis.lock(self.key(code, "lock"), timeout=self.lock_timeout, sleep=0.005):
+                await self.catch_up(code)
+                yield
+
+    async def commit(self, code: str, event: dict, durable: bool = True):
+        if durable:
+            seq = self.seq[code] + 1 # We hold the lock, so nobody else appends
+            message = json.dumps({"origin": self.worker_id, "seq": seq, "event": event})
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.rpush(self.key(code, "events"), json.dumps(event))
+                pipe.publish(self.channel(code), message)
+                await pipe.execute()
+            self.seq[code] = seq
+        else:
+            message = json.dumps({"origin": self.worker_id, "event": event})
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hincrby(self.key(code, "presence"), event["player_id"], event["delta"])
+                pipe.publish(self.channel(code), message)
+                await pipe.execute()
+        self.on_event(code, event)
+
+    async def sync(self, code: str):
+        await self.catch_up(code)
+
+    async def drop_game(self, code: str):
+        # The keys stay: other workers may still be serving this game
+        await self.pubsub.unsubscribe(self.channel(code))
+        self.seq.pop(code, None)
+        self.local_locks.pop(code, None)
+
+    async def catch_up(self, code: str):
+        start = self.seq.get(code, 0)
+        raw_events = await self.redis.lrange(self.key(code, "events"), start, -1)
+        for offset, raw in enumerate(raw_events):
+            seq = start + offset + 1
+            if seq <= self.seq[code]: continue # Delivered while we were reading
+            self.seq[code] = seq
+            self.on_event(code, json.loads(raw))
+
+    async def listen(self):
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    if message["type"] != "message": continue
+                    code = _str(message["channel"]).rsplit(":", 1)[1]
+                    data = json.loads(message["data"])
+                    if data["origin"] == self.worker_id or code not in self.seq: continue
+
+                    if "seq" not in data:
+                        self.on_event(code, data["event"])
+                    elif data["seq"] == self.seq[code] + 1:
+                        self.seq[code] = data["seq"]
+                        self.on_event(code, data["event"])
+                    elif data["seq"] > self.seq[code]:
+                        await self.catch_up(code) # Missed something
+                if not self.pubsub.subscribed:
+                    # Every game was dropped; the next subscribe() starts a new listener
+                    self.listener = None
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(1) # Connection hiccup; resubscribe via listen()
+
+def _str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+def backend_from_env() -> StateBackend:
+    url = os.getenv("REDIS_URL")
+    if url: return RedisBackend(url)
+    log_dir = os.getenv("EVENT_LOG_DIR")
+    if log_dir:
+        return InMemoryBackend(EventLog(
+            log_dir,
+            sync_interval=int(os.getenv("EVENT_LOG_SYNC_MS", "50")) / 1000,
+            snapshot_every=int(os.getenv("EVENT_LOG_SNAPSHOT_EVERY", "500"))
+        ))
+    return InMemoryBackend()
@@ -18,36 +18,90 @@ interface Challenge {
     decay: number
     desc: string
     flag: string
+    flag_type?: string
+    flags?: string[]
     files: string[]
     hints: Hint[]
     is_premade: boolean
 }
 
+// A pre-made challenge as listed by /api/premade-challenges (backend/catalog.py)
+interface CatalogItem {
+    id: string
+    title: string
+    category: string
+    points: number
+    tags: string[]
+    pack: string
+    summary: string
+}
+
+interface CatalogPage {
+    total: number
+    items: CatalogItem[]
+    facets: { categories: Record<string, number>, tags: Record<string, number> }
+}
+
+const LIBRARY_PAGE = 48
+
+// How "Flag" is read depends on its type (backend/flags.py)
+const FLAG_TYPES: Record<string, string> = {
+    exact: "Exact",
+    case_insensitive: "Case-insensitive",
+    regex: "Regex (whole guess)",
+    dynamic: "Per team (prefix{secret})",
+}
+
+// How "Decay" is read depends on the scoring mode (backend/scoring.py)
+const SCORING_MODES: Record<string, string> = {
+    linear: "Linear",
+    log: "Logarithmic",
+    ctfd: "CTFd dynamic",
+    static: "Fixed at solve time",
+}
+
+const SCORING_HELP: Record<string, string> = {
+    linear: "Every solver holds the current value: Decay points less per solve, down to Min.",
+    log: "Every solver holds the current value: Decay points less each time the solve count doubles.",
+    ctfd: "Every solver holds the current value, which curves down to Min after Decay solves.",
+    static: "Each solver keeps what the challenge was worth when they solved it (Decay less per earlier solve).",
+}
+
 export default function CreateGame() {
   const navigate = useNavigate()
   const [maxTeamSize, setMaxTeamSize] = useState(0) // 0 = unlimited
   const [teamsEnabled, setTeamsEnabled] = useState(true) 
+  const [scoring, setScoring] = useState("linear")
   const [selectedChallenges, setSelectedChallenges] = useState<Challenge[]>([])
-  const [premadeChallenges, setPremadeChallenges] = useState<Challenge[]>([])
+  const [library, setLibrary] = useState<CatalogPage>({ total: 0, items: [], facets: { categories: {}, tags: {} } })
+  const [libraryCategory, setLibraryCategory] = useState("")
+  const [libraryTag, setLibraryTag] = useState("")
+  const [librarySearch, setLibrarySearch] = useState("")
+  const [libraryOffset, setLibraryOffset] = useState(0)
   const [loading, setLoading] = useState(false)
   
   useEffect(() => {
+      // One page at a time, filtered by the server
       const fetchPremade = async () => {
           try {
               const apiUrl = import.meta.env.VITE_API_URL || ''
-              const res = await fetch(`${apiUrl}/api/premade-challenges`, {
+              const params = new URLSearchParams({ offset: String(libraryOffset), limit: String(LIBRARY_PAGE) })
+              if (libraryCategory) params.set("category", libraryCategory)
+              if (libraryTag) params.set("tag", libraryTag)
+              if (librarySearch) params.set("q", librarySearch)
+              const res = await fetch(`${apiUrl}/api/premade-challenges?${params}`, {
                   headers: { "ngrok-skip-browser-warning": "true" }
               })
               if (res.ok) {
-                  const data = await res.json()
-                  setPremadeChallenges(data)
+                  setLibrary(await res.json())
               }
           } catch (e) {
               console.error("Failed to fetch premade challenges", e)
           }
       }
-      fetchPremade()
-  }, [])
+      const timer = setTimeout(fetchPremade, librarySearch ? 250 : 0) // Wait for typing to pause
+      return () => clearTimeout(timer)
+  }, [libraryCategory, libraryTag, librarySearch, libraryOffset])
   
   // Editing State
   const [editingChallenge, setEditingChallenge] = useState<Challenge | null>(null)
@@ -68,6 +122,8 @@ export default function CreateGame() {
           decay: 0,
           desc: "Description here...",
           flag: "format{flag}",
+          flag_type: "exact",
+          flags: [],
           files: [],
           hints: [],
           is_premade: false
@@ -78,21 +134,24 @@ export default function CreateGame() {
 
   const saveChallenge = () => {
       if (!editingChallenge) return
+      // Blank lines are kept while typing; drop them now
+      const challenge = {...editingChallenge, flags: (editingChallenge.flags || []).map(f => f.trim()).filter(Boolean)}
 
-      if (!editingChallenge.is_premade) {
+      const flagType = challenge.flag_type || "exact"
+      if (!challenge.is_premade && (flagType === "exact" || flagType === "case_insensitive")) {
           const flagRegex = /^[a-zA-Z0-9_-]+{[a-zA-Z0-9_-]+}$/
-          if (!flagRegex.test(editingChallenge.flag)) {
+          if (![challenge.flag, ...challenge.flags].every(f => flagRegex.test(f))) {
               alert("Invalid Flag Format!\nMust be: prefix{content}\n- Prefix: Alphanumeric, _, -\n- Content: Alphanumeric, _, -\n- Both must be non-empty.")
               return
           }
       }
       
       setSelectedChallenges(prev => {
-          const exists = prev.find(c => c.id === editingChallenge.id)
+          const exists = prev.find(c => c.id === challenge.id)
           if (exists) {
-              return prev.map(c => c.id === editingChallenge.id ? editingChallenge : c)
+              return prev.map(c => c.id === challenge.id ? challenge : c)
           } else {
-              return [...prev, editingChallenge]
+              return [...prev, challenge]
           }
       })
       setIsEditModalOpen(false)
@@ -103,12 +162,24 @@ export default function CreateGame() {
       setSelectedChallenges(prev => prev.filter(c => c.id !== id))
   }
 
-  const togglePremade = (premade: Challenge) => {
+  const togglePremade = async (premade: CatalogItem) => {
       const exists = selectedChallenges.find(c => c.id === premade.id)
       if (exists) {
           deleteChallenge(premade.id)
-      } else {
-          setSelectedChallenges(prev => [...prev, premade])
+          return
+      }
+      // The listing is a summary; fetch the whole challenge (its flag stays on the server)
+      try {
+          const apiUrl = import.meta.env.VITE_API_URL || ''
+          const res = await fetch(`${apiUrl}/api/premade-challenges/${encodeURIComponent(premade.id)}`, {
+              headers: { "ngrok-skip-browser-warning": "true" }
+          })
+          if (res.ok) {
+              const challenge: Challenge = { ...(await res.json()), flag: "" }
+              setSelectedChallenges(prev => prev.some(c => c.id === challenge.id) ? prev : [...prev, challenge])
+          }
+      } catch (e) {
+          console.error("Failed to fetch challenge", e)
       }
   }
 
@@ -149,7 +220,8 @@ export default function CreateGame() {
               max_players: 0,
               teams_enabled: teamsEnabled,
               challenges: selectedChallenges,
-              duration_seconds: totalSeconds > 0 ? totalSeconds : 1800
+              duration_seconds: totalSeconds > 0 ? totalSeconds : 1800,
+              scoring
           }
           
           // Use relative path so it goes through Vite proxy (works for localhost and ngrok)
@@ -227,6 +299,14 @@ export default function CreateGame() {
                     </div>
                 </div>
 
+                <div className="form-control w-full max-w-xs mt-4">
+                    <label className="label"><span className="label-text font-bold">Scoring</span></label>
+                    <select className="select select-bordered w-full" value={scoring} onChange={e => setScoring(e.target.value)}>
+                        {Object.entries(SCORING_MODES).map(([value, label]) => <option key={value} value={value}>{label}</option>)}
+                    </select>
+                    <span className="label-text-alt px-1 pt-1 opacity-70">{SCORING_HELP[scoring]}</span>
+                </div>
+
                 {teamsEnabled && (
                     <div className="form-control w-full max-w-xs mt-4">
                         <label className="label"><span className="label-text">Max Team Size (0 = Unlimited)</span></label>
@@ -274,9 +354,25 @@ export default function CreateGame() {
         {/* PRE-MADE LIBRARY */}
         <div className="card bg-base-100 shadow-xl mb-8 opacity-90">
             <div className="card-body">
-                <h2 className="card-title mb-4">Pre-made Library</h2>
+                <h2 className="card-title mb-4">Pre-made Library ({library.total})</h2>
+                <div className="flex flex-wrap gap-2 mb-4">
+                    <input className="input input-bordered input-sm" placeholder="Search titles..." value={librarySearch}
+                        onChange={e => { setLibrarySearch(e.target.value); setLibraryOffset(0) }} />
+                    <select className="select select-bordered select-sm" value={libraryCategory}
+                        onChange={e => { setLibraryCategory(e.target.value); setLibraryOffset(0) }}>
+                        <option value="">All categories</option>
+                        {Object.entries(library.facets.categories).map(([name, count]) => <option key={name} value={name}>{name} ({count})</option>)}
+                    </select>
+                    {Object.keys(library.facets.tags).length > 0 && (
+                        <select className="select select-bordered select-sm" value={libraryTag}
+                            onChange={e => { setLibraryTag(e.target.value); setLibraryOffset(0) }}>
+                            <option value="">All tags</option>
+                            {Object.entries(library.facets.tags).map(([name, count]) => <option key={name} value={name}>{name} ({count})</option>)}
+                        </select>
+                    )}
+                </div>
                 <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-4">
-                    {premadeChallenges.map((c) => {
+                    {library.items.map((c) => {
                         const isSelected = selectedChallenges.some(sc => sc.id === c.id)
                         return (
                             <div key={c.id} 
@@ -294,6 +390,17 @@ export default function CreateGame() {
                         )
                     })}
                 </div>
+                {library.total > LIBRARY_PAGE && (
+                    <div className="join justify-center mt-4">
+                        <button className="join-item btn btn-sm" disabled={libraryOffset === 0}
+                            onClick={() => setLibraryOffset(Math.max(0, libraryOffset - LIBRARY_PAGE))}>«</button>
+                        <button className="join-item btn btn-sm btn-disabled">
+                            {libraryOffset + 1}-{Math.min(libraryOffset + LIBRARY_PAGE, library.total)} of {library.total}
+                        </button>
+                        <button className="join-item btn btn-sm" disabled={libraryOffset + LIBRARY_PAGE >= library.total}
+                            onClick={() => setLibraryOffset(libraryOffset + LIBRARY_PAGE)}>»</button>
+                    </div>
+                )}
             </div>
         </div>
 
@@ -359,9 +466,22 @@ export default function CreateGame() {
                                     </div>
                                     <div className="form-control w-full">
                                         <label className="label"><span className="label-text">Flag</span></label>
-                                        <input className="input input-bordered font-mono w-full" value={editingChallenge.flag} 
-                                            onChange={e => setEditingChallenge({...editingChallenge, flag: e.target.value})} />
+                                        <div className="flex gap-2">
+                                            <select className="select select-bordered" value={editingChallenge.flag_type || "exact"}
+                                                onChange={e => setEditingChallenge({...editingChallenge, flag_type: e.target.value})}>
+                                                {Object.entries(FLAG_TYPES).map(([value, label]) => <option key={value} value={value}>{label}</option>)}
+                                            </select>
+                                            <input className="input input-bordered font-mono w-full" value={editingChallenge.flag} 
+                                                onChange={e => setEditingChallenge({...editingChallenge, flag: e.target.value})} />
+                                        </div>
                                     </div>
+                                    {["exact", "case_insensitive"].includes(editingChallenge.flag_type || "exact") && (
+                                        <div className="form-control w-full">
+                                            <label className="label"><span className="label-text">Also accepted (one per line)</span></label>
+                                            <textarea className="textarea textarea-bordered font-mono w-full" value={(editingChallenge.flags || []).join("\n")}
+                                                onChange={e => setEditingChallenge({...editingChallenge, flags: e.target.value.split("\n")})}></textarea>
+                                        </div>
+                                    )}
                                     
                                     {/* FILES */}
                                     <div className="form-control w-full">
@@ -444,7 +564,7 @@ export default function CreateGame() {
 
                             {editingChallenge.is_premade && (
                                 <div className="alert alert-info text-xs">
-                                    <span>Content for pre-made challenges cannot be edited. Only scoring values can be adjusted.</span>
+                                    <span>Content for pre-made challenges cannot be edited. Only scoring values and hint costs can be adjusted.</span>
                                 </div>
                             )}
                         </div>
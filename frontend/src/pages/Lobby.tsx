@@ -18,13 +18,20 @@ interface Team {
     id: string
     name: string
     score: number
+    rank: number
     is_solo: boolean
     members: Player[]
 }
 
-interface SolveLog {
-    team_name: string
-    time_str: string
+interface SolveEntry {
+    seq: number // Position in the game's solve log
+    at: number
+    teamId: string
+    team: string
+    player: string
+    challengeId: string
+    points: number
+    score: number // Team score after this solve
 }
 
 interface Hint {
@@ -41,16 +48,57 @@ interface Challenge {
     solves: number
     desc?: string
     files?: string[]
-    solve_history?: SolveLog[] // Only populated for Admins
     flag_mask?: string
     hints?: Hint[]
 }
 
+// --- STATE PATCHES ---
+// LOBBY_PATCH carries small ops against the last LOBBY_UPDATE snapshot
+type PatchOp = { op: string, [key: string]: any }
+
+const upsert = <T extends { id: string }>(list: T[], item: T): T[] =>
+    list.some(x => x.id === item.id) ? list.map(x => x.id === item.id ? item : x) : [...list, item]
+
+const applyTeamOps = (teams: Team[], ops: PatchOp[]): Team[] => {
+    let next = teams
+    for (const o of ops) {
+        if (o.op === "team") next = upsert(next, o.team)
+        else if (o.op === "team_removed") next = next.filter(t => t.id !== o.teamId)
+        else if (o.op === "score") next = next.map(t => t.id === o.teamId ? { ...t, score: o.score } : t)
+        else if (o.op === "ranks") next = next.map(t => t.id in o.ranks ? { ...t, rank: o.ranks[t.id] } : t)
+        else if (o.op === "member") next = next.map(t => t.id !== o.teamId ? t : {
+            ...t, members: upsert(t.members, o.member).sort((a, b) => b.score - a.score)
+        })
+        else if (o.op === "member_removed") next = next.map(t => t.id !== o.teamId ? t : {
+            ...t, members: t.members.filter(m => m.id !== o.memberId)
+        })
+    }
+    return [...next].sort((a, b) => a.rank - b.rank) // Ranks come from the server, ties already broken
+}
+
+const formatElapsed = (seconds: number) => `${Math.floor(seconds / 60)}m ${Math.floor(seconds % 60)}s`
+
+// Text frames are JSON; binary frames are zlib-deflated JSON (dashflag.json+deflate)
+const decodeFrame = async (raw: string | Blob) => {
+    if (typeof raw === "string") return JSON.parse(raw)
+    const inflated = raw.stream().pipeThrough(new DecompressionStream("deflate"))
+    return JSON.parse(await new Response(inflated).text())
+}
+
+const applyChallengeOps = (challenges: Challenge[], ops: PatchOp[]): Challenge[] => {
+    let next = challenges
+    for (const o of ops) {
+        if (o.op === "challenge") next = next.map(c => c.id === o.id ? { ...c, points: o.points, solves: o.solves } : c)
+    }
+    return next
+}
+
 export default function Lobby() {
     const { gameCode } = useParams()
     const navigate = useNavigate()
     const socketRef = useRef<WebSocket | null>(null)
     const invalidCodeRef = useRef(false)
+    const versionRef = useRef<number | null>(null) // Version of the last applied snapshot/patch
 
     // --- STATE ---
     const [viewState, setViewState] = useState<ViewState>('LOADING')
@@ -76,6 +124,11 @@ export default function Lobby() {
     
     // Admin Info
     const [isAdmin, setIsAdmin] = useState(false)
+    const [throttled, setThrottled] = useState<Record<string, number>>({}) // Rate-limited attempts per team
+    const [solveLog, setSolveLog] = useState<SolveEntry[]>([])
+    const [startTime, setStartTime] = useState<number | null>(null)
+    const solveCursorRef = useRef(0) // Solve log entries held
+    const solvesRequestedRef = useRef(false) // A GET_SOLVES is in flight
 
     // Inputs
     const [teamName, setTeamName] = useState("")
@@ -124,7 +177,9 @@ export default function Lobby() {
             wsUrl = `${protocol}//${window.location.host}`
         }
         
-        const ws = new WebSocket(`${wsUrl}/ws/${gameCode}`)
+        // Large snapshots come compressed if the browser can inflate them
+        const protocols = typeof DecompressionStream !== "undefined" ? ["dashflag.json+deflate", "dashflag.json"] : ["dashflag.json"]
+        const ws = new WebSocket(`${wsUrl}/ws/${gameCode}`, protocols)
         socketRef.current = ws
 
         ws.onopen = () => {
@@ -137,10 +192,24 @@ export default function Lobby() {
             }
         }
 
-        ws.onmessage = (event) => {
-            const data = JSON.parse(event.data)
-            
-            if (data.type === "ERROR" && data.payload === "INVALID_CODE") {
+        // The solve log is append-only: fetch whatever follows our cursor, a page at a time
+        const fetchSolves = () => {
+            if (solvesRequestedRef.current) return
+            solvesRequestedRef.current = true
+            ws.send(JSON.stringify({ type: "GET_SOLVES", since: solveCursorRef.current }))
+        }
+
+        const appendSolves = (entries: SolveEntry[]) => {
+            solveCursorRef.current += entries.length
+            setSolveLog(prev => [...prev, ...entries])
+        }
+
+        const handleMessage = (data: any) => {
+            if (data.type === "PING") {
+                // Server heartbeat: sockets that stay silent too long are dropped
+                if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ type: "PONG" }))
+            }
+            else if (data.type === "ERROR" && data.payload === "INVALID_CODE") {
                 invalidCodeRef.current = true
                 setConnectionError("INVALID_CODE")
                 ws.close()
@@ -167,12 +236,52 @@ export default function Lobby() {
                 setViewState("LOBBY")
             }
             else if (data.type === "LOBBY_UPDATE") {
+                versionRef.current = data.version
                 setLeaderboard(data.leaderboard)
                 setGameStatus(data.status)
                 if (data.challenges) setChallenges(data.challenges)
                 if (data.endTime) setEndTime(data.endTime)
                 if (data.my_unlocked_hints) setUnlockedHints(data.my_unlocked_hints)
                 if (data.hint_content) setHintContent(prev => ({...prev, ...data.hint_content}))
+                if (data.throttled) setThrottled(data.throttled)
+                if (data.startTime) setStartTime(data.startTime)
+                if (data.solve_log !== undefined) {
+                    if (data.solve_log < solveCursorRef.current) {
+                        // A new round started with a fresh log
+                        solveCursorRef.current = 0
+                        setSolveLog([])
+                    }
+                    if (data.solve_log > solveCursorRef.current) fetchSolves()
+                }
+            }
+            else if (data.type === "SOLVE_LOG") {
+                solvesRequestedRef.current = false
+                if (data.since !== solveCursorRef.current) { fetchSolves(); return } // Crossed with a new round's reset
+                appendSolves(data.entries)
+                if (solveCursorRef.current < data.total) fetchSolves()
+            }
+            else if (data.type === "LOBBY_PATCH") {
+                // Ignore patches until we hold a snapshot, and ones it already includes
+                if (versionRef.current === null || data.version <= versionRef.current) return
+                if (data.version !== versionRef.current + 1) {
+                    // Missed a patch: ask for a fresh snapshot
+                    versionRef.current = null
+                    ws.send(JSON.stringify({ type: "RESYNC" }))
+                    return
+                }
+                versionRef.current = data.version
+                setLeaderboard(prev => applyTeamOps(prev, data.ops))
+                setChallenges(prev => applyChallengeOps(prev, data.ops))
+                for (const o of data.ops as PatchOp[]) {
+                    if (o.op !== "solve_log" || o.entry.seq < solveCursorRef.current) continue
+                    if (o.entry.seq === solveCursorRef.current && !solvesRequestedRef.current) appendSolves([o.entry])
+                    else fetchSolves() // Gap, or a page is on its way that may end before this entry
+                }
+            }
+            else if (data.type === "THROTTLED") setThrottled(prev => ({...prev, ...data.counts}))
+            else if (data.type === "HINTS_UPDATE") {
+                setUnlockedHints(data.my_unlocked_hints)
+                setHintContent(prev => ({...prev, ...data.hint_content}))
             }
             else if (data.type === "KICKED") {
                 localStorage.removeItem(`dashflag_pid_${gameCode}`)
@@ -186,6 +295,12 @@ export default function Lobby() {
             }
         }
 
+        // Inflating is async; chain it so messages are still handled in arrival order
+        let inbox: Promise<void> = Promise.resolve()
+        ws.onmessage = (event) => {
+            inbox = inbox.then(() => decodeFrame(event.data)).then(handleMessage).catch(console.error)
+        }
+
         ws.onclose = () => {
             if (!invalidCodeRef.current) {
                setConnectionError("DROPPED")
@@ -219,11 +334,7 @@ export default function Lobby() {
         const i = setInterval(() => {
             const diff = endTime - (Date.now() / 1000)
             if (diff <= 0) {
-                setTimeLeft("00:00")
-                if (gameStatus === 'active') {
-                    // Trigger server check to officially end game
-                    socketRef.current?.send(JSON.stringify({ type: "CHECK_TIME" }))
-                }
+                setTimeLeft("00:00") // The server ends the game on its own clock
             }
             else {
                 const d = Math.floor(diff / (3600 * 24))
@@ -292,6 +403,8 @@ export default function Lobby() {
         }
     }
 
+    const selectedSolves = isAdmin && selectedChallenge ? solveLog.filter(e => e.challengeId === selectedChallenge.id) : []
+
     const getEffectivePoints = (c: Challenge) => {
         let p = c.points
         if (unlockedHints[c.id] && c.hints) {
@@ -451,6 +564,9 @@ export default function Lobby() {
                                         </div>
                                     </div>
                                     <div className="flex items-center gap-2">
+                                        {isAdmin && throttled[team.id] > 0 && (
+                                            <span className="badge badge-warning badge-sm" title="Flag/hint attempts rejected by the rate limit">{throttled[team.id]} throttled</span>
+                                        )}
                                         <span className="font-mono font-bold text-lg">{team.score}</span>
                                         {isAdmin && team.is_solo && (
                                             <button className="btn btn-xs btn-circle btn-error btn-outline" title="Kick Player" 
@@ -597,12 +713,12 @@ export default function Lobby() {
                         {isAdmin ? (
                             <div className="bg-base-200 p-4 rounded-lg my-4 h-64 overflow-y-auto">
                                 <h4 className="font-bold opacity-50 text-xs mb-2">SOLVE HISTORY</h4>
-                                {selectedChallenge.solve_history && selectedChallenge.solve_history.length > 0 ? (
+                                {selectedSolves.length > 0 ? (
                                     <ul className="space-y-2">
-                                        {selectedChallenge.solve_history.map((log, i) => (
-                                            <li key={i} className="flex justify-between text-sm border-b border-base-300 pb-1">
-                                                <span>{log.team_name}</span>
-                                                <span className="font-mono opacity-50">{log.time_str}</span>
+                                        {selectedSolves.map(log => (
+                                            <li key={log.seq} className="flex justify-between text-sm border-b border-base-300 pb-1">
+                                                <span>{log.team}</span>
+                                                <span className="font-mono opacity-50">{formatElapsed(log.at - (startTime ?? log.at))}</span>
                                             </li>
                                         ))}
                                     </ul>